@@ -36,6 +36,9 @@ def main():
     pipe_repos = cp_instance.repositories
     common.output("Pipeline configuration successfully loaded", blankline='b')
 
+    # number of parallel jobs of rosinstall, make and rosmake
+    num_jobs = common.get_parallel_jobs(common.get_job_type(), cp_instance.pipeline_config)
+
     # (debug) output
     print "\n", 50 * 'X'
     print datetime.datetime.now()
@@ -72,8 +75,8 @@ def main():
     # create repo sourcespace directory 'src_repository'
     os.makedirs(repo_sourcespace)
     # rosinstall repos
-    common.call("rosinstall -j 8 --verbose --continue-on-error %s %s/repo.rosinstall /opt/ros/%s"
-                % (repo_sourcespace, workspace, ros_distro))
+    common.call("rosinstall -j %d --verbose --continue-on-error %s %s/repo.rosinstall /opt/ros/%s"
+                % (num_jobs, repo_sourcespace, workspace, ros_distro))
 
     # get the repositories build dependencies
     print "Get build dependencies of repo"
@@ -106,7 +109,8 @@ def main():
     build_repo_type = ''
     if build_repo in catkin_packages:
         build_repo_type = 'wet'
-        repo_build_dependencies = common.get_nonlocal_dependencies(catkin_packages, {}, {}, build_depends=True, test_depends=False)
+        repo_dependencies = common.get_nonlocal_dependencies(catkin_packages, {}, {})
+        repo_build_dependencies = repo_dependencies.get_by_type(*common.BUILD_DEPEND_TYPES)
     elif build_repo in stacks:
         build_repo_type = 'dry'
         repo_build_dependencies = common.get_nonlocal_dependencies({}, stacks, {})
@@ -144,8 +148,8 @@ def main():
             f.write(rosinstall)
         print "Install user-defined build dependencies from source"
         # rosinstall depends
-        common.call("rosinstall -j 8 --verbose --continue-on-error %s %s/repo.rosinstall /opt/ros/%s"
-                    % (repo_sourcespace, workspace, ros_distro))
+        common.call("rosinstall -j %d --verbose --continue-on-error %s %s/repo.rosinstall /opt/ros/%s"
+                    % (num_jobs, repo_sourcespace, workspace, ros_distro))
 
         # get also deps of just installed user-defined/customized dependencies
         (catkin_packages, stacks, manifest_packages) = common.get_all_packages(repo_sourcespace)
@@ -154,7 +158,8 @@ def main():
                 raise common.BuildException("Catkin (wet) package %s depends on (dry) stack(s):\n%s"
                                             % (build_repo, '- ' + '\n- '.join(stacks)))
             # take only wet packages
-            repo_build_dependencies = common.get_nonlocal_dependencies(catkin_packages, {}, {}, build_depends=True, test_depends=False)
+            repo_dependencies = common.get_nonlocal_dependencies(catkin_packages, {}, {})
+            repo_build_dependencies = repo_dependencies.get_by_type(*common.BUILD_DEPEND_TYPES)
         else:  # dry build repo
             # take all packages
             repo_build_dependencies = common.get_nonlocal_dependencies(catkin_packages, stacks, {}, build_depends=True, test_depends=False)
@@ -171,9 +176,17 @@ def main():
             sleep(10)
             rosdep_resolver = rosdep.RosDepResolver(ros_distro)
 
+    # the test job runs in the chroot saved after this build, so the test
+    # dependencies of wet packages are installed in the same transaction
+    install_plan = common.AptInstallPlan(ros_distro, rosdep_resolver)
+    install_plan.add(repo_build_dependencies, 'build')
+    if build_repo_type == 'wet':
+        repo_test_dependencies = repo_dependencies.get_by_type(*common.TEST_DEPEND_TYPES)
+        install_plan.add([dep for dep in repo_test_dependencies if dep not in fulfilled_deps], 'test', optional=True)
+
     print datetime.datetime.now()
     print "Install build dependencies: %s" % (', '.join(repo_build_dependencies))
-    common.apt_get_install_also_nonrosdep(repo_build_dependencies, ros_distro, rosdep_resolver)
+    install_plan.install()
     print datetime.datetime.now()
 
     # separate installed repos in wet and dry
@@ -204,8 +217,8 @@ def main():
                 rosinstall = "\n- git: {local-name: catkin, uri: 'git://github.com/ros/catkin.git', version: fuerte-devel}"
                 print "Install catkin"
                 # rosinstall catkin
-                common.call("rosinstall -j 8 --verbose %s %s/repo.rosinstall /opt/ros/%s"
-                            % (repo_sourcespace_wet, workspace, ros_distro))
+                common.call("rosinstall -j %d --verbose %s %s/repo.rosinstall /opt/ros/%s"
+                            % (num_jobs, repo_sourcespace_wet, workspace, ros_distro), ros_env)
 
             print "Create a CMakeLists.txt for catkin packages"
             common.call("ln -s %s %s" % (os.path.join(repo_sourcespace_wet, 'catkin', 'cmake', 'toplevel.cmake'),
@@ -216,7 +229,7 @@ def main():
         os.mkdir(repo_buildspace)
         os.chdir(repo_buildspace)
         try:
-            common.call("cmake %s" % repo_sourcespace_wet + '/', ros_env)
+            common.call("cmake %s" % repo_sourcespace_wet + '/', ros_env, capture=True)
         except common.BuildException as ex:
             print ex.msg
             raise common.BuildException("Failed to cmake wet repositories")
@@ -225,7 +238,7 @@ def main():
         # build repositories
         print "Build wet repository list"
         try:
-            common.call("make", ros_env)
+            common.call("make -j%d" % num_jobs, ros_env, capture=True)
         except common.BuildException as ex:
             print ex.msg
             raise common.BuildException("Failed to make wet packages")
@@ -247,8 +260,8 @@ def main():
         # build dry repositories
         print "Build repository %s" % build_repo
         try:
-            common.call("rosmake -rV --profile --pjobs=8 --output=%s %s" %
-                        (dry_build_logs, build_repo), ros_env_repo)
+            common.call("rosmake -rV --profile --pjobs=%d --output=%s %s" %
+                        (num_jobs, dry_build_logs, build_repo), ros_env_repo, capture=True)
         except common.BuildException as ex:
             try:
                 shutil.move(dry_build_logs, os.path.join(workspace, "build_logs"))
@@ -15,19 +15,25 @@ def main():
     parser.add_option('-v', '--verbose', action='store_true', default=False)
     (options, args) = parser.parse_args()
 
-    if len(args) < 4:
-        print "Usage: %s server_name user_name ros_distro build_repo" % sys.argv[0]
+    if len(args) < 5:
+        print "Usage: %s pipeline_repos_owner server_name user_name ros_distro build_repo" % sys.argv[0]
         raise common.BuildException("Wrong arguments for build script")
 
     # get arguments
-    server_name = args[0]
-    #user_name = args[1]
-    ros_distro = args[2]
-    build_identifier = args[3]
+    pipeline_repos_owner = args[0]
+    server_name = args[1]
+    user_name = args[2]
+    ros_distro = args[3]
+    build_identifier = args[4]
     build_repo = build_identifier.split('__')[0]  # repository to build
     workspace = os.environ['WORKSPACE']
     ros_package_path = os.environ['ROS_PACKAGE_PATH']
 
+    # cob_pipe object
+    cp_instance = cob_pipe.CobPipe()
+    cp_instance.load_config_from_url(pipeline_repos_owner, server_name, user_name)
+    common.output("Pipeline configuration successfully loaded", blankline='b')
+
     # (debug) output
     print "\n", 50 * 'X'
     print "\nTesting on ros distro:  %s" % ros_distro
@@ -39,13 +45,16 @@ def main():
     if ros_distro == 'electric':
         pass
     else:
-        build_downstream_post_fuerte(ros_distro, build_repo, workspace, server_name)
+        build_downstream_post_fuerte(ros_distro, build_repo, workspace, server_name, cp_instance.pipeline_config)
 
 
-def build_downstream_post_fuerte(ros_distro, build_repo, workspace, server):
+def build_downstream_post_fuerte(ros_distro, build_repo, workspace, server, pipeline_config):
     ros_package_path = os.environ['ROS_PACKAGE_PATH']
     b_r_short = build_repo.split('__')[0]
 
+    # number of parallel jobs of rosinstall, make and rosmake
+    num_jobs = common.get_parallel_jobs(common.get_job_type(), pipeline_config)
+
     # set up directories variables
     tmpdir = os.path.join('/tmp', 'test_repositories')
     repo_sourcespace = os.path.join(tmpdir, 'src_repository')
@@ -89,7 +98,7 @@ def build_downstream_post_fuerte(ros_distro, build_repo, workspace, server):
     # install all repository and system dependencies of the depends_on list
     print "Install all depends_on from source: %s" % (', '.join(ros_depends_on))
     os.makedirs(dependson_sourcespace)
-    common.call("rosinstall -j 8 %s %s/depends_on.rosinstall /opt/ros/%s" % (dependson_sourcespace, workspace, ros_distro))
+    common.call("rosinstall -j %d %s %s/depends_on.rosinstall /opt/ros/%s" % (num_jobs, dependson_sourcespace, workspace, ros_distro))
 
     # all packages in dependson_sourcespace
     (catkin_packages, stacks, manifest_packages) = common.get_all_packages(dependson_sourcespace)
@@ -162,7 +171,7 @@ def build_downstream_post_fuerte(ros_distro, build_repo, workspace, server):
             common.call("catkin_init_workspace %s" % dependson_sourcespace_wet, ros_env_dependson)
 
         try:
-            common.call("cmake %s" % dependson_sourcespace_wet, ros_env_dependson)
+            common.call("cmake %s" % dependson_sourcespace_wet, ros_env_dependson, capture=True)
         except common.BuildException as ex:
             print ex.msg
             raise common.BuildException("Failed to cmake wet repositories")
@@ -171,7 +180,7 @@ def build_downstream_post_fuerte(ros_distro, build_repo, workspace, server):
         # build repositories
         print "Build wet depends_on list"
         try:
-            common.call("make", ros_env_dependson)
+            common.call("make -j%d" % num_jobs, ros_env_dependson, capture=True)
         except common.BuildException as ex:
             print ex.msg
             raise common.BuildException("Failed to make wet packages")
@@ -200,7 +209,7 @@ def build_downstream_post_fuerte(ros_distro, build_repo, workspace, server):
         os.mkdir(dry_test_results_dir)
         for dry_dependson in dependson_sourcespace_dry_dirs:
             try:
-                common.call("rosmake -rV --profile --pjobs=8 --output=%s %s" % (dry_test_results_dir, b_r_short), ros_env_dependson)
+                common.call("rosmake -rV --profile --pjobs=%d --output=%s %s" % (num_jobs, dry_test_results_dir, b_r_short), ros_env_dependson, capture=True)
             except:
                 raise common.BuildException("Failed to rosmake %s" % b_r_short)
 
@@ -2,11 +2,12 @@
 
 import sys
 import os
+import glob
 import optparse
 import yaml
 import jenkins
 
-from jenkins_setup import jenkins_job_creator, cob_pipe
+from jenkins_setup import jenkins_job_creator, job_scheduler, cob_pipe
 
 
 def get_master_name(url):
@@ -16,84 +17,36 @@ def get_master_name(url):
     return name
 
 
-# schedule cob buildpipeline jobs
-def main():
-    """
-    Create a build and test pipeline on a Jenkins CI server.
-    Starting point is the pipeline coniguration file (pipeline_config.yaml) of
-    the given user stored on github. For this configuration a set of Jenkins
-    projects/jobs will be generated.
+def get_user_names(users_folder):
     """
+    Discovers all users with a pipeline configuration, i.e. all sub-folders
+    of the given folder containing a pipeline_config.yaml
 
-    # parse options
-    usage = "Usage: %prog [masterURL login password configFolder tarballLocation | jenkinsConfigFile] pipelineReposOwner username"
-    parser = optparse.OptionParser(usage)
-    parser.add_option("-m", "--masterURL", action="store", type="string", dest="master_url",
-                      metavar="URL", help="URL of Jenkins server/master")
-    parser.add_option("-l", "--login", action="store", type="string", dest="jenkins_login",
-                      metavar="LOGIN", help="Login name of Jenkins Admin which has rights to create and delete jobs")
-    parser.add_option("-p", "--password", action="store", type="string", dest="jenkins_pw",
-                      metavar="PASSWORD", help="Jenkins Admin password")
-    parser.add_option("-c", "--configFolder", action="store", type="string", dest="config_folder",
-                      metavar="CONFIGFOLDER", help="Folder where '.gitconfig', '.ssh', 'jenkins_setup' and 'jenkins_config' are stored")
-    parser.add_option("-t", "--tarballLocation", action="store", type="string", dest="tarball_location",
-                      metavar="USER@SERVERADDRESS:PATH", help="Place where the Tarballs are located")
-
-    parser.add_option("--jenkinsConfigFile", action="store", type="string", dest="jenkinsConfigFile",
-                      metavar="FILE", help="YAML file that replaces the Jenkins config options and contains values for:\
-                                            masterURL, login, password, configFolder, tarballLocation")
-
-    parser.add_option("-o", "--pipelineReposOwner", action="store", type="string", dest="pipeline_repos_owner",
-                      metavar="PIPELINE_REPOS_OWNER", help="Owner of the GitHub repositories 'jenkins_setup' and 'jenkins_config'")
-    parser.add_option("-u", "--username", action="store", type="string", dest="username",
-                      metavar="USERNAME", help="Name of user to generate pipeline for")
-    parser.add_option("-d", "--delete", action="store_true", default=False,
-                      help="Delete")
-    (options, args) = parser.parse_args()
+    @param users_folder: folder with one sub-folder per user
+    @type  users_folder: str
 
-    if len(args) != 0:
-        print "Usage: %s [masterURL login password configFolder tarballLocation | jenkinsConfigFile] pipelineReposOwner username" % (sys.argv[0])
-        sys.exit()
-
-    if options.jenkinsConfigFile:
-        # load jenkins config from file
-        with open(os.path.expanduser(options.jenkinsConfigFile)) as f:
-            jenkins_conf = yaml.load(f)
-
-        master_name = get_master_name(jenkins_conf['masterURL'])
-        tarball_location = jenkins_conf['tarballLocation']
+    @return type: list
+    """
 
-        # create jenkins instance
-        jenkins_instance = jenkins.Jenkins(jenkins_conf['masterURL'], jenkins_conf['login'],
-                                           jenkins_conf['password'])
+    return sorted(os.path.basename(os.path.dirname(path))
+                  for path in glob.glob(os.path.join(users_folder, '*', 'pipeline_config.yaml')))
 
-    elif options.master_url and options.jenkins_login and options.jenkins_pw and options.tarball_location:
-        master_name = get_master_name(options.master_url)
-        tarball_location = options.tarball_location
 
-        # create jenkins instance
-        jenkins_instance = jenkins.Jenkins(options.master_url, options.jenkins_login, options.jenkins_pw)
-
-    else:
-        print "Usage: %s [masterURL login password configFolder tarballLocation | jenkinsConfigFolder] pipelineReposOwner username" % (sys.argv[0])
-        sys.exit()
+def get_pipeline_jobs(jenkins_instance, plc_instance, tarball_location):
+    """
+    Sets up all job objects of the given pipeline configuration
 
-    if not options.pipeline_repos_owner or not options.username:
-        print "Usage: %s [masterURL login password configFolder tarballLocation | jenkinsConfigFolder] pipelineReposOwner username" % (sys.argv[0])
-        sys.exit()
+    @param jenkins_instance: Jenkins instance
+    @type  jenkins_instance: jenkins.Jenkins
+    @param plc_instance: pipeline configuration
+    @type  plc_instance: cob_pipe.CobPipe
+    @param tarball_location: place where the tarballs are located
+    @type  tarball_location: str
 
-    # get all existent jobs for user
-    existent_user_jobs = []
-    for job in jenkins_instance.get_jobs():
-        job_owner = job['name'].split('__')[0]
-        if options.username == job_owner:
-            existent_user_jobs.append(job['name'])
-    modified_jobs = []
+    @return type: list of jenkins_job_creator.JenkinsJob
+    """
 
-    # get pipeline configs object from url
-    plc_instance = cob_pipe.CobPipe()
-    plc_instance.load_config_from_url(options.pipeline_repos_owner, master_name, options.username)
-    plc_instance.config_folder = options.config_folder
+    jobs = []
 
     # get jobs to create
     job_type_dict = plc_instance.get_jobs_to_create()
@@ -107,109 +60,49 @@ def main():
     for poll, starts_repo_list in polls_dict.iteritems():
         if poll in pipe_repo_list:
             pipe_repo_list.remove(poll)
-        job_creator_instance = jenkins_job_creator.PipeStarterJob(jenkins_instance, plc_instance, starts_repo_list, poll)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.PipeStarterJob(jenkins_instance, plc_instance, starts_repo_list, poll))
     for repo in pipe_repo_list:
-        job_creator_instance = jenkins_job_creator.PipeStarterJob(jenkins_instance, plc_instance, [repo], repo)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.PipeStarterJob(jenkins_instance, plc_instance, [repo], repo))
 
     ### general pipe starter
     # this pipe starter job won't poll any repository; it has to be started
     # manually. It triggers the priority build job with all defined
     # repositories as parameters
-    job_creator_instance = jenkins_job_creator.PipeStarterGeneralJob(jenkins_instance, plc_instance, plc_instance.repositories.keys())
-    if options.delete:
-        modified_jobs.append(job_creator_instance.delete_job())
-    else:
-        general_pipe_starter_name = job_creator_instance.create_job()
-        modified_jobs.append(general_pipe_starter_name)
+    jobs.append(jenkins_job_creator.PipeStarterGeneralJob(jenkins_instance, plc_instance, plc_instance.repositories.keys()))
 
     ### priority build
-    job_creator_instance = jenkins_job_creator.PriorityBuildJob(jenkins_instance, plc_instance, tarball_location, plc_instance.repositories.keys())
-    if options.delete:
-        modified_jobs.append(job_creator_instance.delete_job())
-    else:
-        modified_jobs.append(job_creator_instance.create_job())
+    jobs.append(jenkins_job_creator.PriorityBuildJob(jenkins_instance, plc_instance, tarball_location, plc_instance.repositories.keys()))
 
     ### regular build
     if 'regular_build' in job_type_dict:
-        job_creator_instance = jenkins_job_creator.RegularBuildJob(jenkins_instance, plc_instance, tarball_location)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.RegularBuildJob(jenkins_instance, plc_instance, tarball_location))
 
     ### downstream build
     #if 'downstream_build' in job_type_dict:
-    #    job_creator_instance = jenkins_job_creator.DownstreamBuildJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['downstream_build'])
-    #    if options.delete:
-    #        modified_jobs.append(job_creator_instance.delete_job())
-    #    else:
-    #        modified_jobs.append(job_creator_instance.create_job())
+    #    jobs.append(jenkins_job_creator.DownstreamBuildJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['downstream_build']))
 
     ### priority nongraphics test
     if 'nongraphics_test' in job_type_dict:
-        job_creator_instance = jenkins_job_creator.PriorityNongraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['nongraphics_test'])
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.PriorityNongraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['nongraphics_test']))
 
     ### regular nongraphics test
     if 'nongraphics_test' in job_type_dict and 'regular_build' in job_type_dict:
-        job_creator_instance = jenkins_job_creator.RegularNongraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['nongraphics_test'])
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.RegularNongraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['nongraphics_test']))
 
     ### priority graphics test
     if 'graphics_test' in job_type_dict:
-        job_creator_instance = jenkins_job_creator.PriorityGraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['graphics_test'])
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.PriorityGraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['graphics_test']))
 
     ### regular graphics test
     if 'graphics_test' in job_type_dict and 'regular_build' in job_type_dict:
-        job_creator_instance = jenkins_job_creator.RegularGraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['graphics_test'])
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.RegularGraphicsTestJob(jenkins_instance, plc_instance, tarball_location, job_type_dict['graphics_test']))
 
     ### hardware build and test
     if 'hardware_build' in job_type_dict:
-        job_creator_instance = jenkins_job_creator.HardwareBuildTrigger(jenkins_instance, plc_instance)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
-
-        job_creator_instance = jenkins_job_creator.HardwareBuildJob(jenkins_instance, plc_instance)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
-
-        job_creator_instance = jenkins_job_creator.HardwareTestTrigger(jenkins_instance, plc_instance)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
-
-        job_creator_instance = jenkins_job_creator.HardwareTestJob(jenkins_instance, plc_instance)
-        if options.delete:
-            modified_jobs.append(job_creator_instance.delete_job())
-        else:
-            modified_jobs.append(job_creator_instance.create_job())
+        jobs.append(jenkins_job_creator.HardwareBuildTrigger(jenkins_instance, plc_instance))
+        jobs.append(jenkins_job_creator.HardwareBuildJob(jenkins_instance, plc_instance))
+        jobs.append(jenkins_job_creator.HardwareTestTrigger(jenkins_instance, plc_instance))
+        jobs.append(jenkins_job_creator.HardwareTestJob(jenkins_instance, plc_instance))
 
     ### release job
     # TODO fix if statement
@@ -221,14 +114,343 @@ def main():
     ### clean up
     # TODO
 
-    # delete old and no more required jobs
-    delete_msg = ""
-    for job in [job for job in existent_user_jobs if job not in modified_jobs]:
-        jenkins_instance.delete_job(job)
-        delete_msg += "- %s\n" % job
+    return jobs
+
+
+def process_jobs(jobs, delete, num_workers=1):
+    """
+    Creates/reconfigures or deletes the given jobs, concurrently if more
+    than one worker is given. The jobs to create have to be rendered
+    already. A job whose request raises an error is marked as failed
+    without aborting the other jobs.
+
+    @param jobs: jobs to process
+    @type  jobs: list of jenkins_job_creator.JenkinsJob
+    @param delete: delete instead of create the jobs
+    @type  delete: bool
+    @param num_workers: number of concurrent requests to Jenkins
+    @type  num_workers: int
+
+    @return: job names (empty string for jobs not deleted), ``list``
+    """
+
+    def get_task(job):
+        def task():
+            try:
+                if delete:
+                    return job.delete_job()
+                message = job.schedule_job()
+            except Exception as ex:
+                job.schedule_result = 'failed'
+                message = "Processing of %s failed: %s" % (job.job_name, ex)
+                if delete:
+                    print message
+                    return ''
+            print message
+            return job.job_name
+        return task
+
+    return job_scheduler.run_parallel([get_task(job) for job in jobs], max(1, num_workers))
+
+
+def render_jobs(user_names, user_jobs, store, failed_users):
+    """
+    Renders the jobs of all users and writes their configs to the given
+    store instead of sending them to Jenkins. Stored jobs of these users
+    which are no more required are removed.
+
+    @param user_names: names of users
+    @type  user_names: list
+    @param user_jobs: jobs by user name
+    @type  user_jobs: dict
+    @param store: store of rendered job configs
+    @type  store: jenkins_job_creator.RenderedJobStore
+    @param failed_users: error message by user name, gets extended
+    @type  failed_users: dict
+    """
+
+    for user_name in user_names:
+        if user_name not in user_jobs:
+            continue
+        try:
+            changed_jobs = [job.job_name for job in user_jobs[user_name]
+                            if store.write(job.job_name, job.render_job())]
+        except Exception as ex:
+            print "Rendering the pipeline for %s failed: %s" % (user_name, ex)
+            failed_users[user_name] = str(ex)
+            continue
+        job_names = [job.job_name for job in user_jobs[user_name]]
+        old_jobs = [job for job in store.get_job_names(user_name) if job not in job_names]
+        for job in old_jobs:
+            store.remove(job)
+        print "Rendered %d jobs of %s to %s: %d changed, %d removed" % (len(job_names), user_name, store.path,
+                                                                      len(changed_jobs), len(old_jobs))
+    store.save()
+
+
+def schedule_jobs(user_names, user_jobs, jenkins_instance, options, failed_users):
+    """
+    Creates/reconfigures or deletes the jobs of all users on Jenkins and
+    deletes their old and no more required jobs
+
+    @param user_names: names of users
+    @type  user_names: list
+    @param user_jobs: jobs by user name
+    @type  user_jobs: dict
+    @param jenkins_instance: Jenkins instance
+    @type  jenkins_instance: jenkins.Jenkins
+    @param options: command line options
+    @type  options: optparse.Values
+    @param failed_users: error message by user name, gets extended
+    @type  failed_users: dict
+    """
+
+    # get all existent jobs
+    inventory = jenkins_job_creator.JobInventory(jenkins_instance)
+    config_cache = jenkins_job_creator.JobConfigCache(options.config_cache)
+
+    # state of the last generation; not available for uploaded jobs since
+    # their pipeline configuration is unknown
+    state = None
+    if options.state_file and not options.upload:
+        state = jenkins_job_creator.PipelineState(options.state_file)
+        version = jenkins_job_creator.get_generator_version()
+
+    jobs = []
+    skipped_jobs = []
+    input_hashes = {}
+    for user_name in user_names:
+        for job in user_jobs.get(user_name, []):
+            job.config_cache = config_cache
+            job.inventory = inventory
+            job.retries = options.retries
+            if state and not options.delete:
+                # jobs whose inputs did not change are neither rendered nor
+                # sent to Jenkins, as long as they still exist; the input
+                # hash covers the command line inputs as well, e.g. the
+                # tarball location
+                stored_input_hash = state.get_job_input_hash(user_name, job.job_name)
+                input_hashes[job.job_name] = job.get_input_hash(version)
+                if input_hashes[job.job_name] == stored_input_hash and inventory.exists(job.job_name):
+                    job.schedule_result = 'unchanged'
+                    skipped_jobs.append(job)
+                    continue
+            jobs.append(job)
+        if user_jobs.get(user_name) and all(job in skipped_jobs for job in user_jobs[user_name]):
+            print "Pipeline of %s unchanged" % user_name
+
+    # render the jobs user by user, so an error in the configuration of one
+    # user neither stops the pipelines of the others nor the saving of the
+    # caches; the Jenkins jobs of such a user are left untouched
+    render_failed_users = []
+    if not options.delete:
+        for user_name in user_names:
+            try:
+                for job in user_jobs.get(user_name, []):
+                    if job not in skipped_jobs:
+                        job.render_job()
+            except Exception as ex:
+                print "Rendering the pipeline for %s failed: %s" % (user_name, ex)
+                failed_users[user_name] = str(ex)
+                render_failed_users.append(user_name)
+                jobs = [job for job in jobs if job not in user_jobs[user_name]]
+
+    # all users share one pool of requests to Jenkins
+    modified_jobs = process_jobs(jobs, options.delete, options.jobs) + [job.job_name for job in skipped_jobs]
+
+    # delete old and no more required jobs; the jobs of users whose
+    # configuration could not be loaded or rendered are kept
+    old_jobs = {}
+    for user_name in user_jobs:
+        if user_name in render_failed_users:
+            old_jobs[user_name] = []
+            continue
+        old_jobs[user_name] = [job for job in inventory.get_user_jobs(user_name) if job not in modified_jobs]
+
+    def get_delete_task(job):
+        def delete_old_job():
+            try:
+                jenkins_instance.delete_job(job)
+            except Exception as ex:
+                print "Deletion of job %s failed: %s" % (job, ex)
+                return False
+            config_cache.discard(job)
+            inventory.discard(job)
+            return True
+        return delete_old_job
+
+    job_scheduler.run_parallel([get_delete_task(job) for job in sum(old_jobs.values(), [])], options.jobs)
+
+    config_cache.save()
+
+    if state:
+        for user_name in user_jobs:
+            if user_name in render_failed_users:
+                continue
+            if options.delete:
+                state.discard_user(user_name)
+                continue
+            # failed jobs are not recorded and thereby retried next time
+            job_states = {}
+            for job in user_jobs[user_name]:
+                if job.schedule_result == 'failed':
+                    continue
+                if job in skipped_jobs:
+                    job_states[job.job_name] = state.users[user_name]['jobs'][job.job_name]
+                else:
+                    job_states[job.job_name] = {'input': input_hashes[job.job_name],
+                                                'config': jenkins_job_creator.get_job_config_hash(job.job_config)}
+            state.set_user(user_name, user_jobs[user_name][0].pipe_inst.get_config_hash(), version, job_states)
+        state.save()
+
+    for user_name in user_names:
+        if user_name not in user_jobs or user_name in render_failed_users:
+            continue
+        failed_jobs = [job.job_name for job in user_jobs[user_name] if job.schedule_result == 'failed']
+        if failed_jobs:
+            failed_users[user_name] = "failed jobs: %s" % ', '.join(failed_jobs)
+        if old_jobs[user_name]:
+            print "Delete old and no more required jobs of %s:\n%s" % (user_name, ''.join("- %s\n" % job for job in old_jobs[user_name]))
+
+
+# schedule cob buildpipeline jobs
+def main():
+    """
+    Create a build and test pipeline on a Jenkins CI server.
+    Starting point is the pipeline coniguration file (pipeline_config.yaml) of
+    the given user stored on github. For this configuration a set of Jenkins
+    projects/jobs will be generated.
+    """
+
+    # parse options
+    usage = "Usage: %prog [masterURL login password configFolder tarballLocation | jenkinsConfigFile] pipelineReposOwner username"
+    parser = optparse.OptionParser(usage)
+    parser.add_option("-m", "--masterURL", action="store", type="string", dest="master_url",
+                      metavar="URL", help="URL of Jenkins server/master")
+    parser.add_option("-l", "--login", action="store", type="string", dest="jenkins_login",
+                      metavar="LOGIN", help="Login name of Jenkins Admin which has rights to create and delete jobs")
+    parser.add_option("-p", "--password", action="store", type="string", dest="jenkins_pw",
+                      metavar="PASSWORD", help="Jenkins Admin password")
+    parser.add_option("-c", "--configFolder", action="store", type="string", dest="config_folder",
+                      metavar="CONFIGFOLDER", help="Folder where '.gitconfig', '.ssh', 'jenkins_setup' and 'jenkins_config' are stored")
+    parser.add_option("-t", "--tarballLocation", action="store", type="string", dest="tarball_location",
+                      metavar="USER@SERVERADDRESS:PATH", help="Place where the Tarballs are located")
+
+    parser.add_option("--jenkinsConfigFile", action="store", type="string", dest="jenkinsConfigFile",
+                      metavar="FILE", help="YAML file that replaces the Jenkins config options and contains values for:\
+                                            masterURL, login, password, configFolder, tarballLocation")
 
-    if delete_msg != "":
-        print "Delete old and no more required jobs:\n" + delete_msg
+    parser.add_option("-o", "--pipelineReposOwner", action="store", type="string", dest="pipeline_repos_owner",
+                      metavar="PIPELINE_REPOS_OWNER", help="Owner of the GitHub repositories 'jenkins_setup' and 'jenkins_config'")
+    parser.add_option("-u", "--username", action="store", type="string", dest="username",
+                      metavar="USERNAME", help="Name of user to generate pipeline for; several users can be given comma-separated")
+    parser.add_option("--allUsers", action="store_true", dest="all_users", default=False,
+                      help="Generate the pipelines of all users with a pipeline_config.yaml in the users folder")
+    parser.add_option("--usersFolder", action="store", type="string", dest="users_folder",
+                      metavar="FOLDER", help="Folder with one sub-folder per user used by --allUsers (default: CONFIGFOLDER/jenkins_config/<master>)")
+    parser.add_option("-d", "--delete", action="store_true", default=False,
+                      help="Delete")
+    parser.add_option("--configCache", action="store", type="string", dest="config_cache",
+                      metavar="FILE", help="YAML file storing the hashes of the job configs pushed to Jenkins; jobs whose config did not change are not reconfigured")
+    parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=1,
+                      metavar="N", help="Render all jobs first and send up to N requests to Jenkins at the same time")
+    parser.add_option("--retries", action="store", type="int", dest="retries", default=2,
+                      metavar="N", help="Number of times a failed request to Jenkins is repeated")
+    parser.add_option("--stateFile", action="store", type="string", dest="state_file",
+                      metavar="FILE", help="YAML file storing the state of the generated pipelines; jobs whose inputs did not change since are skipped")
+    parser.add_option("--render-only", action="store", type="string", dest="render_only",
+                      metavar="DIR", help="Do not contact Jenkins; write the rendered job configs and an index of their hashes to DIR")
+    parser.add_option("--upload", action="store", type="string", dest="upload",
+                      metavar="DIR", help="Push the job configs rendered to DIR by --render-only instead of rendering them; with --configCache only changed configs are sent")
+    (options, args) = parser.parse_args()
+
+    if len(args) != 0:
+        print "Usage: %s [masterURL login password configFolder tarballLocation | jenkinsConfigFile] pipelineReposOwner username" % (sys.argv[0])
+        sys.exit()
+
+    if options.jenkinsConfigFile:
+        # load jenkins config from file
+        with open(os.path.expanduser(options.jenkinsConfigFile)) as f:
+            jenkins_conf = yaml.load(f)
+
+        master_url = jenkins_conf['masterURL']
+        jenkins_login = jenkins_conf['login']
+        jenkins_pw = jenkins_conf['password']
+        tarball_location = jenkins_conf['tarballLocation']
+
+    elif (options.master_url and options.tarball_location and
+          (options.render_only or (options.jenkins_login and options.jenkins_pw))):
+        master_url = options.master_url
+        jenkins_login = options.jenkins_login
+        jenkins_pw = options.jenkins_pw
+        tarball_location = options.tarball_location
+
+    else:
+        print "Usage: %s [masterURL login password configFolder tarballLocation | jenkinsConfigFolder] pipelineReposOwner username" % (sys.argv[0])
+        sys.exit()
+
+    master_name = get_master_name(master_url)
+
+    # create jenkins instance; a dry run does not contact Jenkins at all
+    jenkins_instance = None
+    if not options.render_only:
+        jenkins_instance = jenkins.Jenkins(master_url, jenkins_login, jenkins_pw)
+
+    upload_store = None
+    if options.upload:
+        upload_store = jenkins_job_creator.RenderedJobStore(options.upload)
+
+    if options.all_users:
+        users_folder = options.users_folder
+        if not users_folder:
+            users_folder = os.path.join(options.config_folder or '', 'jenkins_config', master_name)
+        user_names = get_user_names(users_folder)
+    elif options.username:
+        user_names = [user_name for user_name in options.username.split(',') if user_name]
+    elif upload_store:
+        user_names = sorted(set(job_name.split('__')[0] for job_name in upload_store.get_job_names()))
+    else:
+        user_names = []
+
+    if not (options.pipeline_repos_owner or upload_store) or not user_names:
+        print "Usage: %s [masterURL login password configFolder tarballLocation | jenkinsConfigFolder] pipelineReposOwner username" % (sys.argv[0])
+        sys.exit()
+
+    # set up the pipeline jobs of all users
+    failed_users = {}
+    user_jobs = {}
+    for user_name in user_names:
+        print "\nSet up pipeline for %s" % user_name
+        try:
+            if upload_store:
+                # get the job configs rendered by a dry run
+                user_jobs[user_name] = [jenkins_job_creator.RenderedJob(jenkins_instance, job_name, upload_store.read(job_name))
+                                        for job_name in upload_store.get_job_names(user_name)]
+                continue
+
+            # get pipeline configs object from url
+            plc_instance = cob_pipe.CobPipe()
+            plc_instance.load_config_from_url(options.pipeline_repos_owner, master_name, user_name)
+            plc_instance.config_folder = options.config_folder
+
+            user_jobs[user_name] = get_pipeline_jobs(jenkins_instance, plc_instance, tarball_location)
+        except Exception as ex:
+            print "Setting up the pipeline for %s failed: %s" % (user_name, ex)
+            failed_users[user_name] = str(ex)
+
+    if options.render_only:
+        render_jobs(user_names, user_jobs, jenkins_job_creator.RenderedJobStore(options.render_only), failed_users)
+    else:
+        schedule_jobs(user_names, user_jobs, jenkins_instance, options, failed_users)
+
+    if len(user_names) > 1:
+        print "\nGenerated pipelines of %d of %d users" % (len(user_names) - len(failed_users), len(user_names))
+    if failed_users:
+        print "The generation of the following pipelines failed:"
+        for user_name in user_names:
+            if user_name in failed_users:
+                print " %s (%s)" % (user_name, failed_users[user_name])
+        sys.exit(1)
 
     # start buildpipeline by general starter job
     #if options.run:
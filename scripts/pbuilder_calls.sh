@@ -25,5 +25,18 @@ case $1 in
         done
         echo "Going to execute $3 in $2 with the arguments $SCRIPT_ARGS"
         sudo pbuilder --execute --basetgz $2 --save-after-exec -- $3 $SCRIPT_ARGS
+        ;;
+    execute_bind)
+        # parameter: basetgz, directory to bind-mount, script name, script arguments
+        cnt=1
+        SCRIPT_ARGS=""
+        for i in $*; do
+            if [ $cnt -gt 4 ] ; then
+                SCRIPT_ARGS=`echo $SCRIPT_ARGS $i`
+            fi
+            cnt=$(($cnt+1))
+        done
+        echo "Going to execute $4 in $2 with $3 mounted and the arguments $SCRIPT_ARGS"
+        sudo pbuilder --execute --basetgz $2 --save-after-exec --bindmounts $3 -- $4 $SCRIPT_ARGS
 
 esac
@@ -38,6 +38,9 @@ def main():
     pipe_repos = cp_instance.repositories
     common.output("Pipeline configuration successfully loaded", blankline='b')
 
+    # number of parallel jobs of make and rosmake
+    num_jobs = common.get_parallel_jobs(common.get_job_type(), cp_instance.pipeline_config)
+
     # (debug) output
     print "\n", 50 * 'X'
     print datetime.datetime.now()
@@ -103,7 +106,7 @@ def main():
         print "Test wet repository list"
         test_error_msg = None
         try:
-            common.call("make tests", ros_env)
+            common.call("make -j%d tests" % num_jobs, ros_env, capture=True)
         except common.BuildException as ex:
             print ex.msg
             test_error_msg = ex.msg
@@ -118,12 +121,14 @@ def main():
         repo_test_dependencies = common.get_nonlocal_dependencies(catkin_packages, {}, {}, build_depends=False, test_depends=True)
         if repo_test_dependencies != [] and test_error_msg is None:
             print "Install test and run dependencies of repository list: %s" % (', '.join(repo_test_dependencies))
-            common.apt_get_install_also_nonrosdep(repo_test_dependencies, ros_distro, rosdep_resolver)
+            install_plan = common.AptInstallPlan(ros_distro, rosdep_resolver)
+            install_plan.add(repo_test_dependencies, 'test')
+            install_plan.install()
 
             # run tests
             print "Test repository list"
             try:
-                common.call("%smake run_tests" % ("/opt/VirtualGL/bin/vglrun " if graphic_test else ""), ros_env)  # TODO check how to test a list of repos
+                common.call("%smake run_tests" % ("/opt/VirtualGL/bin/vglrun " if graphic_test else ""), ros_env, capture=True)  # TODO check how to test a list of repos
             except common.BuildException as ex:
                 print ex.msg
                 test_error_msg = ex.msg
@@ -152,10 +157,9 @@ def main():
             build_list = " ".join(test_repos_list + [build_repo])
             if build_repo_only:
                 build_list = build_repo
-            common.call("%srosmake -rV --profile %s--test-only --output=%s %s" %
+            common.call("%srosmake -rV --profile --pjobs=%d --test-only --output=%s %s" %
                         ("/opt/VirtualGL/bin/vglrun " if graphic_test else "",
-                         "--pjobs=8 " if not graphic_test else "",
-                         dry_build_logs, build_list), ros_env_repo)
+                         num_jobs, dry_build_logs, build_list), ros_env_repo, capture=True)
         except common.BuildException as ex:
             print ex.msg
 
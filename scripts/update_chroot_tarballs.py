@@ -218,6 +218,19 @@ def process_extend_tarball(ssh, basic, local_abs_basic, extend, local_abs_extend
 
     sys.stdout.flush()
 
+    # store the rosdep database in the chroot, the jobs load it instead of
+    # updating rosdep themselves
+    if tarball_params['ros_distro'] != 'electric':
+        try:
+            jenkins_setup_dir = os.path.dirname(os.getcwd())
+            call("./pbuilder_calls.sh execute_bind %s %s write_rosdep_snapshot.py %s %s"
+                 % (local_abs_extend, jenkins_setup_dir, jenkins_setup_dir,
+                    tarball_params['ros_distro']))
+        except Exception as ex:
+            print "Failed to write rosdep snapshot, jobs will update rosdep themselves: %s" % ex
+
+    sys.stdout.flush()
+
     try:
         put_tarball(ssh, extend, local_abs_extend, remote_abs_extend)
     except Exception as ex:
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+import sys
+import os
+
+
+def main():
+    """
+    Initialize rosdep and write its database snapshot into the chroot
+    """
+
+    if len(sys.argv) < 3:
+        print "Usage: %s jenkins_setup_dir ros_distro" % sys.argv[0]
+        sys.exit(1)
+
+    # the script is copied into the chroot, jenkins_setup is bind-mounted
+    sys.path.insert(0, os.path.join(sys.argv[1], 'src'))
+    from jenkins_setup import rosdep
+
+    ros_distro = sys.argv[2]
+    rosdep_resolver = rosdep.RosDepResolver(ros_distro, snapshot_dir=None)
+    print "Wrote rosdep snapshot %s" % rosdep_resolver.save_snapshot()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,11 @@ Included modules:
     cob_develdistro.py
     cob_pipe.py
     common.py
+    dag.py
     jenkins_job_creator.py
+    job_scheduler.py
+    job_template.py
+    matrix_filter.py
     rosdep.py
+    rosdep_index.py
 """
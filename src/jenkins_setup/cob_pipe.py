@@ -7,6 +7,8 @@ includes all pipeline configurations of given pipline_config.yaml, locally
 stored or on an GitHub account.
 """
 
+import hashlib
+import json
 import yaml
 
 from jenkins_setup import common
@@ -24,6 +26,7 @@ class CobPipe(object):
         self.committer_email_enabled = ""
         self.repositories = {}
         self.pipeline_repos_owner = ""
+        self.pipeline_config = {}
 
     def load_config_from_dict(self, pipeline_config):
         """
@@ -33,6 +36,7 @@ class CobPipe(object):
         @type  pipeline_config: dict
         """
 
+        self.pipeline_config = pipeline_config
         self.user_name = pipeline_config['user_name']
         self.server_name = pipeline_config['server_name']
         self.email = pipeline_config['email']
@@ -59,6 +63,24 @@ class CobPipe(object):
         self.load_config_from_dict(pipeline_config)
         self.pipeline_repos_owner = pipeline_repos_owner
 
+    def get_config_hash(self, repository_fields=None):
+        """
+        Gets the hash of the loaded pipeline configuration
+
+        @param repository_fields: consider only these fields of the repository
+        configurations; all fields if None (optional)
+        @type  repository_fields: list
+
+        @return type: str
+        """
+
+        pipeline_config = dict(self.pipeline_config)
+        if repository_fields is not None:
+            pipeline_config['repositories'] = dict((repo_name, dict((field, repo_data.get(field))
+                                                                    for field in repository_fields))
+                                                   for repo_name, repo_data in pipeline_config.get('repositories', {}).iteritems())
+        return hashlib.sha1(json.dumps(pipeline_config, sort_keys=True, default=str)).hexdigest()
+
     def get_jobs_to_create(self):
         """
         Get a dict of all job types to create and the repositories which will
@@ -7,11 +7,53 @@ import os
 import subprocess
 import sys
 import fnmatch
+import multiprocessing
+import math
+import re
 import yaml
-#import threading
 import time
-#from Queue import Queue
-#from threading import Thread
+import tempfile
+from collections import deque
+from Queue import Queue
+from threading import Thread
+
+from jenkins_setup import dag
+
+# maximal number of output lines buffered between the reader threads of
+# run_command and the console
+OUTPUT_QUEUE_SIZE = 1000
+
+# environments captured by get_ros_env by setup file, its modification time
+# and base environment
+_ros_env_cache = {}
+
+# directories get_all_packages does not search for packages, besides hidden
+# ones like .git or .svn
+PRUNED_DIRS = frozenset(['CVS', '_darcs', 'build', 'build_isolated', 'devel', 'devel_isolated',
+                         'install', 'install_isolated', 'build_logs', 'test_results'])
+
+# packages found by scan_packages by source folder, together with the
+# modification times of the searched directories and parsed package.xml files
+_package_cache = {}
+
+# depend types of catkin packages needed to build and to test them
+BUILD_DEPEND_TYPES = ['buildtool', 'build']
+TEST_DEPEND_TYPES = ['test', 'run']
+
+# parsed manifests by path of the manifest file, with its modification time
+_manifest_cache = {}
+
+# memory a single compiler process may need, in bytes
+MEMORY_PER_BUILD_JOB = 1024 * 1024 * 1024
+
+# mount point of the control groups limiting the resources of the job
+CGROUP_DIR = '/sys/fs/cgroup'
+
+# cgroup v1 memory limits at or above this value mean unlimited
+CGROUP_UNLIMITED = 2 ** 60
+
+# size of the output kept in memory by OutputCapture, in bytes
+OUTPUT_TAIL_SIZE = 64 * 1024
 
 
 def append_pymodules_if_needed():
@@ -23,6 +65,71 @@ def append_pymodules_if_needed():
         sys.path.append("/usr/lib/pymodules/python2.7")
 
 
+class AptPackageIndex(object):
+    """
+    Lazily opened apt package cache, shared by all availability checks of
+    the process. Opening it reads the dpkg status and all package lists, so
+    it is only reopened after the package lists were updated.
+    """
+
+    def __init__(self):
+        self._cache = None
+
+    def get_cache(self):
+        """
+        Gets the apt cache, opens it on first use
+
+        @return type: apt.Cache
+        """
+
+        if self._cache is None:
+            import apt
+            self._cache = apt.Cache()
+        return self._cache
+
+    def reset(self):
+        """
+        Drops the opened cache, e.g. after apt-get update
+        """
+
+        self._cache = None
+
+    def get_unavailable(self, debian_pkgs):
+        """
+        Checks the given Debian packages against the cache in one batch
+
+        @param debian_pkgs: names of Debian packages
+        @type  debian_pkgs: list
+
+        @return param: names of the packages not available, in the given order
+        @return type: list
+        """
+
+        cache = self.get_cache()
+        unavailable_pkgs = []
+        for debian_pkg in debian_pkgs:
+            if debian_pkg not in cache and debian_pkg not in unavailable_pkgs:
+                unavailable_pkgs.append(debian_pkg)
+        return unavailable_pkgs
+
+    def get_not_installed(self, debian_pkgs):
+        """
+        Gets the given Debian packages which are not installed yet
+
+        @param debian_pkgs: names of Debian packages
+        @type  debian_pkgs: list
+
+        @return type: list
+        """
+
+        cache = self.get_cache()
+        return [debian_pkg for debian_pkg in debian_pkgs
+                if debian_pkg not in cache or not cache[debian_pkg].is_installed]
+
+
+_apt_index = AptPackageIndex()
+
+
 def apt_get_update(sudo=False):
     """
     Update apt-get.
@@ -34,6 +141,7 @@ def apt_get_update(sudo=False):
         call("apt-get update")
     else:
         call("sudo apt-get update")
+    _apt_index.reset()
 
 
 def apt_get_install(pkgs, rosdep=None, sudo=False):
@@ -60,6 +168,120 @@ def apt_get_install(pkgs, rosdep=None, sudo=False):
         print "Not installing anything from apt right now."
 
 
+class AptInstallPlan(object):
+    """
+    Collects the Debian packages needed for ros dependencies, possibly of
+    several build and test phases, and installs all of them in a single
+    apt-get transaction. For every Debian package the ros dependencies it
+    was requested for are remembered to name them if something fails.
+    """
+
+    def __init__(self, ros_distro, rosdep=None, sudo=False):
+        """
+        @param ros_distro: name of ros release, e.g. fuerte
+        @type  ros_distro: str
+        @param rosdep: rosdep resolver object (default None)
+        @type  rosdep: rosdep.RosDepResolver
+        @param sudo: execute commands as super-user (default False)
+        @type  sudo: bool
+        """
+
+        self.ros_distro = ros_distro
+        self.rosdep = rosdep
+        self.sudo = sudo
+        self.debian_pkgs = []
+        self.origins = {}
+        self.optional_pkgs = set()
+
+    def add(self, pkgs, phase='build', optional=False):
+        """
+        Adds ros dependencies to the plan. Dependencies known by rosdep are
+        resolved with it, for the others the Debian package name is guessed.
+
+        @param pkgs: names of ros dependencies
+        @type  pkgs: list
+        @param phase: name of the phase the dependencies are needed for
+        @type  phase: str
+        @param optional: skip the packages of these dependencies if they are
+        not available instead of failing
+        @type  optional: bool
+        """
+
+        resolved = self.rosdep.resolve_many(pkgs).resolved if self.rosdep else {}
+        for pkg in pkgs:
+            if pkg in resolved:
+                debian_pkgs = resolved[pkg]
+            else:
+                debian_pkgs = ['-'.join(['ros', self.ros_distro, pkg.replace('_', '-')])]
+            for debian_pkg in debian_pkgs:
+                if debian_pkg not in self.origins:
+                    self.debian_pkgs.append(debian_pkg)
+                    self.origins[debian_pkg] = []
+                    if optional:
+                        self.optional_pkgs.add(debian_pkg)
+                elif not optional:
+                    self.optional_pkgs.discard(debian_pkg)
+                if (pkg, phase) not in self.origins[debian_pkg]:
+                    self.origins[debian_pkg].append((pkg, phase))
+
+    def get_origin(self, debian_pkg):
+        """
+        Gets a description of the ros dependencies a Debian package was
+        requested for
+
+        @param debian_pkg: name of Debian package
+        @type  debian_pkg: str
+
+        @return type: str
+        """
+
+        return ', '.join('%s (%s)' % origin for origin in self.origins.get(debian_pkg, []))
+
+    def install(self):
+        """
+        Installs all packages of the plan which are not installed yet in a
+        single apt-get transaction
+
+        @raise type: BuildException
+        """
+
+        unavailable_pkgs = _apt_index.get_unavailable(self.debian_pkgs)
+        missing_pkgs = [pkg for pkg in unavailable_pkgs if pkg not in self.optional_pkgs]
+        if missing_pkgs != []:
+            raise BuildException("Some dependencies are not available: %s\n%s"
+                                 % (', '.join(missing_pkgs), self._describe(missing_pkgs)))
+        for debian_pkg in unavailable_pkgs:
+            print "Skipping unavailable package %s required by %s" % (debian_pkg, self.get_origin(debian_pkg))
+
+        debian_pkgs = _apt_index.get_not_installed([pkg for pkg in self.debian_pkgs if pkg not in unavailable_pkgs])
+        if debian_pkgs == []:
+            print "Not installing anything from apt right now."
+            return
+
+        command = ['apt-get', 'install', '--yes'] + debian_pkgs
+        if self.sudo:
+            command = ['sudo'] + command
+        print "Executing command '%s'" % ' '.join(command)
+        capture = OutputCapture('apt-get')
+        result = run_command(command, capture=capture)
+        if result.returncode != 0:
+            tail = result.tail
+            failed_pkgs = [pkg for pkg in debian_pkgs if re.search(r'(^|\s)%s(\s|:|$)' % re.escape(pkg), tail, re.M)]
+            failed_pkgs = failed_pkgs or debian_pkgs
+            raise BuildException("Failed to apt-get install %s\n%s"
+                                 % (', '.join(failed_pkgs), self._describe(failed_pkgs)))
+        result.release()
+        _apt_index.reset()
+
+    def _describe(self, debian_pkgs):
+        """
+        Lists the given packages with the ros dependencies they were
+        requested for
+        """
+
+        return '\n'.join(' - %s: required by %s' % (pkg, self.get_origin(pkg)) for pkg in debian_pkgs)
+
+
 def apt_get_install_also_nonrosdep(pkgs, ros_distro, rosdep=None, sudo=False):
     """
     Extend common.apt_get_install by trying to guess Debian package names
@@ -74,37 +296,9 @@ def apt_get_install_also_nonrosdep(pkgs, ros_distro, rosdep=None, sudo=False):
     @param sudo: execute command as super-user (default False)
     @type  sudo: bool
     """
-    rosdep_pkgs = []
-    aptget_pkgs = []
-    unavailable_pkgs = []
-
-    import apt
-    for pkg in pkgs:
-        if rosdep and rosdep.has_ros(pkg):
-            debian_pkgs = rosdep.to_apt(pkg)
-            rosdep_pkgs.append(pkg)
-        else:
-            debian_pkgs = ['-'.join(['ros', ros_distro, pkg.replace('_', '-')])]
-            aptget_pkgs += debian_pkgs
-        # use python apt module to check if Debian package exists
-        for debian_pkg in debian_pkgs:
-            if debian_pkg not in apt.Cache():
-                unavailable_pkgs.append(debian_pkg)
-
-    if unavailable_pkgs != []:
-        raise BuildException("Some dependencies are not available: %s" % (', '.join(unavailable_pkgs)))
-
-    if rosdep_pkgs != []:
-        try:
-            apt_get_install(rosdep_pkgs, rosdep, sudo)
-        except:
-            raise BuildException("Failed to apt-get install rosdep packages")
-
-    if aptget_pkgs != []:
-        try:
-            apt_get_install(aptget_pkgs, sudo=sudo)
-        except:
-            raise BuildException("Failed to apt-get install ros repositories")
+    plan = AptInstallPlan(ros_distro, rosdep, sudo)
+    plan.add(pkgs)
+    plan.install()
 
 
 def copy_test_results(workspace, buildspace, errors=None, prefix='dummy'):
@@ -142,31 +336,287 @@ def copy_test_results(workspace, buildspace, errors=None, prefix='dummy'):
                 f.write('<?xml version="1.0" encoding="UTF-8"?><testsuite tests="1" failures="0" time="1" errors="0" name="dummy test"> <testcase name="dummy rapport" classname="Results" /></testsuite>')
 
 
-def get_ros_env(setup_file):
+def get_ros_env(setup_file, base_env=None):
     """
-    Source the setup_file and return a dictionary of env vars
+    Source the setup_file and return a dictionary of env vars. The
+    environment is captured only once per setup file, its modification time
+    and base environment; every call returns a new dictionary.
 
     @param setup_file: path of file to source
     @type  setup_file: str
+    @param base_env: environment to source the file in (default: os.environ)
+    @type  base_env: dict
 
     @return type: dict
     """
-    res = os.environ
-    print "Retrieve the ROS build environment by sourcing %s" % setup_file
-    command = ['bash', '-c', 'source %s && env' % setup_file]
-    proc = subprocess.Popen(command, stdout=subprocess.PIPE)
-    for line in proc.stdout:
-        (key, _, value) = line.partition("=")
-        res[key] = value.split('\n')[0]
-    proc.communicate()
-    if proc.returncode != 0:
-        msg = "Failed to source %s" % setup_file
-        print r"/!\  %s" % msg
-        raise BuildException(msg)
-    return res
+    if base_env is None:
+        base_env = os.environ
+    try:
+        mtime = os.path.getmtime(setup_file)
+    except OSError:
+        mtime = None
+    key = (os.path.abspath(setup_file), mtime, hash(frozenset(base_env.iteritems())))
+
+    if key not in _ros_env_cache:
+        print "Retrieve the ROS build environment by sourcing %s" % setup_file
+        command = ['bash', '-c', 'source "$0" && env -0', setup_file]
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, env=dict(base_env))
+        output = proc.communicate()[0]
+        if proc.returncode != 0:
+            msg = "Failed to source %s" % setup_file
+            print r"/!\  %s" % msg
+            raise BuildException(msg)
+        env = {}
+        for entry in output.split('\0'):
+            (name, separator, value) = entry.partition('=')
+            if separator:
+                env[name] = value
+        _ros_env_cache[key] = env
+    return dict(_ros_env_cache[key])
+
+
+class OutputCapture(object):
+    """
+    Bounded capture of the output of a command: only the last bytes are kept
+    in memory, the full output is written to a log file
+    """
+
+    def __init__(self, name='command', max_size=OUTPUT_TAIL_SIZE, spill_dir=None):
+        """
+        @param name: name of the command, used as prefix of the log file
+        @type  name: str
+        @param max_size: number of bytes kept in memory
+        @type  max_size: int
+        @param spill_dir: directory of the log file, default: $WORKSPACE; no
+        log file is written if neither is given
+        @type  spill_dir: str
+        """
+
+        self.max_size = max_size
+        self.size = 0
+        self.dropped = False
+        self.lines = deque()
+
+        self.path = None
+        self._spill_file = None
+        spill_dir = spill_dir or os.getenv('WORKSPACE')
+        if spill_dir:
+            spill_dir = os.path.join(spill_dir, 'command_output')
+            if not os.path.isdir(spill_dir):
+                os.makedirs(spill_dir)
+            fd, self.path = tempfile.mkstemp(prefix=os.path.basename(name) + '_', suffix='.log', dir=spill_dir)
+            self._spill_file = os.fdopen(fd, 'w')
+
+    def add(self, line):
+        """
+        Adds a line of output
+
+        @param line: output line
+        @type  line: str
+        """
+
+        if self._spill_file:
+            self._spill_file.write(line)
+        if len(line) > self.max_size:
+            line = line[-self.max_size:]
+        self.lines.append(line)
+        self.size += len(line)
+        while self.size > self.max_size:
+            self.size -= len(self.lines.popleft())
+            self.dropped = True
+
+    def close(self):
+        """
+        Closes the log file
+        """
+
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def remove(self):
+        """
+        Closes and deletes the log file, e.g. after the command succeeded
+        """
+
+        self.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError as ex:
+                print "Could not remove %s: %s" % (self.path, ex)
+            self.path = None
+
+    def get_tail(self):
+        """
+        Gets the last output kept in memory
+
+        @return type: str
+        """
+
+        return ''.join(self.lines)
+
+    def get_full_output(self):
+        """
+        Gets the full output, read from the log file
+
+        @return: full output, None if it is neither in memory nor in a log
+        file, ``str``
+        """
+
+        if not self.dropped:
+            return self.get_tail()
+        if not self.path:
+            return None
+        with open(self.path) as f:
+            return f.read()
+
+
+class CommandResult(object):
+    """
+    Output, return code and duration of a command executed by run_command
+    """
+
+    def __init__(self, command, chunks, returncode, duration, capture=None):
+        """
+        @param command: the executed command
+        @type  command: list
+        @param chunks: output lines in the order they arrived, as tuples of
+        stream name (stdout or stderr) and line
+        @type  chunks: list
+        @param returncode: exit code of the command
+        @type  returncode: int
+        @param duration: wall time in seconds
+        @type  duration: float
+        @param capture: bounded capture of the combined output, replaces
+        chunks (optional)
+        @type  capture: OutputCapture
+        """
+
+        self.command = command
+        self.chunks = chunks
+        self.returncode = returncode
+        self.duration = duration
+        self.capture = capture
+
+    @property
+    def output(self):
+        """
+        Output of the command on stdout, ``str``; None if it was captured,
+        as the capture does not separate the streams
+        """
+
+        if self.capture:
+            return None
+        return ''.join(line for stream, line in self.chunks if stream == 'stdout')
+
+    @property
+    def error_output(self):
+        """
+        Output of the command on stderr, ``str``; None if it was captured,
+        as the capture does not separate the streams
+        """
+
+        if self.capture:
+            return None
+        return ''.join(line for stream, line in self.chunks if stream == 'stderr')
+
+    @property
+    def combined_output(self):
+        """
+        Output of the command on stdout and stderr as it arrived, ``str``
+        """
+
+        if self.capture:
+            return self.capture.get_full_output()
+        return ''.join(line for stream, line in self.chunks)
+
+    @property
+    def tail(self):
+        """
+        Last part of the combined output, ``str``
+        """
+
+        if self.capture:
+            return self.capture.get_tail()
+        return self.combined_output[-OUTPUT_TAIL_SIZE:]
+
+    def release(self):
+        """
+        Deletes the log file of the captured output, afterwards only the
+        last part of the output is available
+        """
+
+        if self.capture:
+            self.capture.remove()
+
+
+def _read_stream(stream, name, queue):
+    """
+    Puts all lines of the given stream into the queue, followed by None
+    """
+
+    for line in iter(stream.readline, ''):
+        queue.put((name, line))
+    stream.close()
+    queue.put((name, None))
+
+
+def run_command(command, envir=None, verbose=True, capture=None):
+    """
+    Executes a command and streams its stdout and stderr to the console
+    while it is running. Both streams are drained concurrently, so the
+    command can neither block on a full pipe nor get delayed by polling.
 
+    @param command: the command to call
+    @type  command: list
+    @param envir: mapping of env variables
+    @type  envir: dict
+    @param verbose: print the output of the command
+    @type  verbose: bool
+    @param capture: keep only a bounded part of the output in memory
+    (optional)
+    @type  capture: OutputCapture
 
-def call_with_list(command, envir=None, verbose=True):
+    @return type: CommandResult
+    """
+
+    start_time = time.time()
+    helper = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True, env=envir)
+
+    queue = Queue(OUTPUT_QUEUE_SIZE)
+    readers = [Thread(target=_read_stream, args=(helper.stdout, 'stdout', queue)),
+               Thread(target=_read_stream, args=(helper.stderr, 'stderr', queue))]
+    for reader in readers:
+        reader.daemon = True
+        reader.start()
+
+    consoles = {'stdout': sys.stdout, 'stderr': sys.stderr}
+    chunks = []
+    open_streams = len(readers)
+    while open_streams:
+        stream, line = queue.get()
+        if line is None:
+            open_streams -= 1
+            continue
+        if capture:
+            capture.add(line)
+        else:
+            chunks.append((stream, line))
+        if verbose:
+            consoles[stream].write(line)
+            consoles[stream].flush()
+
+    for reader in readers:
+        reader.join()
+    helper.wait()
+    if capture:
+        capture.close()
+
+    return CommandResult(command, chunks, helper.returncode, time.time() - start_time, capture)
+
+
+def call_with_list(command, envir=None, verbose=True, capture=False):
     """
     Call a shell command as list.
 
@@ -176,36 +626,34 @@ def call_with_list(command, envir=None, verbose=True):
     @type  envir: dict
     @param verbose: print all
     @type  verbose: bool
+    @param capture: keep only the last part of the output in memory and
+    write the full output to a log file in $WORKSPACE
+    @type  capture: bool
 
-    @return param: command output
-    @return type: str
+    @return param: command output; if captured the result of the command,
+    its log file is kept until the caller releases it
+    @return type: str or CommandResult
 
     @raise type: BuildException
     """
     print "Executing command '%s'" % ' '.join(command)
-    helper = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True, env=envir)
-    res = ""
-    while helper.poll() is None:
-        command_output = helper.stdout.readline()
-        res += command_output
-        if verbose:
-            sys.stdout.write(command_output)
-        time.sleep(0.1)  # TODO What is a good value here? Without this delay it's busy looping
-
-    #make sure to capture the last line(s)
-    command_output = helper.stdout.read()
-    res += command_output
-    if verbose:
-        print command_output
+    if capture:
+        result = run_command(command, envir, verbose, OutputCapture(command[0]))
+    else:
+        result = run_command(command, envir, verbose)
 
-    if helper.returncode != 0:
+    if result.returncode != 0:
         msg = "Failed to execute command '%s'" % command
         print r"/!\  %s" % msg
+        if result.capture and result.capture.path:
+            print "Full output of the command: %s" % result.capture.path
         raise BuildException(msg)
-    return res
+    if capture:
+        return result
+    return result.output
 
 
-def call(command, envir=None, verbose=True):
+def call(command, envir=None, verbose=True, capture=False):
     """
     Call a shell command.
 
@@ -215,10 +663,16 @@ def call(command, envir=None, verbose=True):
     @type  envir: dict
     @param verbose: print all
     @type  verbose: bool
+    @param capture: keep only the last part of the output in memory and
+    write the full output to a log file in $WORKSPACE
+    @type  capture: bool
 
-    @return param: command output
-    @return type: str
+    @return param: command output; if captured the result of the command,
+    its log file is kept until the caller releases it
+    @return type: str or CommandResult
     """
+    if capture:
+        return call_with_list(command.split(' '), envir, verbose, capture)
     return call_with_list(command.split(' '), envir, verbose)
 
 
@@ -245,7 +699,41 @@ def output(message, decoration='*', blankline='a'):
         print ''
 
 
-def get_catkin_stack_deps(xml_path):
+class ManifestInfo(object):
+    """
+    Name and dependencies of a catkin package, stack or manifest package
+    """
+
+    def __init__(self, name, depends=(), buildtool_depends=(), build_depends=(),
+                 test_depends=(), run_depends=(), is_catkin=False):
+        """
+        @param name: name of package or stack
+        @type  name: str
+        @param depends: dependencies of a stack or manifest package, including
+        its rosdeps
+        @type  depends: tuple
+        @param buildtool_depends: buildtool dependencies of a catkin package
+        @type  buildtool_depends: tuple
+        @param build_depends: build dependencies of a catkin package
+        @type  build_depends: tuple
+        @param test_depends: test dependencies of a catkin package
+        @type  test_depends: tuple
+        @param run_depends: run dependencies of a catkin package
+        @type  run_depends: tuple
+        @param is_catkin: whether a stack is a catkin stack
+        @type  is_catkin: bool
+        """
+
+        self.name = name
+        self.depends = depends
+        self.buildtool_depends = buildtool_depends
+        self.build_depends = build_depends
+        self.test_depends = test_depends
+        self.run_depends = run_depends
+        self.is_catkin = is_catkin
+
+
+def _parse_catkin_stack_deps(xml_path):
     import xml.etree.ElementTree as ET
     tree = ET.parse(xml_path)
     root = tree.getroot()
@@ -254,45 +742,154 @@ def get_catkin_stack_deps(xml_path):
                     + [d.text for d in root.findall('run_depends')]))
 
 
-def get_nonlocal_dependencies(catkin_packages, stacks, manifest_packages, build_depends=True, test_depends=True):
+def _parse_manifest(path, manifest_type):
+    """
+    Parses a package.xml, stack.xml or manifest.xml file
+    """
+
     append_pymodules_if_needed()
-    from catkin_pkg import packages
+    if manifest_type == 'package.xml':
+        from catkin_pkg import packages
+        pkg_info = packages.parse_package(path)
+        return ManifestInfo(pkg_info.name,
+                            buildtool_depends=tuple(d.name for d in pkg_info.buildtool_depends),
+                            build_depends=tuple(d.name for d in pkg_info.build_depends),
+                            test_depends=tuple(d.name for d in pkg_info.test_depends),
+                            run_depends=tuple(d.name for d in pkg_info.run_depends))
+
     import rospkg
+    manifest = rospkg.parse_manifest_file(path, manifest_type)
+    if manifest_type == 'stack.xml' and manifest.is_catkin:
+        return ManifestInfo(os.path.basename(path), is_catkin=True,
+                            depends=tuple(_parse_catkin_stack_deps(os.path.join(path, manifest_type))))
+    return ManifestInfo(os.path.basename(path), depends=tuple(d.name for d in manifest.depends + manifest.rosdeps))
+
+
+def get_manifest(path, manifest_type='package.xml'):
+    """
+    Gets the parsed manifest of a package or stack. Every manifest file is
+    parsed only once as long as it does not change.
+
+    @param path: path of package or stack directory
+    @type  path: str
+    @param manifest_type: package.xml, stack.xml or manifest.xml
+    @type  manifest_type: str
+
+    @return type: ManifestInfo
+    """
+
+    manifest_file = os.path.abspath(os.path.join(path, manifest_type))
+    mtime = os.path.getmtime(manifest_file)
+    cached = _manifest_cache.get(manifest_file)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, _parse_manifest(path, manifest_type))
+        _manifest_cache[manifest_file] = cached
+    return cached[1]
 
-    depends = []
+
+def get_catkin_stack_deps(xml_path):
+    return list(get_manifest(os.path.dirname(xml_path), os.path.basename(xml_path)).depends)
+
+
+class DependencyList(list):
+    """
+    List of unique dependencies in the order they were found. For every
+    dependency the local packages which pulled it in and the depend types
+    are recorded in origins.
+    """
+
+    def __init__(self, dependencies=()):
+        """
+        @param dependencies: names of dependencies without origin
+        @type  dependencies: list
+        """
+
+        super(DependencyList, self).__init__()
+        self.origins = {}
+        for dependency in dependencies:
+            self.add(dependency)
+
+    def add(self, dependency, package=None, depend_type=None):
+        """
+        Adds a dependency if not yet included and records its origin
+
+        @param dependency: name of dependency
+        @type  dependency: str
+        @param package: name of the local package depending on it
+        @type  package: str
+        @param depend_type: type of dependency, e.g. build or test
+        @type  depend_type: str
+        """
+
+        origins = self.origins.get(dependency)
+        if origins is None:
+            origins = self.origins[dependency] = []
+            self.append(dependency)
+        if package is not None and (package, depend_type) not in origins:
+            origins.append((package, depend_type))
+
+    def get_by_type(self, *depend_types):
+        """
+        Gets the dependencies pulled in with one of the given depend types
+
+        @param depend_types: types of dependency, e.g. build, buildtool
+        @type  depend_types: str
+
+        @return type: DependencyList
+        """
+
+        result = DependencyList()
+        for dependency in self:
+            for package, depend_type in self.origins[dependency]:
+                if depend_type in depend_types:
+                    result.add(dependency, package, depend_type)
+        return result
+
+
+def get_nonlocal_dependencies(catkin_packages, stacks, manifest_packages, build_depends=True, test_depends=True):
+    """
+    Get the dependencies of the given packages which are not part of them
+
+    @param catkin_packages: catkin packages and their paths
+    @type  catkin_packages: dict
+    @param stacks: dry stacks and their paths
+    @type  stacks: dict
+    @param manifest_packages: dry packages and their paths
+    @type  manifest_packages: dict
+    @param build_depends: get build and buildtool dependencies of catkin packages
+    @type  build_depends: bool
+    @param test_depends: get test and run dependencies of catkin packages
+    @type  test_depends: bool
+
+    @return type: DependencyList
+    """
+    depends = DependencyList()
     #First, we build the catkin deps
+    depend_types = []
+    if build_depends:
+        depend_types += BUILD_DEPEND_TYPES
+    if test_depends:
+        depend_types += TEST_DEPEND_TYPES
     for name, path in catkin_packages.iteritems():
-        pkg_info = packages.parse_package(path)
-        if build_depends:
-            depends.extend([d.name
-                            for d in pkg_info.buildtool_depends + pkg_info.build_depends
-                            if not d.name in catkin_packages and not d.name in depends])
-        if test_depends:
-            depends.extend([d.name
-                            for d in pkg_info.test_depends + pkg_info.run_depends
-                            if not d.name in catkin_packages and not d.name in depends])
+        pkg_info = get_manifest(path, 'package.xml')
+        for depend_type in depend_types:
+            for d in getattr(pkg_info, depend_type + '_depends'):
+                if not d in catkin_packages:
+                    depends.add(d, name, depend_type)
 
     #Next, we build the manifest deps for stacks
     for name, path in stacks.iteritems():
-        stack_manifest = rospkg.parse_manifest_file(path, rospkg.STACK_FILE)
-        if stack_manifest.is_catkin:
-            depends.extend(get_catkin_stack_deps(os.path.join(path, 'stack.xml')))
-        else:
-            depends.extend([d.name
-                            for d in stack_manifest.depends + stack_manifest.rosdeps
-                            if not d.name in catkin_packages
-                            and not d.name in stacks
-                            and not d.name in depends])
+        stack_manifest = get_manifest(path, 'stack.xml')
+        for d in stack_manifest.depends:
+            if stack_manifest.is_catkin or (not d in catkin_packages and not d in stacks):
+                depends.add(d, name, 'depend')
 
     #Next, we build manifest deps for packages
     for name, path in manifest_packages.iteritems():
-        pkg_manifest = rospkg.parse_manifest_file(path, rospkg.MANIFEST_FILE)
-        depends.extend([d.name
-                        for d in pkg_manifest.depends + pkg_manifest.rosdeps
-                        if not d.name in catkin_packages
-                        and not d.name in stacks
-                        and not d.name in manifest_packages
-                        and not d.name in depends])
+        pkg_manifest = get_manifest(path, 'manifest.xml')
+        for d in pkg_manifest.depends:
+            if not d in catkin_packages and not d in stacks and not d in manifest_packages:
+                depends.add(d, name, 'depend')
 
     return depends
 
@@ -312,6 +909,83 @@ def get_dry_packages(source_folder):
     return (stacks, manifest_packages)
 
 
+def _scan_directory(path, searches, results, mtimes):
+    """
+    Searches a directory and its subdirectories for the given manifest
+    types, like rospkg.list_by_path does for each of them, but in a single
+    traversal. A search stops descending at the packages it found, the
+    directory is left when all searches stopped.
+    """
+
+    try:
+        mtimes[path] = os.path.getmtime(path)
+        names = os.listdir(path)
+    except OSError:
+        return
+    if 'CATKIN_IGNORE' in names:
+        return
+
+    package_name = None
+    is_metapackage = False
+    if 'package.xml' in names:
+        import xml.etree.ElementTree as ET
+        package_file = os.path.join(path, 'package.xml')
+        mtimes[package_file] = os.path.getmtime(package_file)
+        root = ET.parse(package_file).getroot()
+        package_name = root.findtext('name').strip(' \n\r\t')
+        is_metapackage = root.find('./export/metapackage') is not None
+
+    remaining = []
+    for manifest_name in searches:
+        if package_name is not None and (manifest_name == 'package.xml'
+                                         or (manifest_name == 'stack.xml') == is_metapackage):
+            results[manifest_name].setdefault(package_name, path)
+        elif manifest_name in names:
+            results[manifest_name].setdefault(os.path.basename(path), path)
+        elif 'manifest.xml' not in names and 'package.xml' not in names and 'rospack_nosubdirs' not in names:
+            remaining.append(manifest_name)
+    if remaining == []:
+        return
+
+    for name in names:
+        subdir = os.path.join(path, name)
+        if name[0] != '.' and name not in PRUNED_DIRS and os.path.isdir(subdir):
+            _scan_directory(subdir, remaining, results, mtimes)
+
+
+def scan_packages(source_folder):
+    """
+    Finds all catkin packages, stacks and manifest packages in a source
+    folder in one traversal. The result is cached until one of the searched
+    directories or package.xml files changes.
+
+    @param source_folder: path to search
+    @type  source_folder: str
+
+    @return param: dicts of catkin packages, stacks and manifest packages
+    and their paths
+    @return type: tuple
+    """
+
+    source_folder = os.path.abspath(source_folder)
+    cached = _package_cache.get(source_folder)
+    if cached is not None:
+        mtimes, results = cached
+        try:
+            if all(os.path.getmtime(path) == mtime for path, mtime in mtimes.iteritems()):
+                return tuple(dict(result) for result in results)
+        except OSError:
+            pass
+
+    searches = ['package.xml', 'stack.xml', 'manifest.xml']
+    found = dict((manifest_name, {}) for manifest_name in searches)
+    mtimes = {}
+    _scan_directory(source_folder, searches, found, mtimes)
+    results = tuple(found[manifest_name] for manifest_name in searches)
+    _package_cache[source_folder] = (mtimes, results)
+    return tuple(dict(result) for result in results)
+
+
 def get_all_packages(source_folder, filter_=True):
     """
     Get all packages (wet and dry)
@@ -324,15 +998,7 @@ def get_all_packages(source_folder, filter_=True):
     @return param: list of catkin packages, dry stacks and dry packages
     @return type: tuple
     """
-    import rospkg
-
-    catkin_packages = {}
-    stacks = {}
-    manifest_packages = {}
-
-    rospkg.list_by_path('package.xml', source_folder, catkin_packages)
-    rospkg.list_by_path('stack.xml', source_folder, stacks)
-    rospkg.list_by_path('manifest.xml', source_folder, manifest_packages)
+    (catkin_packages, stacks, manifest_packages) = scan_packages(source_folder)
 
     # if repo has package.xml and stack.xml/manifest.xml
     # remove stack/manifest entries
@@ -347,26 +1013,22 @@ def get_all_packages(source_folder, filter_=True):
 
 
 def build_local_dependency_graph(catkin_packages, manifest_packages):
-    append_pymodules_if_needed()
-    from catkin_pkg import packages
-    import rospkg
-
     depends = {}
     #First, we build the catkin dep tree
     for name, path in catkin_packages.iteritems():
         depends[name] = []
-        pkg_info = packages.parse_package(path)
+        pkg_info = get_manifest(path, 'package.xml')
         for dep in pkg_info.buildtool_depends + pkg_info.build_depends + pkg_info.test_depends + pkg_info.run_depends:
-            if dep.name in catkin_packages and dep.name != name:
-                depends[name].append(dep.name)
+            if dep in catkin_packages and dep != name:
+                depends[name].append(dep)
 
     #Next, we build the manifest dep tree
     for name, path in manifest_packages.iteritems():
-        manifest = rospkg.parse_manifest_file(path, rospkg.MANIFEST_FILE)
+        manifest = get_manifest(path, 'manifest.xml')
         depends[name] = []
-        for dep in manifest.depends + manifest.rosdeps:
-            if (dep.name in catkin_packages or dep.name in manifest_packages) and dep.name != name:
-                depends[name].append(str(dep.name))
+        for dep in manifest.depends:
+            if (dep in catkin_packages or dep in manifest_packages) and dep != name:
+                depends[name].append(str(dep))
 
     return depends
 
@@ -376,10 +1038,8 @@ def reorder_paths(order, packages, paths):
     Reorder paths
     """
     #we want to make sure that we can still associate packages with paths
-    new_paths = []
-    for package in order:
-        old_index = [i for i, name in enumerate(packages) if package == name][0]
-        new_paths.append(paths[old_index])
+    package_paths = dict(zip(packages, paths))
+    new_paths = [package_paths[package] for package in order]
 
     return order, new_paths
 
@@ -390,18 +1050,23 @@ def get_dependency_build_order(depends):
 
     @param depends: packages and their dependencies
     @type  depends: dict
+
+    @raise type: dag.CycleError
     """
-    import networkx as nx
-    graph = nx.DiGraph()
+    return dag.get_build_order(depends)
+
 
-    for name, deps in depends.iteritems():
-        graph.add_node(name)
-        graph.add_edges_from([(name, d) for d in deps])
+def get_dependency_build_levels(depends):
+    """
+    Get groups of dependencies which can be built in parallel, one group
+    after the other
 
-    order = nx.topological_sort(graph)
-    order.reverse()
+    @param depends: packages and their dependencies
+    @type  depends: dict
 
-    return order
+    @raise type: dag.CycleError
+    """
+    return dag.get_build_levels(depends)
 
 
 def get_dependencies(source_folder, build_depends=True, test_depends=True):
@@ -416,32 +1081,232 @@ def get_dependencies(source_folder, build_depends=True, test_depends=True):
     @type  test_depends: bool
 
     @return param: build and/or test dependencies
-    @return type:  list
+    @return type:  DependencyList
     """
     print "Get the dependencies of source folder %s" % source_folder
-    append_pymodules_if_needed()
-    from catkin_pkg import packages
-    pkgs = packages.find_packages(source_folder)
-    local_packages = [p.name for p in pkgs.values()]
+    pkgs = [get_manifest(path, 'package.xml') for path in scan_packages(source_folder)[0].itervalues()]
+    local_packages = [p.name for p in pkgs]
     if len(pkgs) > 0:
         print "In folder %s, found packages %s" % (source_folder, ', '.join(local_packages))
     else:
         raise BuildException("Found no packages in folder %s. Are you sure your packages have a packages.xml file?" % source_folder)
 
-    depends = []
-    for name, pkg in pkgs.iteritems():
-        if build_depends:
-            for dep in pkg.build_depends + pkg.buildtool_depends:
-                if not dep.name in depends and not dep.name in local_packages:
-                    depends.append(dep.name)
-        if test_depends:
-            for dep in pkg.test_depends + pkg.run_depends:
-                if not dep.name in depends and not dep.name in local_packages:
-                    depends.append(dep.name)
+    depend_types = []
+    if build_depends:
+        depend_types += ['build', 'buildtool']
+    if test_depends:
+        depend_types += TEST_DEPEND_TYPES
+    local_packages = set(local_packages)
+    depends = DependencyList()
+    for pkg in pkgs:
+        for depend_type in depend_types:
+            for dep in getattr(pkg, depend_type + '_depends'):
+                if not dep in local_packages:
+                    depends.add(dep, pkg.name, depend_type)
 
     return depends
 
 
+def _read_first_line(*paths):
+    """
+    Reads the first line of the first of the given files which exists
+    """
+    for path in paths:
+        try:
+            with open(path) as f:
+                return f.readline().strip()
+        except IOError:
+            pass
+    return None
+
+
+def get_cgroup_cpu_limit(cgroup_dir=CGROUP_DIR):
+    """
+    Get the number of CPUs the control group of the process may use
+
+    @param cgroup_dir: mount point of the control groups
+    @type  cgroup_dir: str
+
+    @return param: number of CPUs, None if not limited
+    @return type: float
+    """
+    try:
+        cpu_max = _read_first_line(os.path.join(cgroup_dir, 'cpu.max'))
+        if cpu_max is not None:
+            quota, period = cpu_max.split()
+        else:
+            quota = _read_first_line(os.path.join(cgroup_dir, 'cpu', 'cpu.cfs_quota_us'),
+                                     os.path.join(cgroup_dir, 'cpu,cpuacct', 'cpu.cfs_quota_us'))
+            period = _read_first_line(os.path.join(cgroup_dir, 'cpu', 'cpu.cfs_period_us'),
+                                      os.path.join(cgroup_dir, 'cpu,cpuacct', 'cpu.cfs_period_us'))
+        if quota is None or period is None or quota == 'max' or int(quota) <= 0:
+            return None
+        return float(quota) / int(period)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def get_cgroup_memory_limit(cgroup_dir=CGROUP_DIR):
+    """
+    Get the memory the control group of the process may use
+
+    @param cgroup_dir: mount point of the control groups
+    @type  cgroup_dir: str
+
+    @return param: memory in bytes, None if not limited
+    @return type: int
+    """
+    limit = _read_first_line(os.path.join(cgroup_dir, 'memory.max'),
+                             os.path.join(cgroup_dir, 'memory', 'memory.limit_in_bytes'))
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return None
+    # cgroup v1 reports a huge number if not limited
+    if limit >= CGROUP_UNLIMITED:
+        return None
+    return limit
+
+
+def get_cpu_count(cgroup_dir=CGROUP_DIR):
+    """
+    Get the number of CPUs the process may use
+
+    @param cgroup_dir: mount point of the control groups
+    @type  cgroup_dir: str
+
+    @return type: int
+    """
+    try:
+        cpus = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpus = 1
+    cpu_limit = get_cgroup_cpu_limit(cgroup_dir)
+    if cpu_limit is not None:
+        cpus = min(cpus, int(math.ceil(cpu_limit)))
+    return max(1, cpus)
+
+
+def get_available_memory(meminfo_file='/proc/meminfo', cgroup_dir=CGROUP_DIR):
+    """
+    Get the memory available for new processes, limited by the control group
+    of the process
+
+    @param meminfo_file: path of meminfo file
+    @type  meminfo_file: str
+    @param cgroup_dir: mount point of the control groups
+    @type  cgroup_dir: str
+
+    @return param: memory in bytes, None if unknown
+    @return type: int
+    """
+    meminfo = {}
+    try:
+        with open(meminfo_file) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2:
+                    meminfo[fields[0].rstrip(':')] = int(fields[1]) * 1024
+    except (IOError, ValueError):
+        pass
+
+    if 'MemAvailable' in meminfo:
+        memory = meminfo['MemAvailable']
+    elif 'MemFree' in meminfo:
+        # kernels before 3.14 do not estimate the available memory
+        memory = sum(meminfo.get(field, 0) for field in ['MemFree', 'Buffers', 'Cached'])
+    else:
+        memory = None
+
+    memory_limit = get_cgroup_memory_limit(cgroup_dir)
+    if memory_limit is not None:
+        memory = memory_limit if memory is None else min(memory, memory_limit)
+    return memory
+
+
+def _get_base_job_type(job_type):
+    """
+    Removes the prio or regular prefix of a job type
+    """
+    return re.sub('^(prio|regular)_', '', job_type)
+
+
+def get_parallel_jobs_override(pipeline_config, job_type):
+    """
+    Get the number of parallel jobs configured for a job type in the
+    'parallel_jobs' entry of the pipeline configuration, either a number for
+    all job types or a dict of job types, e.g.
+    {'build': 4, 'graphics_test': 2, 'default': 8}. Prio and regular jobs
+    fall back to the entry of their job type without prefix.
+
+    @param pipeline_config: pipeline configuration
+    @type  pipeline_config: dict
+    @param job_type: job type, e.g. 'prio_build'
+    @type  job_type: str
+
+    @return param: number of parallel jobs, None if not configured
+    @return type: int
+    """
+    if not pipeline_config or pipeline_config.get('parallel_jobs') is None:
+        return None
+    parallel_jobs = pipeline_config['parallel_jobs']
+    if isinstance(parallel_jobs, dict):
+        keys = [job_type, _get_base_job_type(job_type or ''), 'default']
+        parallel_jobs = next((parallel_jobs[key] for key in keys if key in parallel_jobs), None)
+        if parallel_jobs is None:
+            return None
+    try:
+        parallel_jobs = int(parallel_jobs)
+    except (TypeError, ValueError):
+        parallel_jobs = 0
+    if parallel_jobs < 1:
+        print "Ignoring invalid number of parallel jobs %s for %s" % (pipeline_config['parallel_jobs'], job_type)
+        return None
+    return parallel_jobs
+
+
+def get_parallel_jobs(job_type=None, pipeline_config=None, memory_per_job=MEMORY_PER_BUILD_JOB):
+    """
+    Get the number of jobs to pass to rosinstall, make and rosmake. It is
+    taken from the pipeline configuration if configured for the job type,
+    graphics tests run one job at a time by default as they share a single
+    display, otherwise it is one job per usable CPU as long as the available
+    memory suffices.
+
+    @param job_type: job type, e.g. 'prio_build' (optional)
+    @type  job_type: str
+    @param pipeline_config: pipeline configuration (optional)
+    @type  pipeline_config: dict
+    @param memory_per_job: memory a single job may need, in bytes
+    @type  memory_per_job: int
+
+    @return type: int
+    """
+    parallel_jobs = get_parallel_jobs_override(pipeline_config, job_type)
+    if parallel_jobs is not None:
+        return parallel_jobs
+    if _get_base_job_type(job_type or '') in ['graphics_test', 'graphic_test']:
+        return 1
+    jobs = get_cpu_count()
+    memory = get_available_memory()
+    if memory is not None:
+        jobs = min(jobs, memory // memory_per_job)
+    return max(1, jobs)
+
+
+def get_job_type(script_path=None):
+    """
+    Get the job type of a job script from its file name, the scripts of all
+    job types are links to the generic ones
+
+    @param script_path: path of job script (default: the running one)
+    @type  script_path: str
+
+    @return type: str
+    """
+    return os.path.splitext(os.path.basename(script_path or sys.argv[0]))[0]
+
+
 def get_buildpipeline_configs(server_name, user_name, config_repo=None):
     """
     Get buildpipeline configuration
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+"""
+This module provides the functions get_build_order and get_build_levels and
+the exception CycleError. They sort packages by their dependencies, given as
+dict of package names and the names of the packages they depend on.
+
+Both are based on Kahn's algorithm: the packages without unbuilt
+dependencies form the next build level, all packages of a level can be built
+in parallel. Packages ready at the same time are ordered by name, so the
+result does not depend on the dict order.
+"""
+
+
+class CycleError(Exception):
+    """
+    The dependencies contain a cycle
+    """
+
+    def __init__(self, cycle):
+        """
+        @param cycle: packages forming the cycle, the first one repeated at
+        the end
+        @type  cycle: list
+        """
+
+        self.cycle = cycle
+        self.msg = "Dependency cycle: %s" % ' -> '.join(cycle)
+        super(CycleError, self).__init__(self.msg)
+
+
+def _find_cycle(depends, remaining):
+    """
+    Finds a cycle among the packages which could not be sorted
+    """
+
+    path = []
+    on_path = {}
+    name = min(remaining)
+    while name not in on_path:
+        on_path[name] = len(path)
+        path.append(name)
+        name = min(dep for dep in depends.get(name, []) if dep in remaining and dep != name)
+    return path[on_path[name]:] + [name]
+
+
+def get_build_levels(depends):
+    """
+    Groups the packages into levels which can be built one after the other,
+    each package after all its dependencies
+
+    @param depends: packages and their dependencies; dependencies which are
+    no keys are treated as packages without dependencies
+    @type  depends: dict
+
+    @return param: package names of each level, sorted by name
+    @return type: list of lists
+
+    @raise type: CycleError
+    """
+
+    dependents = {}
+    missing = {}
+    for name, deps in depends.iteritems():
+        deps = set(deps)
+        deps.discard(name)
+        missing[name] = len(deps)
+        for dep in deps:
+            dependents.setdefault(dep, []).append(name)
+            missing.setdefault(dep, 0)
+
+    levels = []
+    level = sorted(name for name, count in missing.iteritems() if count == 0)
+    done = 0
+    while level:
+        levels.append(level)
+        done += len(level)
+        next_level = []
+        for name in level:
+            for dependent in dependents.get(name, []):
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    next_level.append(dependent)
+        level = sorted(next_level)
+
+    if done < len(missing):
+        remaining = set(name for name, count in missing.iteritems() if count > 0)
+        raise CycleError(_find_cycle(depends, remaining))
+
+    return levels
+
+
+def get_build_order(depends):
+    """
+    Sorts the packages so that every package follows its dependencies
+
+    @param depends: packages and their dependencies
+    @type  depends: dict
+
+    @return type: list
+
+    @raise type: CycleError
+    """
+
+    return [name for level in get_build_levels(depends) for name in level]
@@ -2,16 +2,473 @@
 
 import datetime
 import socket
-import pkg_resources
-import yaml
+import hashlib
+import httplib
+import json
+import os
 import re
+import sys
+import threading
+import time
+import urllib2
+import yaml
 from jenkins import JenkinsException
 
+from jenkins_setup import job_template, matrix_filter
+
+# generation stamp in the job description, see templates/job_config.xml
+GENERATION_STAMP_PATTERN = re.compile(r' on \S* at \d{4}-\d{2}-\d{2} \d{2}:\d{2} from ')
+
+# errors a request to Jenkins can fail with
+JENKINS_REQUEST_ERRORS = (JenkinsException, urllib2.URLError, httplib.HTTPException, socket.error)
+
+# HTTP status of a server error, which python-jenkins reports for some
+# requests as JenkinsException
+SERVER_ERROR_PATTERN = re.compile(r'\[5\d\d\]')
+
+
+def normalize_job_config(job_config):
+    """
+    Removes the volatile parts of a job config, i.e. the generation stamp
+    (hostname and time), the xml declaration and the formatting, so that a
+    config rendered by us can be compared with the one stored on Jenkins
+
+    @param job_config: job config xml
+    @type  job_config: str
+
+    @return type: str
+    """
+
+    job_config = GENERATION_STAMP_PATTERN.sub(' on HOSTNAME at TIME from ', job_config, count=1)
+    job_config = re.sub(r'^\s*<\?xml[^>]*\?>', '', job_config)
+    job_config = re.sub(r'>\s+<', '><', job_config.strip())
+    job_config = re.sub(r'<([\w.\-]+)([^<>]*)></\1>', r'<\1\2/>', job_config)
+    return job_config
+
+
+def get_job_config_hash(job_config):
+    """
+    Gets the hash of the normalized job config
+
+    @param job_config: job config xml
+    @type  job_config: str
+
+    @return type: str
+    """
+
+    if isinstance(job_config, unicode):
+        job_config = job_config.encode('utf-8')
+    return hashlib.sha1(normalize_job_config(job_config)).hexdigest()
+
+
+def is_transient_error(ex):
+    """
+    Checks if a failed request to Jenkins might succeed when repeated, i.e.
+    if it failed because of the network or a server error (HTTP 5xx)
+    instead of the request itself, like creating an existent job
+
+    @param ex: error of the request
+    @type  ex: Exception
+
+    @return type: bool
+    """
+
+    if isinstance(ex, urllib2.HTTPError):
+        return ex.code >= 500
+    if isinstance(ex, (urllib2.URLError, httplib.HTTPException, socket.error)):
+        return True
+    if isinstance(ex, JenkinsException):
+        return SERVER_ERROR_PATTERN.search(str(ex)) is not None
+    return False
+
+
+def get_module_hash(module):
+    """
+    Gets the hash of the source of a module, or of its compiled file if
+    the source is not installed
+
+    @param module: module
+    @type  module: module
+
+    @return type: str
+    """
+
+    path = module.__file__
+    source_path = os.path.splitext(path)[0] + '.py'
+    if os.path.isfile(source_path):
+        path = source_path
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def get_generator_version():
+    """
+    Gets a version hash of everything besides the pipeline configuration a
+    job config is derived of, i.e. the templates and the modules rendering
+    them: this one, job_template and matrix_filter
+
+    @return type: str
+    """
+
+    for name in ['templates/job_config.xml', 'templates/job_config_params.yaml', 'templates/execute_shell.yaml']:
+        job_template.get_text(name)
+    modules = [sys.modules[__name__], job_template, matrix_filter]
+    return hashlib.sha1(job_template.get_templates_version() + ''.join(get_module_hash(module) for module in modules)).hexdigest()
+
+
+class JobConfigCache(object):
+    """
+    Hashes of the job configs last pushed to Jenkins
+    """
+
+    def __init__(self, path=None):
+        """
+        Loads the cache file if it exists
+
+        @param path: location of the cache file (optional)
+        @type  path: str
+        """
+
+        self.path = path
+        self.hashes = {}
+        if self.path and os.path.isfile(self.path):
+            with open(self.path) as f:
+                self.hashes = yaml.load(f) or {}
+
+    def get(self, job_name):
+        """
+        Gets the hash of the config last pushed for the given job
+
+        @param job_name: name of job
+        @type  job_name: str
+
+        @return type: str or None
+        """
+
+        return self.hashes.get(job_name)
+
+    def set(self, job_name, config_hash):
+        """
+        Stores the hash of the config pushed for the given job
+
+        @param job_name: name of job
+        @type  job_name: str
+        @param config_hash: hash of the normalized job config
+        @type  config_hash: str
+        """
+
+        self.hashes[job_name] = config_hash
+
+    def discard(self, job_name):
+        """
+        Removes the given job from the cache
+
+        @param job_name: name of job
+        @type  job_name: str
+        """
+
+        self.hashes.pop(job_name, None)
+
+    def save(self):
+        """
+        Writes the cache file
+        """
+
+        if self.path:
+            with open(self.path, 'w') as f:
+                yaml.dump(self.hashes, f, default_flow_style=False)
+
+
+class PipelineState(object):
+    """
+    State of the pipelines generated last time: per user the hash of the
+    pipeline configuration, the generator version and per job the hashes of
+    its inputs and of its rendered config
+    """
+
+    def __init__(self, path=None):
+        """
+        Loads the state file if it exists
+
+        @param path: location of the state file (optional)
+        @type  path: str
+        """
+
+        self.path = path
+        self.users = {}
+        if self.path and os.path.isfile(self.path):
+            with open(self.path) as f:
+                self.users = yaml.load(f) or {}
+
+    def is_user_unchanged(self, user_name, config_hash, version):
+        """
+        Checks if the pipeline configuration of the given user and the
+        generator did not change since the state was stored
+
+        @param user_name: name of user
+        @type  user_name: str
+        @param config_hash: hash of the pipeline configuration
+        @type  config_hash: str
+        @param version: generator version
+        @type  version: str
+
+        @return type: bool
+        """
+
+        user_state = self.users.get(user_name, {})
+        return user_state.get('config') == config_hash and user_state.get('version') == version
+
+    def get_job_input_hash(self, user_name, job_name):
+        """
+        Gets the input hash stored for the given job
+
+        @param user_name: name of user
+        @type  user_name: str
+        @param job_name: name of job
+        @type  job_name: str
+
+        @return type: str or None
+        """
+
+        return self.users.get(user_name, {}).get('jobs', {}).get(job_name, {}).get('input')
+
+    def set_user(self, user_name, config_hash, version, jobs):
+        """
+        Stores the state of the pipeline of the given user
+
+        @param user_name: name of user
+        @type  user_name: str
+        @param config_hash: hash of the pipeline configuration
+        @type  config_hash: str
+        @param version: generator version
+        @type  version: str
+        @param jobs: input and config hash by job name
+        @type  jobs: dict
+        """
+
+        self.users[user_name] = {'config': config_hash, 'version': version, 'jobs': jobs}
+
+    def discard_user(self, user_name):
+        """
+        Removes the state of the pipeline of the given user
+
+        @param user_name: name of user
+        @type  user_name: str
+        """
+
+        self.users.pop(user_name, None)
+
+    def save(self):
+        """
+        Writes the state file
+        """
+
+        if self.path:
+            with open(self.path, 'w') as f:
+                yaml.dump(self.users, f, default_flow_style=False)
+
+
+class RenderedJobStore(object):
+    """
+    Directory of rendered job configs (<job_name>.xml) with an index of
+    their hashes (index.yaml), written by a dry run and read by a later
+    upload
+    """
+
+    INDEX_FILE = 'index.yaml'
+
+    def __init__(self, path):
+        """
+        Loads the index if it exists
+
+        @param path: directory of the rendered job configs
+        @type  path: str
+        """
+
+        self.path = path
+        self.hashes = {}
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        if os.path.isfile(index_path):
+            with open(index_path) as f:
+                self.hashes = yaml.load(f) or {}
+
+    def get_job_names(self, user_name=None):
+        """
+        Gets the names of all stored jobs, or only those of the given user
+
+        @param user_name: name of user (optional)
+        @type  user_name: str
+
+        @return type: list
+        """
+
+        return sorted(job_name for job_name in self.hashes
+                      if user_name is None or job_name.split('__')[0] == user_name)
+
+    def get_hash(self, job_name):
+        """
+        Gets the hash of the normalized config of the given job
+
+        @param job_name: name of job
+        @type  job_name: str
+
+        @return type: str or None
+        """
+
+        return self.hashes.get(job_name)
+
+    def read(self, job_name):
+        """
+        Reads the rendered config of the given job
+
+        @param job_name: name of job
+        @type  job_name: str
+
+        @return type: str
+        """
+
+        with open(os.path.join(self.path, job_name + '.xml')) as f:
+            return f.read()
+
+    def write(self, job_name, job_config):
+        """
+        Writes the rendered config of the given job. The file is only
+        rewritten if the normalized config changed.
+
+        @param job_name: name of job
+        @type  job_name: str
+        @param job_config: job config xml
+        @type  job_config: str
+
+        @return: whether the config changed, ``bool``
+        """
+
+        config_hash = get_job_config_hash(job_config)
+        if self.hashes.get(job_name) == config_hash:
+            return False
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        if isinstance(job_config, unicode):
+            job_config = job_config.encode('utf-8')
+        with open(os.path.join(self.path, job_name + '.xml'), 'w') as f:
+            f.write(job_config)
+        self.hashes[job_name] = config_hash
+        return True
+
+    def remove(self, job_name):
+        """
+        Removes the given job from the store
+
+        @param job_name: name of job
+        @type  job_name: str
+        """
+
+        self.hashes.pop(job_name, None)
+        job_path = os.path.join(self.path, job_name + '.xml')
+        if os.path.isfile(job_path):
+            os.remove(job_path)
+
+    def save(self):
+        """
+        Writes the index file
+        """
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        with open(os.path.join(self.path, self.INDEX_FILE), 'w') as f:
+            yaml.dump(self.hashes, f, default_flow_style=False)
+
+
+class JobInventory(object):
+    """
+    Snapshot of the jobs existent on a Jenkins instance, indexed by the
+    user name prefix of the job names (user__jobtype__suffix)
+    """
+
+    def __init__(self, jenkins_instance):
+        """
+        Fetches the list of all jobs from the Jenkins instance
+
+        @param jenkins_instance: Jenkins instance
+        @type  jenkins_instance: jenkins.Jenkins
+        """
+
+        self.jenkins_instance = jenkins_instance
+        self.user_jobs = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Replaces the snapshot by the current list of jobs
+        """
+
+        user_jobs = {}
+        for job in self.jenkins_instance.get_jobs():
+            user_jobs.setdefault(job['name'].split('__')[0], set()).add(job['name'])
+        with self._lock:
+            self.user_jobs = user_jobs
+
+    def exists(self, job_name):
+        """
+        Checks if the given job exists
+
+        @param job_name: name of job
+        @type  job_name: str
+
+        @return type: bool
+        """
+
+        return job_name in self.user_jobs.get(job_name.split('__')[0], ())
+
+    def get_user_jobs(self, user_name):
+        """
+        Gets the names of all jobs of the given user
+
+        @param user_name: name of user
+        @type  user_name: str
+
+        @return type: list
+        """
+
+        return sorted(self.user_jobs.get(user_name, ()))
+
+    def add(self, job_name):
+        """
+        Records the creation of a job
+
+        @param job_name: name of job
+        @type  job_name: str
+        """
+
+        with self._lock:
+            self.user_jobs.setdefault(job_name.split('__')[0], set()).add(job_name)
+
+    def discard(self, job_name):
+        """
+        Records the deletion of a job
+
+        @param job_name: name of job
+        @type  job_name: str
+        """
+
+        with self._lock:
+            self.user_jobs.get(job_name.split('__')[0], set()).discard(job_name)
+
 
 class JenkinsJob(object):
     """
     Jenkins job creation class
     """
+
+    # fields of the repository configurations the job config is derived
+    # of, None if it depends on all of them
+    config_fields = None
+
+    # restrict the matrix axes to the values of the combinations actually
+    # built instead of the values of all repositories
+    sparse_matrix = True
+
     def __init__(self, jenkins_instance, pipeline_instance):
         """
         Sets up Jenkins job object
@@ -20,9 +477,8 @@ class JenkinsJob(object):
         self.jenkins_instance = jenkins_instance
         self.pipe_inst = pipeline_instance
 
-        self.job_config_params = pkg_resources.resource_string('jenkins_setup', 'templates/job_config_params.yaml')
-        self.job_config_params = yaml.load(self.job_config_params)
-        self.job_config = pkg_resources.resource_string('jenkins_setup', 'templates/job_config.xml')
+        self.job_config_params = job_template.get_yaml('templates/job_config_params.yaml')
+        self.job_config = job_template.get_text('templates/job_config.xml')
 
         self.params = {}
 
@@ -32,31 +488,177 @@ class JenkinsJob(object):
         self.repo_list = None
         self.tarball_location = ""
 
+        self.config_cache = None
+        self.inventory = None
+        self.schedule_result = None
+
+        self.retries = 0
+        self.retry_delay = 1.0
+
     def schedule_job(self):
         """
-        Creates new or reconfigure existent job
+        Creates new or reconfigure existent job. An existent job whose config
+        did not change is left untouched.
+
+        The outcome is stored in schedule_result: created, reconfigured,
+        unchanged or failed.
+
+        @return: return message, ``str``
+        """
+        config_hash = get_job_config_hash(self.job_config)
+        job_exists = self._job_exists()
+        message = self._push_job_config(job_exists, config_hash)
+        if self.schedule_result == 'failed' and self.inventory is not None:
+            # the inventory snapshot might be outdated
+            self.inventory.refresh()
+            if self.inventory.exists(self.job_name) != job_exists:
+                message = self._push_job_config(not job_exists, config_hash)
+        return message
+
+    def _push_job_config(self, job_exists, config_hash):
+        """
+        Reconfigures the existent job if its config changed or creates it
+
+        @param job_exists: whether the job exists on Jenkins
+        @type  job_exists: bool
+        @param config_hash: hash of the normalized rendered job config
+        @type  config_hash: str
 
         @return: return message, ``str``
         """
-        if self.jenkins_instance.job_exists(self.job_name):
+
+        if job_exists:
+            if self._is_config_unchanged(config_hash):
+                self.schedule_result = 'unchanged'
+                return "Job %s unchanged" % self.job_name
             try:
-                self.jenkins_instance.reconfig_job(self.job_name, self.job_config)
+                self._call_jenkins(self.jenkins_instance.reconfig_job, self.job_name, self.job_config)
+                self._cache_config_hash(config_hash)
+                self.schedule_result = 'reconfigured'
                 return "Reconfigured job %s" % self.job_name
-            except JenkinsException as ex:
+            except JENKINS_REQUEST_ERRORS as ex:
                 print ex
+                self._cache_config_hash(None)
+                self.schedule_result = 'failed'
                 return 'Reconfiguration of %s failed: %s' % (self.job_name, ex)
         else:
             try:
-                self.jenkins_instance.create_job(self.job_name, self.job_config)
+                self._call_jenkins(self.jenkins_instance.create_job, self.job_name, self.job_config)
+                self._cache_config_hash(config_hash)
+                if self.inventory is not None:
+                    self.inventory.add(self.job_name)
+                self.schedule_result = 'created'
                 return "Created job %s" % self.job_name
-            except JenkinsException as ex:
+            except JENKINS_REQUEST_ERRORS as ex:
                 print ex
+                self._cache_config_hash(None)
+                self.schedule_result = 'failed'
                 return 'Creation of %s failed: %s' % (self.job_name, ex)
 
-    def create_job(self):
+    def _job_exists(self):
         """
-        Sets job specific parameter, sets up the job config and creates job
-        on Jenkins instance
+        Checks if the job exists, using the inventory snapshot if given
+
+        @return type: bool
+        """
+
+        if self.inventory is not None:
+            return self.inventory.exists(self.job_name)
+        return self._call_jenkins(self.jenkins_instance.job_exists, self.job_name)
+
+    def _is_config_unchanged(self, config_hash):
+        """
+        Checks if the config of the existent job equals the rendered one,
+        first against the hash cached when it was pushed the last time, then
+        against the config stored on Jenkins
+
+        @param config_hash: hash of the normalized rendered job config
+        @type  config_hash: str
+
+        @return type: bool
+        """
+
+        if self.config_cache is not None and self.config_cache.get(self.job_name) == config_hash:
+            return True
+        try:
+            current_config = self._call_jenkins(self.jenkins_instance.get_job_config, self.job_name)
+        except JENKINS_REQUEST_ERRORS:
+            return False
+        if get_job_config_hash(current_config) != config_hash:
+            return False
+        self._cache_config_hash(config_hash)
+        return True
+
+    def _cache_config_hash(self, config_hash):
+        """
+        Stores the hash of the config pushed to Jenkins or drops it if the
+        push failed
+
+        @param config_hash: hash of the normalized job config or None
+        @type  config_hash: str
+        """
+
+        if self.config_cache is None:
+            return
+        if config_hash:
+            self.config_cache.set(self.job_name, config_hash)
+        else:
+            self.config_cache.discard(self.job_name)
+
+    def _call_jenkins(self, request, *args):
+        """
+        Sends a request to the Jenkins instance and repeats it with an
+        exponentially growing delay if it fails because of the network or a
+        server error; other errors are raised immediately
+
+        @param request: method of the Jenkins instance
+        @type  request: callable
+
+        @return: result of the request
+        """
+
+        attempt = 0
+        while True:
+            try:
+                return request(*args)
+            except JENKINS_REQUEST_ERRORS as ex:
+                if attempt >= self.retries or not is_transient_error(ex):
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                print "Request for job %s failed (%s), retry in %.1fs" % (self.job_name, ex, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def get_input_hash(self, version):
+        """
+        Gets the hash of all inputs the job config is derived of: the job
+        class and its arguments, the user settings, the configuration fields
+        of the repositories the job depends on and the generator version
+
+        @param version: generator version, see get_generator_version
+        @type  version: str
+
+        @return type: str
+        """
+
+        inputs = {'class': type(self).__name__,
+                  'job_name': self.job_name,
+                  'job_type': self.job_type,
+                  'repo_list': self.repo_list,
+                  'poll': self.poll,
+                  'tarball_location': self.tarball_location,
+                  'pipeline_repos_owner': self.pipe_inst.pipeline_repos_owner,
+                  'config_folder': getattr(self.pipe_inst, 'config_folder', None),
+                  'config': self.pipe_inst.get_config_hash(self.config_fields),
+                  'version': version}
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str)).hexdigest()
+
+    def render_job(self):
+        """
+        Sets job specific parameter and sets up the job config without
+        contacting the Jenkins instance
+
+        @return: job config, ``str``
         """
 
         self._set_common_params()
@@ -64,6 +666,16 @@ class JenkinsJob(object):
         self._set_job_type_params()
 
         self._replace_placeholder()
+
+        return self.job_config
+
+    def create_job(self):
+        """
+        Sets job specific parameter, sets up the job config and creates job
+        on Jenkins instance
+        """
+
+        self.render_job()
         print self.schedule_job()
 
         return self.job_name
@@ -75,12 +687,17 @@ class JenkinsJob(object):
         @return: return message, ``str``
         """
 
-        if self.jenkins_instance.job_exists(self.job_name):
+        if self._job_exists():
             try:
-                self.jenkins_instance.delete_job(self.job_name)
+                self._call_jenkins(self.jenkins_instance.delete_job, self.job_name)
+                self._cache_config_hash(None)
+                if self.inventory is not None:
+                    self.inventory.discard(self.job_name)
                 print "Deleted job %s" % self.job_name
             except Exception as ex:
                 print "Deletion of job %s failed: %s" % (self.job_name, ex)
+                if self.inventory is not None:
+                    self.inventory.refresh()
                 return ''
             return self.job_name
         else:
@@ -125,13 +742,7 @@ class JenkinsJob(object):
         Replaces placeholder in template with parameters
         """
 
-        for key, value in self.params.iteritems():
-            if "@(%s)" % key not in self.job_config:
-                raise KeyError("Parameter %s could not be replaced, because it is not existent" % key)
-            self.job_config = self.job_config.replace("@(%s)" % key, value)
-        not_replaced_keys = re.findall(r'@\(([A-Z0-9_]+)\)', self.job_config)
-        if not_replaced_keys != []:
-            raise KeyError("The keys %s were not replaced, because the parameters where missing" % (str(not_replaced_keys)))
+        self.job_config = job_template.render(self.job_config, self.params, strict=True)
 
     def _generate_job_name(self, job_type, suffix=''):
         '''
@@ -162,22 +773,23 @@ class JenkinsJob(object):
 
         return ', '.join(self._generate_job_list(job_type_list))
 
-    def _generate_matrix_filter(self, config, negation=False):
+    def _generate_optimized_matrix_filter(self, config, name_value_dict_list=None, negation=False):
         """
-        Returns a groovy combination filter
+        Returns the smallest groovy combination filter found for the given
+        combinations, see matrix_filter.compile_filter
 
-        :param config: couples of names and values which have to be met, ``dict``
+        :param config: couples of names and values which have to be met, ``list``
+        :param name_value_dict_list: matrix axes as given to _set_matrix_param;
+        conditions allowing all values of an axis are left out, ``list``
         :param negation: negates the resulting filter, ``bool``
         :returns: matrix config, ``str``
         """
 
-        filter_ = '%s' % ' || '.join(['(%s)' % ' &amp;&amp; '.join(['%s=="%s"' % (key, value)
-                                                                   for key, value in i.iteritems()])
-                                     for i in config])
-        if negation:
-            filter_ = '!(%s)' % filter_
+        axes = {}
+        for name_value_dict in name_value_dict_list or []:
+            axes.update(name_value_dict)
 
-        return filter_
+        return matrix_filter.compile_filter(config, axes, negation)
 
     def _generate_matrix_axis(self, axis_name, value_list):
         """
@@ -192,11 +804,10 @@ class JenkinsJob(object):
             raise Exception('No proper name given')
         if value_list == []:
             raise Exception('No values given')
-        axis = self.job_config_params['matrix']['axis'].replace('@(NAME)', axis_name)
-        values = ' '.join([self.job_config_params['matrix']['value'].replace('@(VALUE)', value) for value in sorted(value_list)])
-        axis = axis.replace('@(VALUES)', values)
+        value_template = job_template.compile_template(self.job_config_params['matrix']['value'])
+        values = ' '.join([value_template.render({'VALUE': value}, strict=False) for value in sorted(value_list)])
 
-        return axis
+        return job_template.render(self.job_config_params['matrix']['axis'], {'NAME': axis_name, 'VALUES': values})
 
     def _set_matrix_param(self, name_value_dict_list, labels=None, filter_=None):
         """
@@ -219,20 +830,47 @@ class JenkinsJob(object):
         if axes == '':
             return ''
 
-        matrix = self.job_config_params['matrix']['basic']
-        matrix = matrix.replace('@(AXES)', axes)
         if labels:
-            matrix = matrix.replace('@(NODE)', '<string>%s</string>' % '</string> <string>'.join(label for label in labels))
+            node = '<string>%s</string>' % '</string> <string>'.join(label for label in labels)
         else:
-            matrix = matrix.replace('@(NODE)', '<string>%s</string>' % self.job_type)
-        #same in short: matrix = matrix.replace('@(NODE)', '<string>%s</string>' % ('</string> <string>'.join(label for label in labels) if labels else self.job_type))
+            node = '<string>%s</string>' % self.job_type
+        matrix = job_template.render(self.job_config_params['matrix']['basic'], {'AXES': axes, 'NODE': node})
         if filter_:
-            matrix += ' ' + self.job_config_params['matrix']['filter'].replace('@(FILTER)', filter_)
+            matrix += ' ' + job_template.render(self.job_config_params['matrix']['filter'], {'FILTER': filter_})
         elif filter_ == '':
-            matrix += ' ' + self.job_config_params['matrix']['filter'].replace('@(FILTER)', 'repository=="NO_ENTRY"')
+            matrix += ' ' + job_template.render(self.job_config_params['matrix']['filter'], {'FILTER': 'repository=="NO_ENTRY"'})
 
         self.params['MATRIX'] = matrix
 
+    def _get_sparse_matrix_entries(self, subset_filter_input, job_type=None):
+        """
+        Gets the repository, ros_distro, ubuntu_distro and arch entries of
+        the given combinations, so that the product of the matrix axes
+        contains as few combinations as possible which are filtered away.
+        Falls back to _get_matrix_entries if no combination is given or
+        sparse_matrix is disabled.
+
+        @param subset_filter_input: combinations to build
+        @type  subset_filter_input: list of dicts
+        @param job_type: job type passed to _get_matrix_entries
+        @type  job_type: str
+
+        @return type: list of dicts
+        """
+
+        if not self.sparse_matrix or not subset_filter_input:
+            return self._get_matrix_entries(job_type)
+
+        dict_list = []
+        for axis_name in ['repository', 'ros_distro', 'ubuntu_distro', 'arch']:
+            values = []
+            for entry in subset_filter_input:
+                if entry[axis_name] not in values:
+                    values.append(entry[axis_name])
+            dict_list.append({axis_name: values})
+
+        return dict_list
+
     def _get_matrix_entries(self, job_type=None):
         """
         Gets all repository, ros_distro, ubuntu_distro and arch entries of
@@ -295,21 +933,20 @@ class JenkinsJob(object):
         elif type(unstable_behavior) != bool:
             raise Exception("Behavior argument for unstable job result has to be a boolean")
 
-        jointrigger = self.job_config_params['jointrigger'].replace('@(JOIN_PROJECTS)',
-                                                                    self._generate_job_list_string(job_type_list))
+        jointrigger_params = {'JOIN_PROJECTS': self._generate_job_list_string(job_type_list)}
         if unstable_behavior:
-            jointrigger = jointrigger.replace('@(JOIN_UNSTABLE)', 'true')
+            jointrigger_params['JOIN_UNSTABLE'] = 'true'
         else:
-            jointrigger = jointrigger.replace('@(JOIN_UNSTABLE)', 'false')
+            jointrigger_params['JOIN_UNSTABLE'] = 'false'
 
         if parameterized_trigger is not None:
             if parameterized_trigger == '':
                 raise Exception("Parameterized trigger configuration string is empty")
-            jointrigger = jointrigger.replace('@(PARAMETERIZED_TRIGGER)', parameterized_trigger)
+            jointrigger_params['PARAMETERIZED_TRIGGER'] = parameterized_trigger
         else:
-            jointrigger = jointrigger.replace('@(PARAMETERIZED_TRIGGER)', '')
+            jointrigger_params['PARAMETERIZED_TRIGGER'] = ''
 
-        self.params['JOIN_TRIGGER'] = jointrigger
+        self.params['JOIN_TRIGGER'] = job_template.render(self.job_config_params['jointrigger'], jointrigger_params)
 
     def _set_postbuildtrigger_param(self, job_type_list, threshold_name):
         """
@@ -326,9 +963,9 @@ class JenkinsJob(object):
         elif threshold_name not in ['SUCCESS', 'UNSTABLE', 'FAILURE']:
             raise Exception("Threshold argument invalid")
 
-        postbuildtrigger = self.job_config_params['postbuildtrigger'].replace('@(CHILD_PROJECTS)',
-                                                                              self._generate_job_list_string(job_type_list))
-        self.params['POSTBUILD_TRIGGER'] = postbuildtrigger.replace('@(THRESHOLD)', threshold_name)
+        self.params['POSTBUILD_TRIGGER'] = job_template.render(self.job_config_params['postbuildtrigger'],
+                                                               {'CHILD_PROJECTS': self._generate_job_list_string(job_type_list),
+                                                                'THRESHOLD': threshold_name})
 
     def _set_pipelinetrigger_param(self, job_type_list):
         """
@@ -339,8 +976,8 @@ class JenkinsJob(object):
 
         if job_type_list == []:
             return ''
-        self.params['PIPELINE_TRIGGER'] = self.job_config_params['pipelinetrigger'].replace('@(PIPELINETRIGGER_PROJECT)',
-                                                                                            self._generate_job_list_string(job_type_list))
+        self.params['PIPELINE_TRIGGER'] = job_template.render(self.job_config_params['pipelinetrigger'],
+                                                              {'PIPELINETRIGGER_PROJECT': self._generate_job_list_string(job_type_list)})
 
     def _set_groovypostbuild_param(self, script_type, project_list, behavior):
         """
@@ -355,9 +992,10 @@ class JenkinsJob(object):
             raise Exception('No project is given')
         if behavior > 2 or behavior < 0 or type(behavior) != int:
             raise Exception('Invalid behavior number given')
-        script = self.job_config_params['groovypostbuild']['script'][script_type].replace('@(PROJECT_LIST)',
-                                                                                          str(self._generate_job_list(project_list)))
-        self.params['GROOVY_POSTBUILD'] = self.job_config_params['groovypostbuild']['basic'].replace('@(GROOVYPB_SCRIPT)', script).replace('@(GROOVYPB_BEHAVIOR)', str(behavior))
+        script = job_template.render(self.job_config_params['groovypostbuild']['script'][script_type],
+                                     {'PROJECT_LIST': str(self._generate_job_list(project_list))})
+        self.params['GROOVY_POSTBUILD'] = job_template.render(self.job_config_params['groovypostbuild']['basic'],
+                                                              {'GROOVYPB_SCRIPT': script, 'GROOVYPB_BEHAVIOR': str(behavior)})
 
     def _get_single_parameterizedtrigger(self, job_type_list, condition='SUCCESS', predefined_param='', subset_filter='', no_param=False):
         """
@@ -372,25 +1010,23 @@ class JenkinsJob(object):
 
         matrix_subset = ''
         if subset_filter != '':
-            matrix_subset = self.job_config_params['parameterizedtrigger']['matrix_subset']
-            matrix_subset = matrix_subset.replace('@(FILTER)', subset_filter)
+            matrix_subset = job_template.render(self.job_config_params['parameterizedtrigger']['matrix_subset'],
+                                                {'FILTER': subset_filter})
 
         predef_param = ''
         if predefined_param != '':
-            predef_param = self.job_config_params['parameterizedtrigger']['predef_param']
-            predef_param = predef_param.replace('@(PARAMETER)', predefined_param)
-
-        param_trigger = self.job_config_params['parameterizedtrigger']['trigger']
-        param_trigger = param_trigger.replace('@(CONFIGS)', predef_param + matrix_subset)
-        param_trigger = param_trigger.replace('@(PROJECTLIST)', self._generate_job_list_string(job_type_list))
-        param_trigger = param_trigger.replace('@(CONDITION)', condition)
+            predef_param = job_template.render(self.job_config_params['parameterizedtrigger']['predef_param'],
+                                               {'PARAMETER': predefined_param})
 
+        trigger_params = {'CONFIGS': predef_param + matrix_subset,
+                          'PROJECTLIST': self._generate_job_list_string(job_type_list),
+                          'CONDITION': condition}
         if no_param:
-            param_trigger = param_trigger.replace('@(NOPARAM)', 'true')
+            trigger_params['NOPARAM'] = 'true'
         else:
-            param_trigger = param_trigger.replace('@(NOPARAM)', 'false')
+            trigger_params['NOPARAM'] = 'false'
 
-        return param_trigger
+        return job_template.render(self.job_config_params['parameterizedtrigger']['trigger'], trigger_params)
 
     def _get_parameterizedtrigger_param(self, trigger_list):
         """
@@ -402,10 +1038,8 @@ class JenkinsJob(object):
 
         if trigger_list == []:
             raise Exception("No trigger config given")
-        param_trigger = self.job_config_params['parameterizedtrigger']['basic']
-        param_trigger = param_trigger.replace('@(TRIGGERS)', ' '.join(trigger_list))
-
-        return param_trigger
+        return job_template.render(self.job_config_params['parameterizedtrigger']['basic'],
+                                   {'TRIGGERS': ' '.join(trigger_list)})
 
     def _set_parameterizedtrigger_param(self, trigger_list):
         """
@@ -425,15 +1059,13 @@ class JenkinsJob(object):
         @type  job_name: string
         """
 
-        mailer = self.job_config_params['emailext']
-        mailer = mailer.replace('@(EMAIL)', self.pipe_inst.email)
-        mailer = mailer.replace('@(JOBNAME)', job_name)
+        mailer_params = {'EMAIL': self.pipe_inst.email, 'JOBNAME': job_name}
         if self.pipe_inst.committer_email_enabled:
-            mailer = mailer.replace('@(EMAIL_TO_COMMITTER)', 'true')
+            mailer_params['EMAIL_TO_COMMITTER'] = 'true'
         else:
-            mailer = mailer.replace('@(EMAIL_TO_COMMITTER)', 'false')
+            mailer_params['EMAIL_TO_COMMITTER'] = 'false'
 
-        self.params['MAILER'] = mailer
+        self.params['MAILER'] = job_template.render(self.job_config_params['emailext'], mailer_params)
 
     def _set_authorization_matrix_param(self, permission_list):
         """
@@ -443,14 +1075,12 @@ class JenkinsJob(object):
         @type  permission_list: list
         """
 
-        authorizations = self.job_config_params['authorizationmatrix']['basic']
-
-        authorization = ''
-        for permission in permission_list:
-            authorization += self.job_config_params['authorizationmatrix'][permission]
-            authorization = authorization.replace('@(USERNAME)', self.pipe_inst.user_name)
+        authorization = ''.join([job_template.render(self.job_config_params['authorizationmatrix'][permission],
+                                                     {'USERNAME': self.pipe_inst.user_name})
+                                 for permission in permission_list])
 
-        self.params['AUTHORIZATIONMATRIX'] = authorizations.replace('@(PERMISSION)', authorization)
+        self.params['AUTHORIZATIONMATRIX'] = job_template.render(self.job_config_params['authorizationmatrix']['basic'],
+                                                                 {'PERMISSION': authorization})
 
     def _set_junit_testresults_param(self):
         """
@@ -480,17 +1110,14 @@ class JenkinsJob(object):
         """
 
         if self.poll != self.repo_list[0]:
-            vcs_config = self.job_config_params['vcs'][self.pipe_inst.repositories[self.repo_list[0]].dependencies[self.poll].type]
-            vcs_config = vcs_config.replace('@(URI)', self.pipe_inst.repositories[self.repo_list[0]].dependencies[self.poll].url)
-            if self.pipe_inst.repositories[self.repo_list[0]].dependencies[self.poll].type != 'svn':
-                vcs_config = vcs_config.replace('@(BRANCH)', self.pipe_inst.repositories[self.repo_list[0]].dependencies[self.poll].version)
+            vcs_repo = self.pipe_inst.repositories[self.repo_list[0]].dependencies[self.poll]
         else:
-            vcs_config = self.job_config_params['vcs'][self.pipe_inst.repositories[self.repo_list[0]].type]
-            vcs_config = vcs_config.replace('@(URI)', self.pipe_inst.repositories[self.repo_list[0]].url)
-            if self.pipe_inst.repositories[self.repo_list[0]].type != 'svn':
-                vcs_config = vcs_config.replace('@(BRANCH)', self.pipe_inst.repositories[self.repo_list[0]].version)
+            vcs_repo = self.pipe_inst.repositories[self.repo_list[0]]
+        vcs_params = {'URI': vcs_repo.url}
+        if vcs_repo.type != 'svn':
+            vcs_params['BRANCH'] = vcs_repo.version
 
-        self.params['VCS'] = vcs_config
+        self.params['VCS'] = job_template.render(self.job_config_params['vcs'][vcs_repo.type], vcs_params)
 
     def _set_shell_param(self, shell_script):
         """
@@ -503,34 +1130,29 @@ class JenkinsJob(object):
         if shell_script == '':
             raise Exception("No shell script is given")
 
-        shell_config = self.job_config_params['execute_shell']
-
-        shell_config = shell_config.replace('@(COMMAND)', shell_script)
-
-        self.params['SHELL'] = shell_config
+        self.params['SHELL'] = job_template.render(self.job_config_params['execute_shell'], {'COMMAND': shell_script})
 
     def _get_shell_script(self, script_type=None):
         """
         Gets and sets up execute shell script template
         """
 
-        shell_temp = pkg_resources.resource_string('jenkins_setup', 'templates/execute_shell.yaml')
-        shell_temp = yaml.load(shell_temp)
+        shell_temp = job_template.get_yaml('templates/execute_shell.yaml')
         if script_type:
             shell_script = shell_temp[script_type]
         else:
             shell_script = shell_temp[self.job_type]
-        shell_script = shell_script.replace('@(SERVERNAME)', self.pipe_inst.server_name)
-        shell_script = shell_script.replace('@(USERNAME)', self.pipe_inst.user_name)
-        shell_script = shell_script.replace('@(JOB_TYPE_NAME)', self.job_type)
-        shell_script = shell_script.replace('@(PIPELINEREPOSOWNER)', self.pipe_inst.pipeline_repos_owner)
-        shell_script = shell_script.replace('@(CONFIG_FOLDER)', self.pipe_inst.config_folder)
+        shell_params = {'SERVERNAME': self.pipe_inst.server_name,
+                        'USERNAME': self.pipe_inst.user_name,
+                        'JOB_TYPE_NAME': self.job_type,
+                        'PIPELINEREPOSOWNER': self.pipe_inst.pipeline_repos_owner,
+                        'CONFIG_FOLDER': self.pipe_inst.config_folder}
 
         # if not a hardware job where no chroot is used
         if 'hardware' not in self.job_type:
-            shell_script = shell_script.replace('@(STORAGE)', self.tarball_location)
+            shell_params['STORAGE'] = self.tarball_location
 
-        return shell_script
+        return job_template.render(shell_script, shell_params)
 
     def _get_prio_subset_filter(self):
         """
@@ -560,6 +1182,9 @@ class PipeStarterGeneralJob(JenkinsJob):
     """
     Object representation of a general Pipe Starter Job
     """
+
+    config_fields = ['ros_distro', 'prio_ubuntu_distro', 'prio_arch']
+
     def __init__(self, jenkins_instance, pipeline_config, repo_list):
         """
         :param jenkins_instance: object of Jenkins server
@@ -586,7 +1211,7 @@ class PipeStarterGeneralJob(JenkinsJob):
         prio_triggers = []
         for repo in self.repo_list:
             prio_triggers.append(self._get_single_parameterizedtrigger(['prio_build'],
-                                                                       subset_filter=self._generate_matrix_filter(self._get_prio_subset_filter()),
+                                                                       subset_filter=self._generate_optimized_matrix_filter(self._get_prio_subset_filter()),
                                                                        predefined_param='POLL=manually triggered' + '\nREPOSITORY=%s' % repo + '\nREPOSITORY_FILTER=repository=="%s"' % repo))
         self._set_parameterizedtrigger_param(prio_triggers)
 
@@ -598,6 +1223,9 @@ class PipeStarterJob(PipeStarterGeneralJob):
     """
     Object representation of Pipe Starter Job
     """
+
+    config_fields = ['ros_distro', 'prio_ubuntu_distro', 'prio_arch', 'type', 'url', 'version', 'dependencies']
+
     def __init__(self, jenkins_instance, pipeline_config, repo_list, poll):
         """
         :param jenkins_instance: object of Jenkins server
@@ -639,6 +1267,9 @@ class BuildJob(JenkinsJob):
     """
     Class for build jobs
     """
+
+    config_fields = ['ros_distro', 'prio_ubuntu_distro', 'prio_arch', 'regular_matrix', 'jobs']
+
     def __init__(self, jenkins_instance, pipeline_config, tarball_location):
         """
         Creates a build job instance
@@ -653,9 +1284,15 @@ class BuildJob(JenkinsJob):
 
         self.tarball_location = tarball_location
 
-    def _set_job_type_params(self, matrix_filter=None, matrix_job_type=None):
+    def _set_job_type_params(self, subset_filter_input=None, matrix_job_type=None):
         """
         Sets build job specific job configuration parameters
+
+        @param subset_filter_input: combinations to build, default: the
+        priority combinations
+        @type  subset_filter_input: list of dicts
+        @param matrix_job_type: job type passed to _get_matrix_entries
+        @type  matrix_job_type: str
         """
 
         self.params['NODE_LABEL'] = 'master'
@@ -663,9 +1300,10 @@ class BuildJob(JenkinsJob):
         self.params['WARNINGS_PUBLISHER'] = self.job_config_params['warningspublisher']
 
         # set matrix
-        if not matrix_filter:
-            matrix_filter = self._generate_matrix_filter(self._get_prio_subset_filter())
-        matrix_entries_dict_list = self._get_matrix_entries(matrix_job_type)
+        if not subset_filter_input:
+            subset_filter_input = self._get_prio_subset_filter()
+        matrix_entries_dict_list = self._get_sparse_matrix_entries(subset_filter_input, matrix_job_type)
+        matrix_filter = self._generate_optimized_matrix_filter(subset_filter_input, matrix_entries_dict_list)
         self._set_matrix_param(matrix_entries_dict_list, filter_=matrix_filter)
 
 
@@ -743,9 +1381,8 @@ class RegularBuildJob(BuildJob):
         Sets regular build job specific job configuration parameters
         """
 
-        matrix_filter = self._generate_matrix_filter(self._get_regular_subset_filter())
-
-        super(RegularBuildJob, self)._set_job_type_params(matrix_filter=matrix_filter, matrix_job_type='regular_build')
+        super(RegularBuildJob, self)._set_job_type_params(subset_filter_input=self._get_regular_subset_filter(),
+                                                          matrix_job_type='regular_build')
 
         # email
         self._set_mailer_param('Regular Build')
@@ -828,6 +1465,9 @@ class TestJob(JenkinsJob):
     """
     Class for test jobs
     """
+
+    config_fields = ['ros_distro', 'prio_ubuntu_distro', 'prio_arch', 'regular_matrix', 'jobs']
+
     def __init__(self, jenkins_instance, pipeline_config, tarball_location, execute_repo_list):
         """
         Creates a test job instance
@@ -849,9 +1489,15 @@ class TestJob(JenkinsJob):
         self.job_type = 'test'
         self.job_name = self._generate_job_name(self.job_type)
 
-    def _set_job_type_params(self, matrix_filter=None, matrix_job_type=None):
+    def _set_job_type_params(self, subset_filter_input=None, matrix_job_type=None):
         """
         Sets test job specific job configuration parameters
+
+        @param subset_filter_input: combinations to test, default: the
+        combinations of the test type
+        @type  subset_filter_input: list of dicts
+        @param matrix_job_type: job type passed to _get_matrix_entries
+        @type  matrix_job_type: str
         """
 
         self.params['NODE_LABEL'] = 'master'
@@ -861,9 +1507,10 @@ class TestJob(JenkinsJob):
         self._set_junit_testresults_param()
 
         # set matrix
-        if not matrix_filter:
-            matrix_filter = self._generate_matrix_filter(self._get_test_subset_filter())
-        matrix_entries_dict_list = self._get_matrix_entries(matrix_job_type)
+        if subset_filter_input is None:
+            subset_filter_input = self._get_test_subset_filter()
+        matrix_entries_dict_list = self._get_sparse_matrix_entries(subset_filter_input, matrix_job_type)
+        matrix_filter = self._generate_optimized_matrix_filter(subset_filter_input, matrix_entries_dict_list)
         self._set_matrix_param(matrix_entries_dict_list, filter_=matrix_filter)
 
         # set pipeline trigger
@@ -1075,9 +1722,7 @@ class DownstreamTestJob(TestJob):
         Set downstream test job specific job configuration parameters
         """
 
-        matrix_filter = self._generate_matrix_filter(self._get_prio_subset_filter())
-
-        super(DownstreamTestJob, self)._set_job_type_params(matrix_filter, matrix_job_type='downstream_build')
+        super(DownstreamTestJob, self)._set_job_type_params(self._get_prio_subset_filter(), matrix_job_type='downstream_build')
 
         # email
         self._set_mailer_param('Downstream Test')
@@ -1090,6 +1735,9 @@ class DownstreamTestJob(TestJob):
 class HardwareBuildTrigger(JenkinsJob):
     """
     """
+
+    config_fields = []
+
     def __init__(self, jenkins_instance, pipeline_config):
         super(HardwareBuildTrigger, self).__init__(jenkins_instance, pipeline_config)
 
@@ -1117,6 +1765,9 @@ class HardwareBuildJob(JenkinsJob):
     """
     Class for hardware build jobs
     """
+
+    config_fields = ['jobs', 'robots']
+
     def __init__(self, jenkins_instance, pipeline_config):
         """
         Creates a hardware build job
@@ -1140,8 +1791,9 @@ class HardwareBuildJob(JenkinsJob):
         self.params['NODE_LABEL'] = 'master'
 
         # set matrix
-        matrix_filter = self._generate_matrix_filter(self._get_hardware_subset_filter())
         (matrix_entries_dict_list, robots) = self._get_hardware_matrix_entries()
+        matrix_filter = self._generate_optimized_matrix_filter(self._get_hardware_subset_filter(),
+                                                               matrix_entries_dict_list + [{'label': robots}])
         self._set_matrix_param(matrix_entries_dict_list, labels=robots, filter_=matrix_filter)
 
         # email
@@ -1198,6 +1850,9 @@ class HardwareTestTrigger(JenkinsJob):
     """
     Class for hardware test trigger jobs
     """
+
+    config_fields = []
+
     def __init__(self, jenkins_instance, pipeline_config):
         super(HardwareTestTrigger, self).__init__(jenkins_instance, pipeline_config)
 
@@ -1321,4 +1976,35 @@ class CleanUpJob(JenkinsJob):
 
         self.params['NODE_LABEL'] = 'clean_up'
 
+
+class RenderedJob(JenkinsJob):
+    """
+    Class for jobs whose config was rendered before, e.g. by a dry run
+    """
+    def __init__(self, jenkins_instance, job_name, job_config):
+        """
+        Creates a job from a rendered config
+
+        @param jenkins_instance: Jenkins instance
+        @type  jenkins_instance: jenkins.Jenkins
+        @param job_name: name of job
+        @type  job_name: str
+        @param job_config: rendered job config xml
+        @type  job_config: str
+        """
+
+        super(RenderedJob, self).__init__(jenkins_instance, None)
+
+        self.job_name = job_name
+        self.job_config = job_config
+
+    def render_job(self):
+        """
+        Returns the rendered job config unchanged
+
+        @return: job config, ``str``
+        """
+
+        return self.job_config
+
 # TODO classes: release
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+This module provides the function run_parallel to execute a list of tasks,
+e.g. the HTTP requests to schedule or delete Jenkins jobs, in a bounded pool
+of worker threads.
+"""
+
+import sys
+import threading
+import Queue
+
+
+def run_parallel(tasks, num_workers):
+    """
+    Executes the given tasks in a pool of worker threads. The results are
+    returned in the order of the tasks, independent of the order they
+    finished in.
+
+    @param tasks: callables without arguments
+    @type  tasks: list
+    @param num_workers: maximal number of tasks running at the same time
+    @type  num_workers: int
+
+    @return param: results of the tasks
+    @return type: list
+
+    @raise: the first exception raised by a task (in task order), after all
+    tasks are finished
+    """
+
+    results = [None] * len(tasks)
+    errors = [None] * len(tasks)
+    task_queue = Queue.Queue()
+    for index, task in enumerate(tasks):
+        task_queue.put((index, task))
+
+    def worker():
+        while True:
+            try:
+                index, task = task_queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[index] = task()
+            except Exception:
+                errors[index] = sys.exc_info()
+
+    workers = [threading.Thread(target=worker) for _ in range(max(1, min(num_workers, len(tasks))))]
+    for thread in workers:
+        thread.daemon = True
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    return results
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+"""
+This module provides the classes JobTemplate, TemplateRegistry and
+FrozenDict and the functions compile_template, render, get_text and
+get_yaml. They are used to load the Jenkins job config templates
+(job_config.xml, job_config_params.yaml and execute_shell.yaml) and to fill
+their @(KEY) placeholders.
+
+A template text is parsed only once into a list of literal segments and
+slots. Rendering it afterwards is a single join over this list instead of
+one str.replace call per parameter. The template files themselves are read
+and parsed once per process by the module-level registry.
+"""
+
+import os
+import re
+import hashlib
+import pkg_resources
+import yaml
+from collections import OrderedDict
+
+PLACEHOLDER_PATTERN = re.compile(r'@\(([A-Z0-9_]+)\)')
+
+# maximal number of compiled templates kept, the oldest ones are dropped
+MAX_COMPILED_TEMPLATES = 256
+
+# compiled templates by template text, in the order they were compiled
+_compiled_templates = OrderedDict()
+
+
+class JobTemplate(object):
+    """
+    Compiled job config template
+    """
+
+    def __init__(self, text):
+        """
+        Splits the given template text into literal segments and slots
+
+        @param text: template text with @(KEY) placeholders
+        @type  text: str
+        """
+
+        self.text = text
+        self.segments = []
+        self.slots = {}
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            self.segments.append(text[position:match.start()])
+            self.slots.setdefault(match.group(1), []).append(len(self.segments))
+            self.segments.append(match.group(0))
+            position = match.end()
+        self.segments.append(text[position:])
+
+    def get_keys(self):
+        """
+        Gets the names of all placeholders of the template
+
+        @return type: list
+        """
+
+        return sorted(self.slots.keys())
+
+    def render(self, params, strict=True):
+        """
+        Replaces the placeholders with the given parameters in one pass
+
+        In strict mode every parameter has to match a placeholder, every
+        placeholder has to be given and the result must not contain any
+        placeholder, e.g. one left in an inserted value. Otherwise unknown
+        parameters are ignored and placeholders without parameter are kept.
+
+        @param params: parameter names and their values
+        @type  params: dict
+        @param strict: raise an error for missing or unused keys
+        @type  strict: bool
+
+        @return type: str
+
+        @raise type: KeyError
+        """
+
+        if strict:
+            for key in params:
+                if key not in self.slots:
+                    raise KeyError("Parameter %s could not be replaced, because it is not existent" % key)
+            not_replaced_keys = [key for key in self.slots if key not in params]
+            if not_replaced_keys != []:
+                raise KeyError("The keys %s were not replaced, because the parameters where missing" % (str(sorted(not_replaced_keys))))
+
+        segments = list(self.segments)
+        for key, indexes in self.slots.iteritems():
+            if key in params:
+                value = params[key]
+                for index in indexes:
+                    segments[index] = value
+
+        result = ''.join(segments)
+        if strict:
+            not_replaced_keys = PLACEHOLDER_PATTERN.findall(result)
+            if not_replaced_keys != []:
+                raise KeyError("The keys %s were not replaced, because the parameters where missing" % (str(not_replaced_keys)))
+
+        return result
+
+
+def compile_template(text):
+    """
+    Gets the compiled template of the given text; every text is parsed
+    only once as long as it is among the last MAX_COMPILED_TEMPLATES ones
+
+    @param text: template text with @(KEY) placeholders
+    @type  text: str
+
+    @return type: JobTemplate
+    """
+
+    template = _compiled_templates.get(text)
+    if template is None:
+        template = JobTemplate(text)
+        if len(_compiled_templates) >= MAX_COMPILED_TEMPLATES:
+            _compiled_templates.popitem(last=False)
+        _compiled_templates[text] = template
+    return template
+
+
+def render(text, params, strict=False):
+    """
+    Fills the placeholders of the given template text
+
+    @param text: template text with @(KEY) placeholders
+    @type  text: str
+    @param params: parameter names and their values
+    @type  params: dict
+    @param strict: raise an error for missing or unused keys (default False)
+    @type  strict: bool
+
+    @return type: str
+    """
+
+    return compile_template(text).render(params, strict)
+
+
+class FrozenDict(dict):
+    """
+    Read-only dictionary handed out by the template registry
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Template configuration is read-only")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+
+def freeze(data):
+    """
+    Converts parsed yaml data into an immutable view
+
+    @param data: parsed yaml data
+    @type  data: dict, list or scalar
+
+    @return type: FrozenDict, tuple or scalar
+    """
+
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value)) for key, value in data.iteritems())
+    if isinstance(data, list):
+        return tuple(freeze(value) for value in data)
+    return data
+
+
+class TemplateRegistry(object):
+    """
+    Process-wide cache of the template files of a package
+    """
+
+    def __init__(self, package='jenkins_setup'):
+        """
+        @param package: name of package the templates belong to
+        @type  package: str
+        """
+
+        self.package = package
+        self._entries = {}
+
+    def get_text(self, name):
+        """
+        Gets the content of a template file
+
+        @param name: resource name, e.g. templates/job_config.xml
+        @type  name: str
+
+        @return type: str
+        """
+
+        return self._get(name, 'text', lambda text: text)
+
+    def get_yaml(self, name):
+        """
+        Gets the read-only parsed content of a yaml template file
+
+        @param name: resource name, e.g. templates/job_config_params.yaml
+        @type  name: str
+
+        @return type: FrozenDict
+        """
+
+        return self._get(name, 'yaml', lambda text: freeze(yaml.load(text)))
+
+    def get_version(self):
+        """
+        Gets a version hash of all templates loaded so far, derived from
+        their names and contents
+
+        @return type: str
+        """
+
+        digests = dict((name, entry[2]) for (name, _), entry in self._entries.iteritems())
+        return hashlib.sha1(';'.join(['%s@%s' % (name, digests[name])
+                                      for name in sorted(digests)])).hexdigest()
+
+    def clear(self):
+        """
+        Drops all cached templates
+        """
+
+        self._entries.clear()
+
+    def _get(self, name, kind, parse):
+        """
+        Gets the cached template and reloads it if the file changed
+        """
+
+        mtime = self._get_mtime(name)
+        entry = self._entries.get((name, kind))
+        if entry is None or entry[0] != mtime:
+            text = pkg_resources.resource_string(self.package, name)
+            entry = (mtime, parse(text), hashlib.sha1(text).hexdigest())
+            self._entries[(name, kind)] = entry
+        return entry[1]
+
+    def _get_mtime(self, name):
+        """
+        Gets the modification time of a template file
+        """
+
+        try:
+            return os.path.getmtime(pkg_resources.resource_filename(self.package, name))
+        except (OSError, NotImplementedError):
+            return None
+
+
+_registry = TemplateRegistry()
+
+
+def get_text(name):
+    """
+    Gets the content of a template file of jenkins_setup
+
+    @param name: resource name, e.g. templates/job_config.xml
+    @type  name: str
+
+    @return type: str
+    """
+
+    return _registry.get_text(name)
+
+
+def get_yaml(name):
+    """
+    Gets the read-only parsed content of a yaml template file of
+    jenkins_setup
+
+    @param name: resource name, e.g. templates/job_config_params.yaml
+    @type  name: str
+
+    @return type: FrozenDict
+    """
+
+    return _registry.get_yaml(name)
+
+
+def get_templates_version():
+    """
+    Gets a version hash of all templates of jenkins_setup loaded so far
+
+    @return type: str
+    """
+
+    return _registry.get_version()
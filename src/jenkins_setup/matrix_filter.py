@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+"""
+This module provides the functions compile_filter, evaluate and
+verify_filter. They are used to generate the Groovy combination filters of
+the Jenkins matrix jobs.
+
+A filter is given as list of combinations (dicts of axis names and values).
+Instead of one clause per combination, compile_filter merges combinations
+which differ only in the values of one axis into a single clause like
+(repository in ["a", "b"] &amp;&amp; ros_distro=="groovy"), until no more
+clauses can be merged. Conditions on axes which allow all of their values
+are left out.
+"""
+
+import itertools
+
+# preferred order of the axes within a clause
+AXIS_ORDER = ['repository', 'ros_distro', 'ubuntu_distro', 'arch', 'label']
+
+# maximal number of axis orders tried to find the smallest filter
+MAX_MERGE_ORDERS = 120
+
+
+def _sort_axes(axis_names):
+    """
+    Sorts the given axis names by AXIS_ORDER, unknown ones alphabetically
+    at the end
+    """
+
+    return sorted(axis_names, key=lambda name: (AXIS_ORDER.index(name) if name in AXIS_ORDER else len(AXIS_ORDER), name))
+
+
+def _get_cubes(entries, axes):
+    """
+    Converts the combinations into cubes, i.e. dicts of axis names and sets
+    of allowed values. Combinations with a value outside the given axes
+    can never match and are dropped.
+    """
+
+    cubes = []
+    for entry in entries:
+        if axes and any(name in axes and value not in axes[name] for name, value in entry.iteritems()):
+            continue
+        cube = _reduce_cube(dict((name, frozenset([value])) for name, value in entry.iteritems()), axes)
+        if cube not in cubes:
+            cubes.append(cube)
+    return cubes
+
+
+def _reduce_cube(cube, axes):
+    """
+    Removes the conditions of a cube which allow all values of their axis
+    """
+
+    if not axes:
+        return cube
+    return dict((name, values) for name, values in cube.iteritems()
+                if name not in axes or not values.issuperset(axes[name]))
+
+
+def _merge_cubes(cubes, axis_names, axes):
+    """
+    Merges the cubes which differ only in the given axes, one after the
+    other, until no more cubes can be merged
+    """
+
+    cubes = list(cubes)
+    changed = True
+    while changed:
+        changed = False
+        for axis_name in axis_names:
+            groups = {}
+            order = []
+            for cube in cubes:
+                if axis_name not in cube:
+                    key = (None, frozenset(cube.iteritems()))
+                else:
+                    key = (axis_name, frozenset((name, values) for name, values in cube.iteritems() if name != axis_name))
+                if key not in groups:
+                    groups[key] = []
+                    order.append(key)
+                groups[key].append(cube)
+            if len(order) == len(cubes):
+                continue
+            merged = []
+            for key in order:
+                group = groups[key]
+                cube = dict(group[0])
+                if key[0] is not None:
+                    cube[axis_name] = frozenset().union(*[other[axis_name] for other in group])
+                merged.append(_reduce_cube(cube, axes))
+            cubes = merged
+            changed = True
+
+    # drop cubes contained in other cubes
+    result = []
+    for index, cube in enumerate(cubes):
+        if not any(index != other_index and _is_subcube(cube, other) and (not _is_subcube(other, cube) or other_index < index)
+                   for other_index, other in enumerate(cubes)):
+            result.append(cube)
+    return result
+
+
+def _is_subcube(cube, other):
+    """
+    Checks if every combination allowed by cube is allowed by other
+    """
+
+    return all(name in cube and cube[name].issubset(values) for name, values in other.iteritems())
+
+
+def _format_cubes(cubes):
+    """
+    Formats the cubes as Groovy expression
+    """
+
+    clauses = []
+    for cube in cubes:
+        conditions = []
+        for name in _sort_axes(cube.keys()):
+            values = sorted(cube[name])
+            if len(values) == 1:
+                conditions.append('%s=="%s"' % (name, values[0]))
+            else:
+                conditions.append('%s in [%s]' % (name, ', '.join('"%s"' % value for value in values)))
+        if conditions == []:
+            return 'true'
+        clauses.append('(%s)' % ' &amp;&amp; '.join(conditions))
+    return ' || '.join(sorted(clauses))
+
+
+def compile_filter(entries, axes=None, negation=False):
+    """
+    Gets the smallest Groovy combination filter found which matches exactly
+    the given combinations
+
+    @param entries: combinations of axis names and values
+    @type  entries: list of dicts
+    @param axes: all values of the matrix axes by axis name; conditions
+    allowing all values of an axis are left out (optional)
+    @type  axes: dict
+    @param negation: negates the resulting filter
+    @type  negation: bool
+
+    @return: filter, empty if no combination is given, ``str``
+    """
+
+    if axes:
+        axes = dict((name, frozenset(values)) for name, values in axes.iteritems())
+    cubes = _get_cubes(entries, axes)
+    if cubes == []:
+        filter_ = ''
+    else:
+        axis_names = _sort_axes(set(name for cube in cubes for name in cube))
+        filter_ = None
+        for axis_order in itertools.islice(itertools.permutations(axis_names), MAX_MERGE_ORDERS):
+            candidate = _format_cubes(_merge_cubes(cubes, axis_order, axes))
+            if filter_ is None or len(candidate) < len(filter_):
+                filter_ = candidate
+
+    if negation:
+        filter_ = '!(%s)' % filter_
+
+    return filter_
+
+
+def evaluate(filter_, combination):
+    """
+    Evaluates a combination filter as generated by compile_filter for the
+    given combination
+
+    @param filter_: combination filter
+    @type  filter_: str
+    @param combination: axis names and values
+    @type  combination: dict
+
+    @return type: bool
+    """
+
+    expression = filter_.replace('&amp;&amp;', ' and ').replace('||', ' or ').replace('!(', ' not (')
+    return bool(eval(expression, {'__builtins__': {}, 'true': True, 'false': False}, dict(combination)))
+
+
+def verify_filter(filter_, entries, axes):
+    """
+    Checks if the filter matches exactly the given combinations over the
+    full product of the given axes
+
+    @param filter_: combination filter
+    @type  filter_: str
+    @param entries: combinations of axis names and values
+    @type  entries: list of dicts
+    @param axes: all values of the matrix axes by axis name
+    @type  axes: dict
+
+    @return type: bool
+    """
+
+    axis_names = sorted(axes.keys())
+    for values in itertools.product(*[axes[name] for name in axis_names]):
+        combination = dict(zip(axis_names, values))
+        expected = any(all(combination.get(name) == value for name, value in entry.iteritems())
+                       for entry in entries)
+        if (filter_ != '' and evaluate(filter_, combination)) != expected:
+            return False
+    return True
@@ -1,10 +1,134 @@
 """
-This module provides the classes RosDepResolver and RosDep to get access to
-Rosdep. The Rosdep database can be used to find for ROS stacks the corresponding
-apt packages and the other way around.
+This module provides the classes RosDepResolver, Resolution and RosDep to get
+access to Rosdep. The Rosdep database can be used to find for ROS stacks the
+corresponding apt packages and the other way around.
+
+The resolved rosdep database of a chroot can be stored as snapshot file when
+the chroot tarball is updated. RosDepResolver loads it instead of
+initializing and updating rosdep, as long as the ROS and Ubuntu distro and the
+apt and rosdep sources are the same. Otherwise the dictionaries are read
+from the rosdep sources cache with RosDepIndex.
 """
 import os
-from jenkins_setup.common import apt_get_install, call
+import glob
+import json
+import hashlib
+import time
+from jenkins_setup.common import apt_get_install, call, run_command
+from jenkins_setup.rosdep_index import RosDepIndex
+
+# location of the rosdep database snapshots, one per ROS distro
+SNAPSHOT_DIR = '/var/cache/jenkins_setup'
+
+# seconds a stack resolved by RosDep stays in the cache file
+RESOLVE_CACHE_TTL = 24 * 60 * 60
+
+# files defining the apt and rosdep sources the snapshot depends on
+SOURCES_FILES = ['/etc/apt/sources.list', '/etc/apt/sources.list.d/*.list',
+                 '/etc/ros/rosdep/sources.list.d/*.list']
+
+
+def get_snapshot_path(ros_distro, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Gets the path of the rosdep database snapshot of a ROS distro.
+
+    ros_distro -- string of ROS version
+    snapshot_dir -- directory of the snapshots
+    return -- string of path
+    """
+    return os.path.join(snapshot_dir, 'rosdep_%s.json' % ros_distro)
+
+
+def get_resolve_cache_path(ros_distro, cache_dir=SNAPSHOT_DIR):
+    """
+    Gets the path of the cache file of rosdep resolve of a ROS distro.
+
+    ros_distro -- string of ROS version
+    cache_dir -- directory of the cache file
+    return -- string of path
+    """
+    return os.path.join(cache_dir, 'rosdep_resolve_%s.json' % ros_distro)
+
+
+def parse_resolve_output(output, ros_list):
+    """
+    Parses the output of 'rosdep resolve'. For several stacks every
+    resolution starts with a '#ROSDEP[stack]' line, followed by the
+    installer line, e.g. '#apt', and the packages.
+
+    output -- string of command output
+    ros_list -- list of the resolved ros stacks
+    return -- dict of ros stacks and their apt packages
+    """
+    resolved = {}
+    ros = ros_list[0] if len(ros_list) == 1 else None
+    installer = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('#ROSDEP[') and line.endswith(']'):
+            ros = line[len('#ROSDEP['):-1]
+            installer = None
+        elif line.startswith('#'):
+            installer = line[1:]
+        elif line and ros is not None and ros not in resolved and installer in (None, 'apt'):
+            resolved[ros] = line
+    return resolved
+
+
+def get_ubuntu_distro(lsb_release_file='/etc/lsb-release'):
+    """
+    Gets the code name of the Ubuntu distro of the system.
+
+    lsb_release_file -- lsb-release file to read
+    return -- string of code name, None if unknown
+    """
+    try:
+        with open(lsb_release_file) as f:
+            for line in f:
+                if line.startswith('DISTRIB_CODENAME='):
+                    return line.split('=', 1)[1].strip()
+    except IOError:
+        pass
+    return None
+
+
+def get_sources_hash(patterns=SOURCES_FILES):
+    """
+    Gets a hash of the apt and rosdep source lists.
+
+    patterns -- list of glob patterns of the source list files
+    return -- string of hex digest
+    """
+    digest = hashlib.sha1()
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path) as f:
+                digest.update(path + '\0' + f.read() + '\0')
+    return digest.hexdigest()
+
+
+def get_snapshot_key(ros_distro):
+    """
+    Gets the key a snapshot is only valid for.
+
+    ros_distro -- string of ROS version
+    return -- dict of ros_distro, ubuntu_distro and sources_hash
+    """
+    return {'ros_distro': ros_distro,
+            'ubuntu_distro': get_ubuntu_distro(),
+            'sources_hash': get_sources_hash()}
+
+
+class Resolution(object):
+
+    """
+    Result of RosDepResolver.resolve_many
+    """
+
+    def __init__(self):
+        self.apt_entries = []
+        self.resolved = {}
+        self.missing = []
 
 
 class RosDepResolver(object):
@@ -15,18 +139,24 @@ class RosDepResolver(object):
     stacks can be converted into a list of apt packages.
     """
 
-    def __init__(self, ros_distro, sudo=False):
+    def __init__(self, ros_distro, sudo=False, snapshot_dir=SNAPSHOT_DIR):
         """
-        Initializes rosdep database and builds necessary dictionaries
+        Initializes rosdep database and builds necessary dictionaries.
+        If a matching snapshot exists, it is loaded instead.
 
         ros_distro -- string of ROS version
         sudo -- whether commands should be executed with sudo (default False)
+        snapshot_dir -- directory of the snapshots, None to not use them
         """
+        self.ros_distro = ros_distro
         self.r2a = {}
         self.a2r = {}
         self.env = os.environ
         self.env['ROS_DISTRO'] = ros_distro
 
+        if snapshot_dir and self.load_snapshot(get_snapshot_path(ros_distro, snapshot_dir)):
+            return
+
         print "Initalize rosdep database"
         apt_get_install(['lsb-release', 'python-rosdep'], sudo=sudo)
         try:
@@ -35,6 +165,15 @@ class RosDepResolver(object):
             print "Rosdep is already initialized"
         call("rosdep update", self.env)
 
+        ubuntu_distro = get_ubuntu_distro()
+        if ubuntu_distro:
+            index = RosDepIndex([ubuntu_distro], ros_distro)
+            if index.load() and index.get_r2a(ubuntu_distro) != {}:
+                print "Building dictionaries from rosdep's sources cache"
+                for ros_entry, apt_entries in index.get_r2a(ubuntu_distro).iteritems():
+                    self._add(ros_entry, list(apt_entries))
+                return
+
         print "Building dictionaries from a rosdep's db"
         raw_db = call("rosdep db", self.env, verbose=False).split('\n')
 
@@ -42,11 +181,82 @@ class RosDepResolver(object):
             split_entry = entry.split(' -> ')
             if len(split_entry) < 2:
                 continue
-            ros_entry = split_entry[0]
-            apt_entries = split_entry[1].split(' ')
-            self.r2a[ros_entry] = apt_entries
-            for a_e in apt_entries:
-                self.a2r[a_e] = ros_entry
+            self._add(split_entry[0], split_entry[1].split(' '))
+
+    def _add(self, ros_entry, apt_entries):
+        """
+        Adds a ros entry and its apt entries to the dictionaries.
+
+        ros_entry -- string of ros entry
+        apt_entries -- list of apt entries
+        """
+        self.r2a[ros_entry] = apt_entries
+        for a_e in apt_entries:
+            self.a2r[a_e] = ros_entry
+
+    def load_snapshot(self, path):
+        """
+        Loads the dictionaries from a snapshot file if it was written for
+        the same ROS and Ubuntu distro and sources.
+
+        path -- string of snapshot path
+        return -- boolean whether the snapshot was loaded
+        """
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (IOError, ValueError):
+            return False
+        if snapshot.get('key') != get_snapshot_key(self.ros_distro):
+            print "Rosdep snapshot %s is outdated" % path
+            return False
+
+        for ros_entry, apt_entries in snapshot['r2a'].iteritems():
+            self._add(str(ros_entry), [str(a_e) for a_e in apt_entries])
+        print "Loaded rosdep database from snapshot %s" % path
+        return True
+
+    def save_snapshot(self, path=None):
+        """
+        Writes the dictionaries to a snapshot file.
+
+        path -- string of snapshot path (default: in SNAPSHOT_DIR)
+        return -- string of snapshot path
+        """
+        path = path or get_snapshot_path(self.ros_distro)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        snapshot = {'key': get_snapshot_key(self.ros_distro), 'r2a': self.r2a}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'), sort_keys=True)
+        os.rename(path + '.tmp', path)
+        return path
+
+    def resolve_many(self, ros_entries):
+        """
+        Finds for a list of ros entries their corresponding apt entries.
+        Entries rosdep does not know are collected instead of raising an
+        error.
+
+        ros_entries -- list of ros entries
+        return -- Resolution with the unique apt entries in the order of the
+                  ros entries, the apt entries per ros entry and the missing
+                  ros entries
+        """
+        resolution = Resolution()
+        seen_apt_entries = set()
+        for r_e in ros_entries:
+            if r_e in resolution.resolved or r_e in resolution.missing:
+                continue
+            if r_e not in self.r2a:
+                resolution.missing.append(r_e)
+                continue
+            resolution.resolved[r_e] = self.r2a[r_e]
+            for apt in self.r2a[r_e]:
+                if apt not in seen_apt_entries:
+                    seen_apt_entries.add(apt)
+                    resolution.apt_entries.append(apt)
+        return resolution
 
     def to_aptlist(self, ros_entries):
         """
@@ -55,12 +265,11 @@ class RosDepResolver(object):
         ros_entries -- list of ros entries
         return -- list of corresponding apt entries
         """
-        res = []
-        for r_e in ros_entries:
-            for apt in self.to_apt(r_e):
-                if not apt in res:
-                    res.append(apt)
-        return res
+        resolution = self.resolve_many(ros_entries)
+        if resolution.missing != []:
+            print "Could not find %s in %d rosdep keys" % (', '.join(resolution.missing), len(self.r2a))
+            raise KeyError(resolution.missing[0])
+        return resolution.apt_entries
 
     def to_ros(self, apt_entry):
         """
@@ -70,7 +279,7 @@ class RosDepResolver(object):
         return -- string of ros entry
         """
         if apt_entry not in self.a2r:
-            print "Could not find %s in rosdep keys. Rosdep knows about these keys: %s" % (apt_entry, ', '.join(self.a2r.keys()))
+            print "Could not find %s in the apt entries of %d rosdep keys" % (apt_entry, len(self.r2a))
         return self.a2r[apt_entry]
 
     def to_apt(self, ros_entry):
@@ -81,7 +290,7 @@ class RosDepResolver(object):
         return -- string of apt entry
         """
         if ros_entry not in self.r2a:
-            print "Could not find %s in keys. Have keys %s" % (ros_entry, ', '.join(self.r2a.keys()))
+            print "Could not find %s in %d rosdep keys" % (ros_entry, len(self.r2a))
         return self.r2a[ros_entry]
 
     def has_ros(self, ros_entry):
@@ -108,18 +317,25 @@ class RosDep(object):
     """
     This class allows to initialize a rosdep database and provide the access to
     it the find corresponding ROS stacks and apt packages. Even a list of ROS
+    stacks can be resolved with a single rosdep call. The resolved stacks are
+    stored in a cache file shared by all jobs running in the same chroot.
     """
 
-    def __init__(self, ros_distro):
+    def __init__(self, ros_distro, cache_path=None, ttl=RESOLVE_CACHE_TTL):
         """
         Installs and initializes the rosdep database.
 
         ros_distro -- string of ROS version
+        cache_path -- string of cache file path (default: in SNAPSHOT_DIR),
+                      empty string to not use a cache file
+        ttl -- seconds a cached resolution is valid
         """
         self.r2a = {}
         self.a2r = {}
         self.env = os.environ
         self.env['ROS_DISTRO'] = ros_distro
+        self.cache_path = get_resolve_cache_path(ros_distro) if cache_path is None else cache_path
+        self.ttl = ttl
 
         # Initialize rosdep database
         print "Initalize rosdep database"
@@ -127,6 +343,116 @@ class RosDep(object):
         call("rosdep init", self.env)
         call("rosdep update", self.env)
 
+        for ros, apt in self._load_cache().iteritems():
+            self._add(ros, apt)
+
+    def _add(self, ros, apt):
+        """
+        Adds a resolved ros stack to the dictionaries.
+
+        ros -- string of ros stack
+        apt -- string of apt packages
+        """
+        self.r2a[ros] = apt
+        self.a2r[apt] = ros
+
+    def _load_cache(self):
+        """
+        Reads the resolutions from the cache file which are not expired.
+
+        return -- dict of ros stacks and apt packages
+        """
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                entries = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        now = time.time()
+        return dict((str(ros), str(entry['apt'])) for ros, entry in entries.iteritems()
+                    if now - entry['time'] < self.ttl)
+
+    def _save_cache(self, resolved):
+        """
+        Adds new resolutions to the cache file, keeping the ones other jobs
+        stored in the meantime.
+
+        resolved -- dict of ros stacks and apt packages
+        """
+        if not self.cache_path:
+            return
+        try:
+            entries = {}
+            if os.path.isfile(self.cache_path):
+                with open(self.cache_path) as f:
+                    entries = json.load(f)
+        except (IOError, ValueError):
+            entries = {}
+        now = time.time()
+        for ros, apt in resolved.iteritems():
+            entries[ros] = {'apt': apt, 'time': now}
+        try:
+            if not os.path.isdir(os.path.dirname(self.cache_path)):
+                os.makedirs(os.path.dirname(self.cache_path))
+            tmp_path = '%s.%d' % (self.cache_path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, separators=(',', ':'), sort_keys=True)
+            os.rename(tmp_path, self.cache_path)
+        except (IOError, OSError) as ex:
+            print "Could not write rosdep cache %s: %s" % (self.cache_path, ex)
+
+    def _call_resolve(self, ros_list):
+        """
+        Calls rosdep resolve for the given ros stacks.
+
+        ros_list -- list of ros stacks
+        return -- dict of the resolved ros stacks and their apt packages
+        """
+        result = run_command(['rosdep', 'resolve'] + ros_list, self.env, verbose=False)
+        return parse_resolve_output(result.output, ros_list)
+
+    def resolve_many(self, ros_list):
+        """
+        Finds the apt packages of the given ros stacks. Stacks not cached
+        yet are resolved with a single rosdep call.
+
+        ros_list -- list of ros stacks
+        return -- Resolution with the unique apt packages in the order of
+                  the ros stacks, the apt packages per ros stack and the
+                  ros stacks rosdep could not resolve
+        """
+        unknown = []
+        for ros in ros_list:
+            if ros not in self.r2a and ros not in unknown:
+                unknown.append(ros)
+        if unknown != []:
+            resolved = self._call_resolve(unknown)
+            if len(unknown) > 1 and len(resolved) < len(unknown):
+                # older rosdep versions stop at the first unknown stack
+                for ros in unknown:
+                    if ros not in resolved:
+                        resolved.update(self._call_resolve([ros]))
+            for ros, apt in resolved.iteritems():
+                print "Rosdep %s resolved into %s" % (ros, apt)
+                self._add(ros, apt)
+            self._save_cache(resolved)
+
+        resolution = Resolution()
+        seen_apt_entries = set()
+        for ros in ros_list:
+            if ros in resolution.resolved or ros in resolution.missing:
+                continue
+            if ros not in self.r2a:
+                resolution.missing.append(ros)
+                continue
+            resolution.resolved[ros] = self.r2a[ros].split()
+            for apt in resolution.resolved[ros]:
+                if apt not in seen_apt_entries:
+                    seen_apt_entries.add(apt)
+                    resolution.apt_entries.append(apt)
+        return resolution
+
     def to_apt(self, ros):
         """
         Tries to find apt package for given ros stack.
@@ -134,17 +460,9 @@ class RosDep(object):
         ros -- string of ros stack
         return -- string of apt package
         """
-        if ros in self.r2a:
-            return self.r2a[ros]
-        else:
-            res = call("rosdep resolve %s" % ros, self.env).split('\n')
-            if len(res) == 1:
-                raise Exception("Could not resolve rosdep")
-            apt = call("rosdep resolve %s" % ros, self.env).split('\n')[1]
-            print "Rosdep %s resolved into %s" % (ros, apt)
-            self.r2a[ros] = apt
-            self.a2r[apt] = ros
-            return apt
+        if self.resolve_many([ros]).missing != []:
+            raise Exception("Could not resolve rosdep")
+        return self.r2a[ros]
 
     def to_stack(self, apt):
         """
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+"""
+This module provides the class RosDepIndex to read the rosdep database
+directly from the source files cached by 'rosdep update', without calling
+the rosdep command line tool.
+
+The index maps the rosdep keys to their apt packages and the apt packages
+back to their keys for several Ubuntu distros at once. All names are
+interned and equal package lists are shared between keys and distros, so
+the maps of all distros take little more memory than the ones of a single
+distro.
+"""
+
+import os
+import cPickle
+import hashlib
+import yaml
+
+# name of the file listing the cached sources
+CACHE_INDEX = 'index'
+
+# extension of the cached sources of newer rosdep versions
+PICKLE_CACHE_EXT = '.pickle'
+
+
+def get_default_cache_dir():
+    """
+    Gets the directory 'rosdep update' caches the sources in
+
+    @return type: str
+    """
+
+    ros_home = os.environ.get('ROS_HOME', os.path.join(os.path.expanduser('~'), '.ros'))
+    return os.path.join(ros_home, 'rosdep', 'sources.cache')
+
+
+def get_apt_packages(rule, ubuntu_distro):
+    """
+    Gets the apt packages a rosdep rule defines for an Ubuntu distro
+
+    @param rule: rosdep rule of a key, e.g. {'ubuntu': {'precise': ['pkg']}},
+    the distro '*' matches all distros without an own entry
+    @type  rule: dict
+    @param ubuntu_distro: code name of Ubuntu distro
+    @type  ubuntu_distro: str
+
+    @return param: apt packages, None if the rule does not define any for
+    this distro
+    @return type: list
+    """
+
+    if not isinstance(rule, dict) or 'ubuntu' not in rule:
+        return None
+    os_rule = rule['ubuntu']
+    if isinstance(os_rule, dict):
+        if ubuntu_distro in os_rule:
+            os_rule = os_rule[ubuntu_distro]
+        elif '*' in os_rule:
+            # rosdep's wildcard for all distros without an own entry
+            os_rule = os_rule['*']
+        elif 'apt' not in os_rule:
+            return None
+    if isinstance(os_rule, dict):
+        if 'apt' not in os_rule:
+            return None
+        os_rule = os_rule['apt']
+        if isinstance(os_rule, dict):
+            os_rule = os_rule.get('packages')
+    if os_rule is None:
+        return []
+    if isinstance(os_rule, basestring):
+        return os_rule.split()
+    if isinstance(os_rule, list):
+        return [str(package) for package in os_rule]
+    return None
+
+
+class RosDepIndex(object):
+    """
+    Rosdep keys and apt packages of several Ubuntu distros, read from the
+    rosdep sources cache
+    """
+
+    def __init__(self, ubuntu_distros, ros_distro=None, cache_dir=None):
+        """
+        @param ubuntu_distros: code names of the Ubuntu distros to index
+        @type  ubuntu_distros: list
+        @param ros_distro: name of ros release, sources tagged for other
+        releases are skipped (optional)
+        @type  ros_distro: str
+        @param cache_dir: rosdep sources cache (default: the one of rosdep)
+        @type  cache_dir: str
+        """
+
+        self.ubuntu_distros = list(ubuntu_distros)
+        self.ros_distro = ros_distro
+        self.cache_dir = cache_dir or get_default_cache_dir()
+        self.r2a = dict((ubuntu_distro, {}) for ubuntu_distro in self.ubuntu_distros)
+        self.a2r = dict((ubuntu_distro, {}) for ubuntu_distro in self.ubuntu_distros)
+        self._package_lists = {}
+
+    def get_sources(self):
+        """
+        Gets the cached sources in the order of their precedence
+
+        @return param: tuples of source url and tags
+        @return type: list
+        """
+
+        sources = []
+        with open(os.path.join(self.cache_dir, CACHE_INDEX)) as f:
+            for line in f:
+                line = line.strip()
+                if line == '' or line.startswith('#'):
+                    continue
+                split_line = line.split()
+                if len(split_line) < 2:
+                    continue
+                sources.append((split_line[1], split_line[2:]))
+        return sources
+
+    def load(self):
+        """
+        Reads all cached sources into the maps
+
+        @return param: whether the sources cache exists
+        @return type: bool
+        """
+
+        try:
+            sources = self.get_sources()
+        except IOError:
+            return False
+
+        for url, tags in sources:
+            data = self._load_source(url)
+            if data is None:
+                print "Rosdep source %s is not cached" % url
+                continue
+            for ubuntu_distro in self.ubuntu_distros:
+                if self._matches(tags, ubuntu_distro):
+                    self._add_source(data, ubuntu_distro)
+        return True
+
+    def _matches(self, tags, ubuntu_distro):
+        """
+        Checks if a source with the given tags applies to an Ubuntu distro
+        """
+
+        return all(tag in (self.ros_distro, 'ubuntu', ubuntu_distro) for tag in tags)
+
+    def _load_source(self, url):
+        """
+        Reads the cached data of a source
+        """
+
+        path = os.path.join(self.cache_dir, hashlib.sha1(url).hexdigest())
+        if os.path.isfile(path + PICKLE_CACHE_EXT):
+            with open(path + PICKLE_CACHE_EXT, 'rb') as f:
+                return cPickle.load(f)
+        if os.path.isfile(path):
+            with open(path) as f:
+                return yaml.load(f)
+        return None
+
+    def _add_source(self, data, ubuntu_distro):
+        """
+        Adds the keys of a source which are not defined by a source of
+        higher precedence
+        """
+
+        if not isinstance(data, dict):
+            return
+        r2a = self.r2a[ubuntu_distro]
+        a2r = self.a2r[ubuntu_distro]
+        for key, rule in data.iteritems():
+            key = intern(str(key))
+            if key in r2a:
+                continue
+            packages = get_apt_packages(rule, ubuntu_distro)
+            if packages is None:
+                continue
+            packages = self._share(packages)
+            r2a[key] = packages
+            for package in packages:
+                a2r[package] = key
+
+    def _share(self, packages):
+        """
+        Gets the shared tuple of interned names of a package list
+        """
+
+        packages = tuple(intern(package) for package in packages)
+        return self._package_lists.setdefault(packages, packages)
+
+    def get_r2a(self, ubuntu_distro):
+        """
+        Gets the map of rosdep keys to apt packages of an Ubuntu distro
+
+        @param ubuntu_distro: code name of Ubuntu distro
+        @type  ubuntu_distro: str
+
+        @return type: dict
+        """
+
+        return self.r2a[ubuntu_distro]
+
+    def get_a2r(self, ubuntu_distro):
+        """
+        Gets the map of apt packages to rosdep keys of an Ubuntu distro
+
+        @param ubuntu_distro: code name of Ubuntu distro
+        @type  ubuntu_distro: str
+
+        @return type: dict
+        """
+
+        return self.a2r[ubuntu_distro]
+
+    def has_ros(self, ros_entry, ubuntu_distro):
+        """
+        Checks if a rosdep key is defined for an Ubuntu distro
+
+        @param ros_entry: rosdep key
+        @type  ros_entry: str
+        @param ubuntu_distro: code name of Ubuntu distro
+        @type  ubuntu_distro: str
+
+        @return type: bool
+        """
+
+        return ros_entry in self.r2a[ubuntu_distro]
+
+    def to_apt(self, ros_entry, ubuntu_distro):
+        """
+        Gets the apt packages of a rosdep key for an Ubuntu distro
+
+        @param ros_entry: rosdep key
+        @type  ros_entry: str
+        @param ubuntu_distro: code name of Ubuntu distro
+        @type  ubuntu_distro: str
+
+        @return type: list
+
+        @raise type: KeyError
+        """
+
+        return list(self.r2a[ubuntu_distro][ros_entry])
+
+    def to_ros(self, apt_entry, ubuntu_distro):
+        """
+        Gets the rosdep key of an apt package for an Ubuntu distro
+
+        @param apt_entry: apt package
+        @type  apt_entry: str
+        @param ubuntu_distro: code name of Ubuntu distro
+        @type  ubuntu_distro: str
+
+        @return type: str
+
+        @raise type: KeyError
+        """
+
+        return self.a2r[ubuntu_distro][apt_entry]
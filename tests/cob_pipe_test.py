@@ -167,6 +167,37 @@ class CobPipeTest(unittest.TestCase):
         self.assertEqual(result, {'dep_1': ['cob_extern', 'cob_driver']})
 
 
+class CobPipeConfigHashTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cp = cob_pipe.CobPipe()
+
+        self.repo_test_dict = {'cob_extern': {'type': 'git', 'url': 'git://github.com/ipa320/cob_extern.git',
+                                              'version': 'master', 'poll': True, 'ros_distro': ['groovy'],
+                                              'prio_ubuntu_distro': 'oneiric', 'prio_arch': 'amd64',
+                                              'regular_matrix': None, 'dependencies': None,
+                                              'jobs': None, 'robots': None}}
+        self.pipe_config_test_dict = {'user_name': 'test-user', 'server_name': 'test-server',
+                                      'email': 'test@ipa.fhg.de', 'committer_email_enabled': False,
+                                      'repositories': self.repo_test_dict}
+
+    def test__get_config_hash__input_changed_regular_matrix__return_different_hash(self):
+        self.cp.load_config_from_dict(self.pipe_config_test_dict)
+        result = self.cp.get_config_hash()
+        self.repo_test_dict['cob_extern']['regular_matrix'] = {'precise': ['amd64']}
+        self.repo_test_dict['cob_extern']['jobs'] = ['regular_build']
+        self.cp.load_config_from_dict(self.pipe_config_test_dict)
+        self.assertNotEqual(result, self.cp.get_config_hash())
+
+    def test__get_config_hash__input_fields_without_regular_matrix__return_equal_hash(self):
+        self.cp.load_config_from_dict(self.pipe_config_test_dict)
+        result = self.cp.get_config_hash(['ros_distro', 'prio_arch'])
+        self.repo_test_dict['cob_extern']['regular_matrix'] = {'precise': ['amd64']}
+        self.repo_test_dict['cob_extern']['jobs'] = ['regular_build']
+        self.cp.load_config_from_dict(self.pipe_config_test_dict)
+        self.assertEqual(result, self.cp.get_config_hash(['ros_distro', 'prio_arch']))
+
+
 class CobPipeDependencyRepoTest(unittest.TestCase):
 
     def setUp(self):
@@ -3,6 +3,8 @@
 import unittest
 import os
 import sys
+import shutil
+import tempfile
 from mock import MagicMock, patch
 from jenkins_setup import common
 
@@ -50,14 +52,309 @@ class Common_Test(unittest.TestCase):
         common.apt_get_install(['test-package'], rosdep=mock_rosdep)
         mock_rosdep.to_aptlist.assert_called_once_with(['test-package'])
 
+    @patch('jenkins_setup.common.call')
+    def test__apt_get_update__check_apt_cache_reset(self, mock_call):
+        mock_apt = MagicMock()
+        with patch.dict(sys.modules, {'apt': mock_apt}):
+            index = common.AptPackageIndex()
+            with patch('jenkins_setup.common._apt_index', index):
+                index.get_cache()
+                index.get_cache()
+                common.apt_get_update()
+                index.get_cache()
+        self.assertEqual(mock_apt.Cache.call_count, 2)
+
+    @patch('jenkins_setup.common.apt_get_install')
+    def test__apt_get_install_also_nonrosdep__input_unavailable_pkgs__raise_exception_with_all(self, mock_install):
+        mock_apt = MagicMock()
+        mock_apt.Cache.return_value = ['ros-groovy-available']
+        with patch.dict(sys.modules, {'apt': mock_apt}):
+            with patch('jenkins_setup.common._apt_index', common.AptPackageIndex()):
+                try:
+                    common.apt_get_install_also_nonrosdep(['missing_a', 'available', 'missing_b'], 'groovy')
+                    self.fail("BuildException not raised")
+                except common.BuildException as ex:
+                    self.assertTrue('ros-groovy-missing-a, ros-groovy-missing-b' in ex.msg)
+        self.assertEqual(mock_apt.Cache.call_count, 1)
+        self.assertEqual(mock_install.call_count, 0)
+
+    def _get_apt_index(self, available, installed=()):
+        index = common.AptPackageIndex()
+        index._cache = dict((name, MagicMock(is_installed=name in installed)) for name in available)
+        return index
+
+    @patch('jenkins_setup.common.run_command')
+    def test__apt_install_plan__input_build_and_test_pkgs__check_single_transaction(self, mock_run):
+        mock_run.return_value = common.CommandResult([], [], 0, 0.0)
+        mock_rosdep = MagicMock()
+        mock_rosdep.resolve_many.return_value.resolved = {'boost': ['libboost-dev']}
+        index = self._get_apt_index(['libboost-dev', 'ros-groovy-roscpp', 'ros-groovy-rostest'], ['ros-groovy-rostest'])
+        with patch('jenkins_setup.common._apt_index', index):
+            plan = common.AptInstallPlan('groovy', mock_rosdep)
+            plan.add(['boost', 'roscpp'], 'build')
+            plan.add(['roscpp', 'rostest'], 'test')
+            plan.install()
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(mock_run.call_args[0][0], ['apt-get', 'install', '--yes', 'libboost-dev', 'ros-groovy-roscpp'])
+        self.assertEqual(plan.get_origin('ros-groovy-roscpp'), 'roscpp (build), roscpp (test)')
+
+    def test__apt_install_plan__input_unavailable_optional_pkg__check_skipped(self):
+        with patch('jenkins_setup.common._apt_index', self._get_apt_index([], [])):
+            plan = common.AptInstallPlan('groovy')
+            plan.add(['rostest'], 'test', optional=True)
+            plan.install()
+
+    @patch('jenkins_setup.common.run_command')
+    def test__apt_install_plan__input_failing_install__raise_exception_with_ros_key(self, mock_run):
+        capture = common.OutputCapture('apt-get', spill_dir=None)
+        capture.add('The following packages have unmet dependencies:\n')
+        capture.add(' ros-groovy-roscpp : Depends: libfoo but it is not going to be installed\n')
+        mock_run.return_value = common.CommandResult([], [], 100, 0.0, capture)
+        index = self._get_apt_index(['ros-groovy-roscpp', 'ros-groovy-rospy'])
+        with patch('jenkins_setup.common._apt_index', index):
+            plan = common.AptInstallPlan('groovy')
+            plan.add(['roscpp', 'rospy'])
+            try:
+                plan.install()
+                self.fail("BuildException not raised")
+            except common.BuildException as ex:
+                self.assertTrue(ex.msg.startswith('Failed to apt-get install ros-groovy-roscpp\n'))
+                self.assertTrue('required by roscpp (build)' in ex.msg)
+
     @patch('jenkins_setup.common.call_with_list')
     def test__call__input_command_string__check_call_with_list_call(self, mock_call_with_list):
         common.call("test command")
         mock_call_with_list.assert_called_with(['test', 'command'], None, True)
 
+    def test__run_command__input_command_list__return_output_and_returncode(self):
+        result = common.run_command(['sh', '-c', 'echo out; echo err >&2; exit 3'], verbose=False)
+        self.assertEqual(result.output, 'out\n')
+        self.assertEqual(result.error_output, 'err\n')
+        self.assertEqual(sorted(result.combined_output.split()), ['err', 'out'])
+        self.assertEqual(result.returncode, 3)
+        self.assertTrue(result.duration >= 0)
+
+    def test__run_command__input_command_with_much_stderr__check_no_deadlock(self):
+        result = common.run_command(['sh', '-c', 'i=0; while [ $i -lt 5000 ]; do echo error line $i >&2; i=$((i+1)); done; echo done'], verbose=False)
+        self.assertEqual(result.output, 'done\n')
+        self.assertEqual(len(result.error_output.splitlines()), 5000)
+
+    def test__call_with_list__input_failing_command__raise_exception(self):
+        self.assertRaises(common.BuildException, common.call_with_list, ['sh', '-c', 'exit 1'], None, False)
+
+    def test__output_capture__input_much_output__keep_tail_and_spill_full_output(self):
+        spill_dir = tempfile.mkdtemp()
+        try:
+            capture = common.OutputCapture('test', max_size=20, spill_dir=spill_dir)
+            result = common.run_command(['sh', '-c', 'i=0; while [ $i -lt 100 ]; do echo line $i; i=$((i+1)); done'], verbose=False, capture=capture)
+            self.assertTrue(len(result.tail) <= 20)
+            self.assertTrue(result.tail.endswith('line 99\n'))
+            self.assertEqual(result.chunks, [])
+            self.assertEqual(len(result.combined_output.splitlines()), 100)
+            self.assertEqual(result.output, None)
+            self.assertEqual(result.error_output, None)
+            self.assertTrue(capture.path.startswith(os.path.join(spill_dir, 'command_output')))
+        finally:
+            shutil.rmtree(spill_dir)
+
+    def test__output_capture__input_no_spill_dir__return_none_for_dropped_output(self):
+        with patch.dict(os.environ, {}, clear=True):
+            capture = common.OutputCapture('test', max_size=10)
+        for line in ['first line\n', 'second line\n']:
+            capture.add(line)
+        self.assertEqual(capture.path, None)
+        self.assertEqual(capture.get_tail(), 'cond line\n')
+        self.assertEqual(capture.get_full_output(), None)
+
+    def test__call__input_capture_true__return_result_and_keep_log_file_until_released(self):
+        workspace = tempfile.mkdtemp()
+        try:
+            with patch.dict(os.environ, {'WORKSPACE': workspace}):
+                result = common.call('echo captured', verbose=False, capture=True)
+                self.assertEqual(result.tail, 'captured\n')
+                self.assertEqual(result.combined_output, 'captured\n')
+                with open(result.capture.path) as f:
+                    self.assertEqual(f.read(), 'captured\n')
+                result.release()
+                self.assertEqual(os.listdir(os.path.join(workspace, 'command_output')), [])
+                self.assertEqual(result.tail, 'captured\n')
+                self.assertRaises(common.BuildException, common.call, 'false', verbose=False, capture=True)
+                self.assertEqual(len(os.listdir(os.path.join(workspace, 'command_output'))), 1)
+        finally:
+            shutil.rmtree(workspace)
+
+    def test__get_ros_env__input_setup_file__return_isolated_copies(self):
+        setup_dir = tempfile.mkdtemp()
+        try:
+            setup_file = os.path.join(setup_dir, 'setup.bash')
+            with open(setup_file, 'w') as f:
+                f.write('export ROS_TEST_VAR="first line\nsecond line"\n')
+            with patch('jenkins_setup.common.subprocess.Popen', wraps=common.subprocess.Popen) as mock_popen:
+                ros_env = common.get_ros_env(setup_file, {'PATH': os.environ['PATH']})
+                ros_env['ROS_TEST_VAR'] = 'changed'
+                ros_env_repo = common.get_ros_env(setup_file, {'PATH': os.environ['PATH']})
+            self.assertEqual(mock_popen.call_count, 1)
+            self.assertEqual(ros_env_repo['ROS_TEST_VAR'], 'first line\nsecond line')
+            self.assertFalse('ROS_TEST_VAR' in os.environ)
+        finally:
+            shutil.rmtree(setup_dir)
+
+    def test__get_ros_env__input_missing_setup_file__raise_exception(self):
+        self.assertRaises(common.BuildException, common.get_ros_env, '/nonexistent/setup.bash')
+
     def test__get_all_packages__input_source_folder_str__return_package_dict(self):
         pass
 
+    def _write_file(self, path, content=''):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _create_source_folder(self):
+        source_folder = tempfile.mkdtemp()
+        package_xml = '<package><name>%s</name><export>%s</export></package>'
+        self._write_file(os.path.join(source_folder, 'wet_repo', 'wet_pkg', 'package.xml'), package_xml % ('wet_pkg', ''))
+        self._write_file(os.path.join(source_folder, 'wet_repo', 'wet_meta', 'package.xml'), package_xml % ('wet_meta', '<metapackage/>'))
+        self._write_file(os.path.join(source_folder, 'dry_stack', 'stack.xml'))
+        self._write_file(os.path.join(source_folder, 'dry_stack', 'dry_pkg', 'manifest.xml'))
+        self._write_file(os.path.join(source_folder, 'dry_stack', 'dry_pkg', 'sub_pkg', 'manifest.xml'))
+        self._write_file(os.path.join(source_folder, 'dry_stack', '.git', 'hidden_pkg', 'manifest.xml'))
+        self._write_file(os.path.join(source_folder, 'build', 'built_pkg', 'package.xml'), package_xml % ('built_pkg', ''))
+        self._write_file(os.path.join(source_folder, 'ignored', 'CATKIN_IGNORE'))
+        self._write_file(os.path.join(source_folder, 'ignored', 'ignored_pkg', 'manifest.xml'))
+        return source_folder
+
+    def test__get_all_packages__input_source_folder__return_packages_of_all_types(self):
+        source_folder = self._create_source_folder()
+        try:
+            (catkin_packages, stacks, manifest_packages) = common.get_all_packages(source_folder)
+            self.assertEqual(catkin_packages, {'wet_pkg': os.path.join(source_folder, 'wet_repo', 'wet_pkg'),
+                                               'wet_meta': os.path.join(source_folder, 'wet_repo', 'wet_meta')})
+            self.assertEqual(stacks, {'dry_stack': os.path.join(source_folder, 'dry_stack')})
+            self.assertEqual(manifest_packages, {'dry_pkg': os.path.join(source_folder, 'dry_stack', 'dry_pkg')})
+        finally:
+            shutil.rmtree(source_folder)
+
+    def test__scan_packages__input_unchanged_source_folder__check_cached(self):
+        source_folder = self._create_source_folder()
+        try:
+            common.scan_packages(source_folder)[0]['changed'] = 'result'
+            with patch('jenkins_setup.common.os.listdir') as mock_listdir:
+                (catkin_packages, stacks, manifest_packages) = common.scan_packages(source_folder)
+            self.assertEqual(mock_listdir.call_count, 0)
+            self.assertEqual(sorted(catkin_packages), ['wet_meta', 'wet_pkg'])
+            new_package_dir = os.path.join(source_folder, 'new_pkg')
+            self._write_file(os.path.join(new_package_dir, 'manifest.xml'))
+            os.utime(source_folder, (0, 0))
+            self.assertEqual(common.scan_packages(source_folder)[2]['new_pkg'], new_package_dir)
+        finally:
+            shutil.rmtree(source_folder)
+
+    @patch('jenkins_setup.common._parse_manifest')
+    def test__get_manifest__input_same_file_twice__check_parsed_once(self, mock_parse):
+        package_dir = tempfile.mkdtemp()
+        try:
+            manifest_file = os.path.join(package_dir, 'manifest.xml')
+            self._write_file(manifest_file, '<package/>')
+            mock_parse.side_effect = lambda path, manifest_type: common.ManifestInfo('test_pkg', depends=('roscpp',))
+            common.get_manifest(package_dir, 'manifest.xml')
+            manifest = common.get_manifest(package_dir, 'manifest.xml')
+            self.assertEqual(mock_parse.call_count, 1)
+            self.assertEqual(manifest.depends, ('roscpp',))
+            os.utime(manifest_file, (0, 0))
+            common.get_manifest(package_dir, 'manifest.xml')
+            self.assertEqual(mock_parse.call_count, 2)
+        finally:
+            shutil.rmtree(package_dir)
+
+    @patch('jenkins_setup.common.get_manifest')
+    def test__build_local_dependency_graph__input_packages__return_local_dependencies(self, mock_get_manifest):
+        manifests = {'wet_a': common.ManifestInfo('wet_a', build_depends=('wet_b', 'roscpp'), test_depends=('wet_a',)),
+                     'wet_b': common.ManifestInfo('wet_b'),
+                     'dry_c': common.ManifestInfo('dry_c', depends=('wet_b', 'dry_c', 'boost'))}
+        mock_get_manifest.side_effect = lambda path, manifest_type: manifests[path]
+        depends = common.build_local_dependency_graph({'wet_a': 'wet_a', 'wet_b': 'wet_b'}, {'dry_c': 'dry_c'})
+        self.assertEqual(depends, {'wet_a': ['wet_b'], 'wet_b': [], 'dry_c': ['wet_b']})
+
+    @patch('jenkins_setup.common.get_manifest')
+    def test__get_nonlocal_dependencies__input_catkin_packages__return_unique_dependencies_with_origins(self, mock_get_manifest):
+        manifests = {'wet_a': common.ManifestInfo('wet_a', buildtool_depends=('catkin',), build_depends=('wet_b', 'roscpp'),
+                                                  run_depends=('roscpp',), test_depends=('rostest',)),
+                     'wet_b': common.ManifestInfo('wet_b', buildtool_depends=('catkin',), build_depends=('boost',))}
+        mock_get_manifest.side_effect = lambda path, manifest_type: manifests[path]
+        catkin_packages = {'wet_a': 'wet_a', 'wet_b': 'wet_b'}
+        depends = common.get_nonlocal_dependencies(catkin_packages, {}, {})
+        self.assertEqual(sorted(depends), ['boost', 'catkin', 'roscpp', 'rostest'])
+        self.assertEqual(sorted(depends.origins['catkin']), [('wet_a', 'buildtool'), ('wet_b', 'buildtool')])
+        self.assertEqual(depends.origins['roscpp'], [('wet_a', 'build'), ('wet_a', 'run')])
+        self.assertEqual(sorted(depends.get_by_type(*common.BUILD_DEPEND_TYPES)), ['boost', 'catkin', 'roscpp'])
+        self.assertEqual(depends.get_by_type(*common.TEST_DEPEND_TYPES), ['roscpp', 'rostest'])
+        self.assertEqual(common.get_nonlocal_dependencies(catkin_packages, {}, {}, test_depends=False),
+                         depends.get_by_type(*common.BUILD_DEPEND_TYPES))
+
+    def test__get_available_memory__input_meminfo_and_cgroup_files__return_limited_memory_in_bytes(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            meminfo_file = os.path.join(tmpdir, 'meminfo')
+            with open(meminfo_file, 'w') as f:
+                f.write('MemTotal:        8048576 kB\nMemFree:         1048576 kB\nMemAvailable:    4194304 kB\n')
+            self.assertEqual(common.get_available_memory(meminfo_file, tmpdir), 4194304 * 1024)
+            with open(os.path.join(tmpdir, 'memory.max'), 'w') as f:
+                f.write('1073741824\n')
+            self.assertEqual(common.get_available_memory(meminfo_file, tmpdir), 1073741824)
+            self.assertEqual(common.get_available_memory(os.path.join(tmpdir, 'missing'), tmpdir), 1073741824)
+            with open(os.path.join(tmpdir, 'memory.max'), 'w') as f:
+                f.write('max\n')
+            self.assertEqual(common.get_available_memory(os.path.join(tmpdir, 'missing'), tmpdir), None)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test__get_cgroup_cpu_limit__input_cgroup_v1_and_v2_files__return_cpus(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            self.assertEqual(common.get_cgroup_cpu_limit(tmpdir), None)
+            os.mkdir(os.path.join(tmpdir, 'cpu'))
+            with open(os.path.join(tmpdir, 'cpu', 'cpu.cfs_quota_us'), 'w') as f:
+                f.write('150000\n')
+            with open(os.path.join(tmpdir, 'cpu', 'cpu.cfs_period_us'), 'w') as f:
+                f.write('100000\n')
+            self.assertEqual(common.get_cgroup_cpu_limit(tmpdir), 1.5)
+            with open(os.path.join(tmpdir, 'cpu.max'), 'w') as f:
+                f.write('max 100000\n')
+            self.assertEqual(common.get_cgroup_cpu_limit(tmpdir), None)
+            with open(os.path.join(tmpdir, 'cpu.max'), 'w') as f:
+                f.write('400000 100000\n')
+            self.assertEqual(common.get_cgroup_cpu_limit(tmpdir), 4.0)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    @patch('jenkins_setup.common.get_available_memory')
+    @patch('jenkins_setup.common.get_cpu_count')
+    def test__get_parallel_jobs__input_cpus_and_memory__return_limited_job_count(self, mock_cpu_count, mock_available_memory):
+        mock_cpu_count.return_value = 8
+        mock_available_memory.return_value = 4 * common.MEMORY_PER_BUILD_JOB
+        self.assertEqual(common.get_parallel_jobs(), 4)
+        mock_available_memory.return_value = None
+        self.assertEqual(common.get_parallel_jobs('prio_build'), 8)
+        mock_available_memory.return_value = common.MEMORY_PER_BUILD_JOB / 2
+        self.assertEqual(common.get_parallel_jobs(), 1)
+
+    @patch('jenkins_setup.common.get_available_memory')
+    @patch('jenkins_setup.common.get_cpu_count')
+    def test__get_parallel_jobs__input_job_type_and_pipeline_config__return_configured_job_count(self, mock_cpu_count, mock_available_memory):
+        mock_cpu_count.return_value = 8
+        mock_available_memory.return_value = None
+        pipeline_config = {'parallel_jobs': {'prio_build': 2, 'build': 3, 'graphics_test': 4, 'default': 5}}
+        self.assertEqual(common.get_parallel_jobs('prio_build', pipeline_config), 2)
+        self.assertEqual(common.get_parallel_jobs('regular_build', pipeline_config), 3)
+        self.assertEqual(common.get_parallel_jobs('prio_graphics_test', pipeline_config), 4)
+        self.assertEqual(common.get_parallel_jobs('downstream_build', pipeline_config), 5)
+        self.assertEqual(common.get_parallel_jobs('downstream_build', {'parallel_jobs': 6}), 6)
+        self.assertEqual(common.get_parallel_jobs('prio_build', {'parallel_jobs': 0}), 8)
+        self.assertEqual(common.get_parallel_jobs('prio_graphics_test', {}), 1)
+        self.assertEqual(common.get_parallel_jobs('prio_nongraphics_test', {}), 8)
+
     def test__get_buildpipeline_configs__input_server_and_user_name_string__return_configs_dict(self):
         result = common.get_buildpipeline_configs('jenkins-test-server', 'test-user', 'git@github.com:fmw-jk/jenkins_config.git')
         self.assertEqual(type(result), dict)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import unittest
+from jenkins_setup import dag, common
+
+
+class DagTest(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+        self.depends = {'app': ['lib_a', 'lib_b'], 'lib_a': ['core'], 'lib_b': ['core', 'lib_b'], 'core': []}
+
+    def test__get_build_levels__input_depends__return_parallel_levels(self):
+        self.assertEqual(dag.get_build_levels(self.depends), [['core'], ['lib_a', 'lib_b'], ['app']])
+
+    def test__get_build_levels__input_dependency_without_key__return_it_first(self):
+        self.assertEqual(dag.get_build_levels({'app': ['external']}), [['external'], ['app']])
+
+    def test__get_build_order__input_depends__return_dependencies_first(self):
+        self.assertEqual(dag.get_build_order(self.depends), ['core', 'lib_a', 'lib_b', 'app'])
+
+    def test__get_build_order__input_empty_dict__return_empty_list(self):
+        self.assertEqual(dag.get_build_order({}), [])
+
+    def test__get_build_order__input_cycle__raise_cycle_error(self):
+        depends = dict(self.depends, core=['app'], other=['app'])
+        try:
+            dag.get_build_order(depends)
+            self.fail("CycleError not raised")
+        except dag.CycleError as ex:
+            self.assertEqual(ex.cycle, ['app', 'lib_a', 'core', 'app'])
+            self.assertEqual(ex.msg, "Dependency cycle: app -> lib_a -> core -> app")
+
+    def test__reorder_paths__input_build_order__return_paths_in_order(self):
+        order = common.get_dependency_build_order(self.depends)
+        result = common.reorder_paths(order, ['app', 'core', 'lib_a', 'lib_b'], ['/app', '/core', '/lib_a', '/lib_b'])
+        self.assertEqual(result, (order, ['/core', '/lib_a', '/lib_b', '/app']))
+
+
+if __name__ == "__main__":
+    unittest.main()
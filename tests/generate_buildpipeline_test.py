@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import unittest
+
+import os
+import imp
+import shutil
+import tempfile
+import optparse
+from mock import MagicMock, patch
+
+from jenkins_setup import jenkins_job_creator
+
+generate_buildpipeline = imp.load_source('generate_buildpipeline',
+                                         os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      '..', 'scripts', 'generate_buildpipeline.py'))
+
+
+class ScheduleJobsTest(unittest.TestCase):
+    """
+    Tests the scheduling of the jobs of all users
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.options = optparse.Values({'config_cache': os.path.join(self.tmpdir, 'config_cache.yaml'),
+                                        'state_file': os.path.join(self.tmpdir, 'state.yaml'),
+                                        'upload': None, 'delete': False, 'jobs': 2, 'retries': 0})
+        self.jenkins_instance = MagicMock()
+        self.jenkins_instance.get_jobs.return_value = [{'name': 'test-user__test_job'}]
+        self.job = self._get_job('test-user__test_job')
+        state = jenkins_job_creator.PipelineState(self.options.state_file)
+        state.set_user('test-user', 'config_hash', 'version',
+                       {'test-user__test_job': {'input': 'input_hash', 'config': 'job_config_hash'}})
+        state.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _get_job(self, job_name):
+        job = MagicMock()
+        job.job_name = job_name
+        job.job_config = '<project/>'
+        job.schedule_result = None
+        job.pipe_inst.get_config_hash.return_value = 'config_hash'
+        job.get_input_hash.return_value = 'input_hash'
+        job.schedule_job.return_value = "Created job %s" % job_name
+        return job
+
+    @patch('jenkins_setup.jenkins_job_creator.get_generator_version')
+    def test__schedule_jobs__input_unchanged_pipeline__check_job_skipped(self, mock_version):
+        mock_version.return_value = 'version'
+        failed_users = {}
+        generate_buildpipeline.schedule_jobs(['test-user'], {'test-user': [self.job]}, self.jenkins_instance,
+                                             self.options, failed_users)
+        self.assertEqual(self.job.render_job.call_count, 0)
+        self.assertEqual(self.job.schedule_job.call_count, 0)
+        self.assertEqual(self.job.schedule_result, 'unchanged')
+        self.assertEqual(self.jenkins_instance.delete_job.call_count, 0)
+        self.assertEqual(failed_users, {})
+        state = jenkins_job_creator.PipelineState(self.options.state_file)
+        self.assertEqual(state.get_job_input_hash('test-user', 'test-user__test_job'), 'input_hash')
+
+    @patch('jenkins_setup.jenkins_job_creator.get_generator_version')
+    def test__schedule_jobs__input_other_generator_version__check_job_scheduled(self, mock_version):
+        mock_version.return_value = 'other_version'
+        self.job.get_input_hash.return_value = 'other_input_hash'
+        generate_buildpipeline.schedule_jobs(['test-user'], {'test-user': [self.job]}, self.jenkins_instance,
+                                             self.options, {})
+        self.assertEqual(self.job.render_job.call_count, 1)
+        self.assertEqual(self.job.schedule_job.call_count, 1)
+        state = jenkins_job_creator.PipelineState(self.options.state_file)
+        self.assertTrue(state.is_user_unchanged('test-user', 'config_hash', 'other_version'))
+        self.assertEqual(state.get_job_input_hash('test-user', 'test-user__test_job'), 'other_input_hash')
+
+    @patch('jenkins_setup.jenkins_job_creator.get_generator_version')
+    def test__schedule_jobs__input_other_tarball_location__check_job_reconfigured(self, mock_version):
+        mock_version.return_value = 'version'
+        pipe_inst = MagicMock()
+        pipe_inst.get_config_hash.return_value = 'config_hash'
+        pipe_inst.pipeline_repos_owner = 'test-owner'
+        pipe_inst.config_folder = None
+        job = jenkins_job_creator.JenkinsJob(self.jenkins_instance, pipe_inst)
+        job.job_name = 'test-user__test_job'
+        job.tarball_location = 'user@old-server:tarballs'
+        job.render_job = MagicMock()
+        job.schedule_job = MagicMock(return_value="Reconfigured job test-user__test_job")
+        state = jenkins_job_creator.PipelineState(self.options.state_file)
+        state.set_user('test-user', 'config_hash', 'version',
+                       {'test-user__test_job': {'input': job.get_input_hash('version'), 'config': 'job_config_hash'}})
+        state.save()
+
+        job.tarball_location = 'user@new-server:tarballs'
+        generate_buildpipeline.schedule_jobs(['test-user'], {'test-user': [job]}, self.jenkins_instance, self.options, {})
+        self.assertEqual(job.render_job.call_count, 1)
+        self.assertEqual(job.schedule_job.call_count, 1)
+
+    @patch('jenkins_setup.jenkins_job_creator.get_generator_version')
+    def test__schedule_jobs__input_failing_render__check_other_users_scheduled(self, mock_version):
+        mock_version.return_value = 'other_version'
+        self.job.get_input_hash.return_value = 'other_input_hash'
+        failing_job = self._get_job('other-user__test_job')
+        failing_job.render_job.side_effect = KeyError('missing')
+        self.jenkins_instance.get_jobs.return_value = [{'name': 'test-user__test_job'}, {'name': 'other-user__old_job'}]
+        failed_users = {}
+        generate_buildpipeline.schedule_jobs(['test-user', 'other-user'],
+                                             {'test-user': [self.job], 'other-user': [failing_job]},
+                                             self.jenkins_instance, self.options, failed_users)
+        self.assertEqual(self.job.schedule_job.call_count, 1)
+        self.assertEqual(failing_job.schedule_job.call_count, 0)
+        self.assertEqual(failed_users.keys(), ['other-user'])
+        self.assertEqual(self.jenkins_instance.delete_job.call_count, 0)
+        self.assertTrue(os.path.isfile(self.options.config_cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,10 +3,14 @@
 import unittest
 
 import os
+import shutil
+import tempfile
 import datetime
 import socket
+import urllib2
 import yaml
 import jenkins
+from mock import MagicMock
 
 from jenkins_setup import jenkins_job_creator, cob_pipe
 
@@ -28,6 +32,14 @@ EMPTY_CONFIG_XML = """<?xml version='1.0' encoding='UTF-8'?>
   <buildWrappers/>
 </project>"""
 
+GENERATED_CONFIG_XML = """<?xml version='1.0' encoding='UTF-8'?>
+<project>
+  <actions/>
+  <description>AUTOMATICALLY GENERATED JOB, DO NOT EDIT BY HAND! This job was generated by test-user on %s at %s from the python-jenkins-tools package, and runs the prio_build script.</description>
+  <keepDependencies>false</keepDependencies>
+  <assignedNode>master</assignedNode>
+</project>"""
+
 
 class JenkinsJobTest(unittest.TestCase):
     """
@@ -170,35 +182,6 @@ class JenkinsJobTest(unittest.TestCase):
         result = self.jj._generate_job_list_string([])
         self.assertEqual(result, '')
 
-    # Testing generate_matrix_filter
-    def test__generate_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string(self):
-        test_dict = [{'ros_distro': 'test_rosdistro',
-                      'ubuntu_distro': 'natty',
-                      'arch': 'amd64'}]
-        result = self.jj._generate_matrix_filter(test_dict, False)
-        self.assertEqual(result, '(ubuntu_distro=="natty" &amp;&amp; arch=="amd64" &amp;&amp; ros_distro=="test_rosdistro")')
-
-    def test__generate_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string2(self):
-        test_dict = [{'ros_distro': 'test_rosdistro',
-                      'ubuntu_distro': 'natty',
-                      'arch': 'amd64'}]
-        result = self.jj._generate_matrix_filter(test_dict, True)
-        self.assertEqual(result, '!((ubuntu_distro=="natty" &amp;&amp; arch=="amd64" &amp;&amp; ros_distro=="test_rosdistro"))')
-
-    def test__generate_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string3(self):
-        test_dict = [{'ros_distro': 'test_rosdistro'},
-                     {'ubuntu_distro': 'natty',
-                      'arch': 'amd64'}]
-        result = self.jj._generate_matrix_filter(test_dict, False)
-        self.assertEqual(result, '(ros_distro=="test_rosdistro") || (ubuntu_distro=="natty" &amp;&amp; arch=="amd64")')
-
-    def test__generate_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string4(self):
-        test_dict = [{'ros_distro': 'test_rosdistro'},
-                     {'ubuntu_distro': 'natty',
-                      'arch': 'amd64'}]
-        result = self.jj._generate_matrix_filter(test_dict, True)
-        self.assertEqual(result, '!((ros_distro=="test_rosdistro") || (ubuntu_distro=="natty" &amp;&amp; arch=="amd64"))')
-
     # Testing generate_matrix_axis
     def test__generate_matrix_axis__input_name_string_and_value_list__return_axis_config_string(self):
         axis_name = 'test_axis'
@@ -606,6 +589,85 @@ class JenkinsJobTest(unittest.TestCase):
  </hudson.plugins.build__timeout.BuildTimeoutWrapper>')
 
 
+class JenkinsJobMatrixTest(unittest.TestCase):
+    """
+    Tests the matrix generation of Jenkins jobs with a local pipeline
+    configuration and a mocked Jenkins instance
+    """
+
+    def setUp(self):
+        self.maxDiff = None
+
+        self.repo_test_dict = {'test_repo_1': {'type': 'git', 'url': 'git://github.com/ipa320/test_repo_1.git',
+                                               'version': 'master', 'poll': True,
+                                               'ros_distro': ['test_rosdistro', 'test_rosdistro_2'],
+                                               'prio_ubuntu_distro': 'oneiric', 'prio_arch': 'amd64',
+                                               'regular_matrix': {'lucid': ['amd64', 'i386']}, 'dependencies': None,
+                                               'jobs': ['regular_build'], 'robots': None},
+                               'test_repo_2': {'type': 'git', 'url': 'git://github.com/ipa320/test_repo_2.git',
+                                               'version': 'master', 'poll': True, 'ros_distro': ['test_rosdistro'],
+                                               'prio_ubuntu_distro': 'lucid', 'prio_arch': 'amd64',
+                                               'regular_matrix': None, 'dependencies': None,
+                                               'jobs': None, 'robots': None}}
+        self.pipe_config_test_dict = {'user_name': 'test-user', 'server_name': 'test-server',
+                                      'email': 'test@ipa.fhg.de', 'committer_email_enabled': False,
+                                      'repositories': self.repo_test_dict}
+        self.test_pipe_inst = cob_pipe.CobPipe()
+        self.test_pipe_inst.load_config_from_dict(self.pipe_config_test_dict)
+
+        self.jj = jenkins_job_creator.JenkinsJob(MagicMock(), self.test_pipe_inst)
+
+    # Testing generate_optimized_matrix_filter
+    def test__generate_optimized_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string(self):
+        test_dict = [{'ros_distro': 'test_rosdistro',
+                      'ubuntu_distro': 'natty',
+                      'arch': 'amd64'}]
+        result = self.jj._generate_optimized_matrix_filter(test_dict, negation=False)
+        self.assertEqual(result, '(ros_distro=="test_rosdistro" &amp;&amp; ubuntu_distro=="natty" &amp;&amp; arch=="amd64")')
+
+    def test__generate_optimized_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string2(self):
+        test_dict = [{'ros_distro': 'test_rosdistro',
+                      'ubuntu_distro': 'natty',
+                      'arch': 'amd64'}]
+        result = self.jj._generate_optimized_matrix_filter(test_dict, negation=True)
+        self.assertEqual(result, '!((ros_distro=="test_rosdistro" &amp;&amp; ubuntu_distro=="natty" &amp;&amp; arch=="amd64"))')
+
+    def test__generate_optimized_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string3(self):
+        test_dict = [{'ros_distro': 'test_rosdistro'},
+                     {'ubuntu_distro': 'natty',
+                      'arch': 'amd64'}]
+        result = self.jj._generate_optimized_matrix_filter(test_dict, negation=False)
+        self.assertEqual(result, '(ros_distro=="test_rosdistro") || (ubuntu_distro=="natty" &amp;&amp; arch=="amd64")')
+
+    def test__generate_optimized_matrix_filter__input_dict_list_and_negation_boolean_return_filter_string4(self):
+        test_dict = [{'ros_distro': 'test_rosdistro'},
+                     {'ubuntu_distro': 'natty',
+                      'arch': 'amd64'}]
+        result = self.jj._generate_optimized_matrix_filter(test_dict, negation=True)
+        self.assertEqual(result, '!((ros_distro=="test_rosdistro") || (ubuntu_distro=="natty" &amp;&amp; arch=="amd64"))')
+
+    def test__generate_optimized_matrix_filter__input_dict_list_and_axes__return_filter_string_without_full_axes(self):
+        test_dict = [{'ros_distro': 'groovy', 'arch': 'amd64'},
+                     {'ros_distro': 'groovy', 'arch': 'i386'}]
+        axes = [{'ros_distro': ['groovy', 'hydro']}, {'arch': ['amd64', 'i386']}]
+        result = self.jj._generate_optimized_matrix_filter(test_dict, axes)
+        self.assertEqual(result, '(ros_distro=="groovy")')
+
+    # Testing get_sparse_matrix_entries
+    def test__get_sparse_matrix_entries__input_subset_filter_input__return_dict_list(self):
+        subset_filter_input = [{'repository': 'test_repo_1', 'ros_distro': 'test_rosdistro', 'ubuntu_distro': 'oneiric', 'arch': 'amd64'},
+                               {'repository': 'test_repo_2', 'ros_distro': 'test_rosdistro', 'ubuntu_distro': 'lucid', 'arch': 'amd64'}]
+        result = self.jj._get_sparse_matrix_entries(subset_filter_input)
+        self.assertEqual(result, [{'repository': ['test_repo_1', 'test_repo_2']},
+                                  {'ros_distro': ['test_rosdistro']},
+                                  {'ubuntu_distro': ['oneiric', 'lucid']},
+                                  {'arch': ['amd64']}])
+
+    def test__get_sparse_matrix_entries__input_empty_list__return_dense_dict_list(self):
+        result = self.jj._get_sparse_matrix_entries([])
+        self.assertEqual(result, self.jj._get_matrix_entries())
+
+
 class PipeStarterJobTest(unittest.TestCase):
     """
     Tests Pipe Starter jobs
@@ -667,3 +729,226 @@ class RegularBuildJobTest(unittest.TestCase):
                                   {'repository': 'test_repo_1', 'ros_distro': 'test_rosdistro_2', 'ubuntu_distro': 'lucid', 'arch': 'i386'},
                                   {'repository': 'test_repo_1', 'ros_distro': 'test_rosdistro_2', 'ubuntu_distro': 'oneiric', 'arch': 'i386'},
                                   {'repository': 'test_repo_3', 'ros_distro': 'test_rosdistro', 'ubuntu_distro': 'lucid', 'arch': 'i386'}])
+
+
+class ScheduleJobTest(unittest.TestCase):
+    """
+    Tests the scheduling of jobs with a mocked Jenkins instance
+    """
+
+    def setUp(self):
+        self.maxDiff = None
+
+        self.test_pipe_inst = cob_pipe.CobPipe()
+        self.test_pipe_inst.user_name = 'test-user'
+
+        self.jenkins_instance = MagicMock()
+        self.jj = jenkins_job_creator.JenkinsJob(self.jenkins_instance, self.test_pipe_inst)
+        self.jj.job_name = 'test-user__test_job'
+        self.jj.job_config = GENERATED_CONFIG_XML % ('host-1', '2013-01-01 10:00')
+        self.jj.config_cache = jenkins_job_creator.JobConfigCache()
+
+    def test__normalize_job_config__input_different_stamps__return_equal_str(self):
+        result = jenkins_job_creator.normalize_job_config(GENERATED_CONFIG_XML % ('host-1', '2013-01-01 10:00'))
+        self.assertEqual(result, jenkins_job_creator.normalize_job_config(GENERATED_CONFIG_XML % ('host-2', '2013-02-03 11:11')))
+
+    def test__normalize_job_config__input_jenkins_formatting__return_equal_str(self):
+        result = jenkins_job_creator.normalize_job_config(GENERATED_CONFIG_XML % ('host-1', '2013-01-01 10:00'))
+        jenkins_config = '<?xml version="1.0" encoding="UTF-8"?>\n' + (GENERATED_CONFIG_XML % ('host-2', '2013-02-03 11:11')).split('\n', 1)[1].replace('<actions/>', '<actions></actions>').replace('  ', '    ')
+        self.assertEqual(result, jenkins_job_creator.normalize_job_config(jenkins_config))
+
+    def test__schedule_job__job_not_existent__check_created(self):
+        self.jenkins_instance.job_exists.return_value = False
+        self.jj.schedule_job()
+        self.jenkins_instance.create_job.assert_called_once_with(self.jj.job_name, self.jj.job_config)
+        self.assertEqual(self.jj.schedule_result, 'created')
+        self.assertEqual(self.jj.config_cache.get(self.jj.job_name), jenkins_job_creator.get_job_config_hash(self.jj.job_config))
+
+    def test__schedule_job__remote_config_unchanged__check_unchanged(self):
+        self.jenkins_instance.job_exists.return_value = True
+        self.jenkins_instance.get_job_config.return_value = GENERATED_CONFIG_XML % ('host-2', '2013-02-03 11:11')
+        self.jj.schedule_job()
+        self.assertEqual(self.jenkins_instance.reconfig_job.call_count, 0)
+        self.assertEqual(self.jj.schedule_result, 'unchanged')
+
+    def test__schedule_job__cached_config_unchanged__check_unchanged(self):
+        self.jenkins_instance.job_exists.return_value = True
+        self.jj.config_cache.set(self.jj.job_name, jenkins_job_creator.get_job_config_hash(self.jj.job_config))
+        self.jj.schedule_job()
+        self.assertEqual(self.jenkins_instance.get_job_config.call_count, 0)
+        self.assertEqual(self.jenkins_instance.reconfig_job.call_count, 0)
+        self.assertEqual(self.jj.schedule_result, 'unchanged')
+
+    def test__schedule_job__remote_config_changed__check_reconfigured(self):
+        self.jenkins_instance.job_exists.return_value = True
+        self.jenkins_instance.get_job_config.return_value = EMPTY_CONFIG_XML
+        self.jj.schedule_job()
+        self.jenkins_instance.reconfig_job.assert_called_once_with(self.jj.job_name, self.jj.job_config)
+        self.assertEqual(self.jj.schedule_result, 'reconfigured')
+
+    def test__schedule_job__reconfiguration_fails__check_failed(self):
+        self.jenkins_instance.job_exists.return_value = True
+        self.jenkins_instance.get_job_config.return_value = EMPTY_CONFIG_XML
+        self.jenkins_instance.reconfig_job.side_effect = jenkins.JenkinsException('error')
+        self.jj.config_cache.set(self.jj.job_name, 'old_hash')
+        self.jj.schedule_job()
+        self.assertEqual(self.jj.schedule_result, 'failed')
+        self.assertEqual(self.jj.config_cache.get(self.jj.job_name), None)
+
+    def test__schedule_job__create_job_already_exists__check_not_retried(self):
+        self.jenkins_instance.job_exists.return_value = False
+        self.jenkins_instance.create_job.side_effect = jenkins.JenkinsException('job[test-user__test_job] already exists')
+        self.jj.retries = 3
+        self.jj.retry_delay = 0
+        self.jj.schedule_job()
+        self.assertEqual(self.jenkins_instance.create_job.call_count, 1)
+        self.assertEqual(self.jj.schedule_result, 'failed')
+
+    def test__schedule_job__network_error__check_retried_and_failed(self):
+        self.jenkins_instance.job_exists.return_value = False
+        self.jenkins_instance.create_job.side_effect = socket.error('connection reset')
+        self.jj.retries = 2
+        self.jj.retry_delay = 0
+        self.jj.schedule_job()
+        self.assertEqual(self.jenkins_instance.create_job.call_count, 3)
+        self.assertEqual(self.jj.schedule_result, 'failed')
+
+    def test__is_transient_error__input_errors__return_only_network_and_server_errors(self):
+        self.assertTrue(jenkins_job_creator.is_transient_error(socket.error('timed out')))
+        self.assertTrue(jenkins_job_creator.is_transient_error(urllib2.URLError('no route')))
+        self.assertTrue(jenkins_job_creator.is_transient_error(urllib2.HTTPError('url', 503, 'unavailable', {}, None)))
+        self.assertTrue(jenkins_job_creator.is_transient_error(jenkins.JenkinsException('Error in request. Possibly authentication failed [500]: error')))
+        self.assertFalse(jenkins_job_creator.is_transient_error(urllib2.HTTPError('url', 400, 'bad request', {}, None)))
+        self.assertFalse(jenkins_job_creator.is_transient_error(jenkins.JenkinsException('job[test] already exists')))
+
+    def test__schedule_job__inventory_job_existent__check_no_job_exists_call(self):
+        self.jenkins_instance.get_jobs.return_value = [{'name': 'test-user__test_job'}, {'name': 'other-user__test_job'}]
+        self.jenkins_instance.get_job_config.return_value = GENERATED_CONFIG_XML % ('host-2', '2013-02-03 11:11')
+        self.jj.inventory = jenkins_job_creator.JobInventory(self.jenkins_instance)
+        self.jj.schedule_job()
+        self.assertEqual(self.jenkins_instance.job_exists.call_count, 0)
+        self.assertEqual(self.jj.schedule_result, 'unchanged')
+
+    def test__schedule_job__inventory_outdated__check_created_after_refresh(self):
+        self.jenkins_instance.get_jobs.side_effect = [[{'name': 'test-user__test_job'}], []]
+        self.jenkins_instance.get_job_config.side_effect = jenkins.JenkinsException('not found')
+        self.jenkins_instance.reconfig_job.side_effect = jenkins.JenkinsException('not found')
+        self.jj.inventory = jenkins_job_creator.JobInventory(self.jenkins_instance)
+        self.jj.schedule_job()
+        self.jenkins_instance.create_job.assert_called_once_with(self.jj.job_name, self.jj.job_config)
+        self.assertEqual(self.jj.schedule_result, 'created')
+        self.assertTrue(self.jj.inventory.exists(self.jj.job_name))
+
+
+class JobInventoryTest(unittest.TestCase):
+    """
+    Tests the job inventory with a mocked Jenkins instance
+    """
+
+    def setUp(self):
+        self.jenkins_instance = MagicMock()
+        self.jenkins_instance.get_jobs.return_value = [{'name': 'test-user__b_job'}, {'name': 'test-user__a_job'},
+                                                       {'name': 'other-user__a_job'}]
+        self.inventory = jenkins_job_creator.JobInventory(self.jenkins_instance)
+
+    def test__get_user_jobs__input_user_name__return_sorted_job_list(self):
+        self.assertEqual(self.inventory.get_user_jobs('test-user'), ['test-user__a_job', 'test-user__b_job'])
+
+    def test__get_user_jobs__input_unknown_user_name__return_empty_list(self):
+        self.assertEqual(self.inventory.get_user_jobs('unknown-user'), [])
+
+    def test__add_discard__check_exists(self):
+        self.inventory.add('new-user__a_job')
+        self.inventory.discard('test-user__a_job')
+        self.assertTrue(self.inventory.exists('new-user__a_job'))
+        self.assertFalse(self.inventory.exists('test-user__a_job'))
+        self.assertEqual(self.jenkins_instance.get_jobs.call_count, 1)
+
+
+class RenderedJobStoreTest(unittest.TestCase):
+    """
+    Tests the store of rendered job configs
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = jenkins_job_creator.RenderedJobStore(os.path.join(self.tmpdir, 'rendered'))
+        self.job_config = GENERATED_CONFIG_XML % ('host-1', '2013-01-01 10:00')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__write__input_new_config__return_true(self):
+        self.assertTrue(self.store.write('test-user__test_job', self.job_config))
+        self.assertEqual(self.store.read('test-user__test_job'), self.job_config)
+
+    def test__write__input_config_with_other_stamp__return_false(self):
+        self.store.write('test-user__test_job', self.job_config)
+        self.assertFalse(self.store.write('test-user__test_job', GENERATED_CONFIG_XML % ('host-2', '2013-02-03 11:11')))
+
+    def test__save__check_index_loaded(self):
+        self.store.write('test-user__test_job', self.job_config)
+        self.store.write('other-user__test_job', self.job_config)
+        self.store.save()
+        store = jenkins_job_creator.RenderedJobStore(self.store.path)
+        self.assertEqual(store.get_job_names('test-user'), ['test-user__test_job'])
+        self.assertEqual(store.get_hash('test-user__test_job'), jenkins_job_creator.get_job_config_hash(self.job_config))
+
+    def test__remove__check_file_removed(self):
+        self.store.write('test-user__test_job', self.job_config)
+        self.store.remove('test-user__test_job')
+        self.assertEqual(self.store.get_job_names(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.store.path, 'test-user__test_job.xml')))
+
+    def test__create_job__rendered_job__check_config_unchanged(self):
+        jenkins_instance = MagicMock()
+        jenkins_instance.job_exists.return_value = False
+        job = jenkins_job_creator.RenderedJob(jenkins_instance, 'test-user__test_job', self.job_config)
+        job.create_job()
+        jenkins_instance.create_job.assert_called_once_with('test-user__test_job', self.job_config)
+
+
+class PipelineStateTest(unittest.TestCase):
+    """
+    Tests the state of the generated pipelines
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.state = jenkins_job_creator.PipelineState(os.path.join(self.tmpdir, 'state.yaml'))
+        self.state.set_user('test-user', 'config_hash', 'version', {'test-user__test_job': {'input': 'input_hash', 'config': 'config_hash'}})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__is_user_unchanged__input_same_hashes__return_true(self):
+        self.assertTrue(self.state.is_user_unchanged('test-user', 'config_hash', 'version'))
+
+    def test__is_user_unchanged__input_other_version__return_false(self):
+        self.assertFalse(self.state.is_user_unchanged('test-user', 'config_hash', 'other_version'))
+
+    def test__is_user_unchanged__input_unknown_user__return_false(self):
+        self.assertFalse(self.state.is_user_unchanged('unknown-user', 'config_hash', 'version'))
+
+    def test__save__check_job_input_hash_loaded(self):
+        self.state.save()
+        state = jenkins_job_creator.PipelineState(self.state.path)
+        self.assertEqual(state.get_job_input_hash('test-user', 'test-user__test_job'), 'input_hash')
+        self.assertEqual(state.get_job_input_hash('test-user', 'test-user__other_job'), None)
+
+    def test__get_generator_version__input_changed_matrix_filter__return_other_version(self):
+        version = jenkins_job_creator.get_generator_version()
+        module_file = jenkins_job_creator.matrix_filter.__file__
+        compiled_file = os.path.join(self.tmpdir, 'matrix_filter.pyc')
+        with open(compiled_file, 'wb') as f:
+            f.write('compiled matrix filter')
+        try:
+            jenkins_job_creator.matrix_filter.__file__ = compiled_file
+            self.assertNotEqual(jenkins_job_creator.get_generator_version(), version)
+        finally:
+            jenkins_job_creator.matrix_filter.__file__ = module_file
+        self.assertEqual(jenkins_job_creator.get_generator_version(), version)
+
+    def test__discard_user__check_user_unchanged_false(self):
+        self.state.discard_user('test-user')
+        self.assertFalse(self.state.is_user_unchanged('test-user', 'config_hash', 'version'))
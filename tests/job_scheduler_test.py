@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import unittest
+import time
+from jenkins_setup import job_scheduler
+
+
+class JobSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+
+    def test__run_parallel__input_tasks__return_results_in_task_order(self):
+        tasks = [lambda i=i: time.sleep(0.01 * (5 - i)) or i for i in range(5)]
+        result = job_scheduler.run_parallel(tasks, 5)
+        self.assertEqual(result, [0, 1, 2, 3, 4])
+
+    def test__run_parallel__input_empty_task_list__return_empty_list(self):
+        self.assertEqual(job_scheduler.run_parallel([], 4), [])
+
+    def test__run_parallel__input_more_tasks_than_workers__check_all_executed(self):
+        executed = []
+        tasks = [lambda i=i: executed.append(i) for i in range(10)]
+        job_scheduler.run_parallel(tasks, 3)
+        self.assertEqual(sorted(executed), range(10))
+
+    def test__run_parallel__task_raises__raise_exception_after_all_tasks(self):
+        executed = []
+
+        def failing_task():
+            raise ValueError('error')
+
+        tasks = [failing_task] + [lambda i=i: executed.append(i) for i in range(3)]
+        self.assertRaises(ValueError, job_scheduler.run_parallel, tasks, 2)
+        self.assertEqual(sorted(executed), [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from mock import patch
+from jenkins_setup import job_template
+
+
+class JobTemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+
+    def test__init__input_text__check_segments(self):
+        template = job_template.JobTemplate('a @(KEY_1) b @(KEY_2) c @(KEY_1)')
+        self.assertEqual(template.segments, ['a ', '@(KEY_1)', ' b ', '@(KEY_2)', ' c ', '@(KEY_1)', ''])
+        self.assertEqual(template.slots, {'KEY_1': [1, 5], 'KEY_2': [3]})
+
+    def test__get_keys__return_sorted_key_list(self):
+        template = job_template.JobTemplate('@(B) @(A) @(B)')
+        self.assertEqual(template.get_keys(), ['A', 'B'])
+
+    def test__render__input_params_dict__return_rendered_str(self):
+        template = job_template.JobTemplate('@(TEST_1) and @(TEST_2) should be @( replaced @(TEST_1)')
+        result = template.render({'TEST_1': 'THIS', 'TEST_2': 'THAT'})
+        self.assertEqual(result, 'THIS and THAT should be @( replaced THIS')
+
+    def test__render__input_value_with_placeholder_not_strict__value_not_replaced(self):
+        template = job_template.JobTemplate('@(TEST_1) @(TEST_2)')
+        result = template.render({'TEST_1': '@(TEST_2)', 'TEST_2': 'THAT'}, strict=False)
+        self.assertEqual(result, '@(TEST_2) THAT')
+
+    def test__render__input_value_with_nested_placeholder__raise_exception(self):
+        template = job_template.JobTemplate('<command>@(SHELL)</command>')
+        self.assertRaises(KeyError, template.render, {'SHELL': 'scp @(STORAGE)/tarball .'})
+
+    def test__render__input_unused_key__raise_exception(self):
+        template = job_template.JobTemplate('@(TEST_1)')
+        self.assertRaises(KeyError, template.render, {'TEST_1': 'THIS', 'WRONG': 'THAT'})
+
+    def test__render__input_missing_key__raise_exception(self):
+        template = job_template.JobTemplate('@(TEST_1) @(TEST_2)')
+        self.assertRaises(KeyError, template.render, {'TEST_1': 'THIS'})
+
+    def test__render__input_missing_and_unused_key_not_strict__return_rendered_str(self):
+        template = job_template.JobTemplate('@(TEST_1) @(TEST_2)')
+        result = template.render({'TEST_1': 'THIS', 'WRONG': 'THAT'}, strict=False)
+        self.assertEqual(result, 'THIS @(TEST_2)')
+
+    def test__compile_template__input_same_text__return_same_object(self):
+        self.assertTrue(job_template.compile_template('@(A)') is job_template.compile_template('@(A)'))
+
+    def test__compile_template__input_many_texts__check_cache_bounded(self):
+        for index in range(job_template.MAX_COMPILED_TEMPLATES + 10):
+            job_template.compile_template('@(A) %d' % index)
+        self.assertEqual(len(job_template._compiled_templates), job_template.MAX_COMPILED_TEMPLATES)
+        self.assertFalse('@(A) 0' in job_template._compiled_templates)
+
+    def test__render__input_text_and_params__return_rendered_str(self):
+        self.assertEqual(job_template.render('<a>@(A)</a>', {'A': 'x', 'B': 'y'}), '<a>x</a>')
+
+
+class TemplateRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+
+        self.registry = job_template.TemplateRegistry()
+        self.tmpdir = tempfile.mkdtemp()
+        self.template_path = os.path.join(self.tmpdir, 'test.yaml')
+        with open(self.template_path, 'w') as f:
+            f.write("'key': 'value'\n'list': ['a', 'b']\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__get_yaml__input_template_name__return_frozen_dict(self):
+        result = self.registry.get_yaml('templates/job_config_params.yaml')
+        self.assertTrue(isinstance(result, job_template.FrozenDict))
+        self.assertEqual(result['vcs']['none'], '<scm class="hudson.scm.NullSCM"/>')
+
+    def test__get_yaml__input_template_name__return_same_object(self):
+        result = self.registry.get_yaml('templates/execute_shell.yaml')
+        self.assertTrue(result is self.registry.get_yaml('templates/execute_shell.yaml'))
+
+    def test__get_yaml__modify_result__raise_exception(self):
+        result = self.registry.get_yaml('templates/job_config_params.yaml')
+        self.assertRaises(TypeError, result.__setitem__, 'vcs', '')
+        self.assertRaises(TypeError, result['vcs'].update, {'none': ''})
+
+    def test__get_text__input_template_name__return_template_str(self):
+        result = self.registry.get_text('templates/job_config.xml')
+        self.assertTrue('@(PROJECT)' in result)
+
+    @patch('pkg_resources.resource_filename')
+    def test__get_yaml__change_mtime__reload_template(self, mock_resource_filename):
+        mock_resource_filename.return_value = self.template_path
+        with patch('pkg_resources.resource_string', lambda package, name: open(self.template_path).read()):
+            result = self.registry.get_yaml('templates/test.yaml')
+            self.assertEqual(result, {'key': 'value', 'list': ('a', 'b')})
+            with open(self.template_path, 'w') as f:
+                f.write("'key': 'new value'\n")
+            os.utime(self.template_path, (time.time() + 10, time.time() + 10))
+            result = self.registry.get_yaml('templates/test.yaml')
+            self.assertEqual(result, {'key': 'new value'})
+
+    def test__get_version__load_templates__return_changed_version(self):
+        self.registry.get_text('templates/job_config.xml')
+        version = self.registry.get_version()
+        self.registry.get_yaml('templates/execute_shell.yaml')
+        self.assertNotEqual(version, self.registry.get_version())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+import unittest
+import itertools
+import random
+from jenkins_setup import matrix_filter
+
+
+class MatrixFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+
+        self.axes = {'repository': ['repo_1', 'repo_2', 'repo_3'],
+                     'ros_distro': ['fuerte', 'groovy'],
+                     'ubuntu_distro': ['precise', 'quantal'],
+                     'arch': ['amd64', 'i386']}
+
+    def test__compile_filter__input_single_entry__return_filter_string(self):
+        test_list = [{'ros_distro': 'groovy', 'ubuntu_distro': 'precise', 'arch': 'amd64'}]
+        result = matrix_filter.compile_filter(test_list)
+        self.assertEqual(result, '(ros_distro=="groovy" &amp;&amp; ubuntu_distro=="precise" &amp;&amp; arch=="amd64")')
+
+    def test__compile_filter__input_entries_differing_in_one_axis__return_merged_filter_string(self):
+        test_list = [{'repository': 'repo_1', 'ros_distro': 'groovy'},
+                     {'repository': 'repo_2', 'ros_distro': 'groovy'},
+                     {'repository': 'repo_3', 'ros_distro': 'fuerte'}]
+        result = matrix_filter.compile_filter(test_list)
+        self.assertEqual(result, '(repository in ["repo_1", "repo_2"] &amp;&amp; ros_distro=="groovy") || (repository=="repo_3" &amp;&amp; ros_distro=="fuerte")')
+
+    def test__compile_filter__input_entries_and_axes__return_filter_string_without_full_axes(self):
+        test_list = [{'repository': repo, 'ros_distro': ros_distro, 'ubuntu_distro': 'precise', 'arch': 'amd64'}
+                     for repo in self.axes['repository'] for ros_distro in self.axes['ros_distro']]
+        result = matrix_filter.compile_filter(test_list, self.axes)
+        self.assertEqual(result, '(ubuntu_distro=="precise" &amp;&amp; arch=="amd64")')
+
+    def test__compile_filter__input_full_product__return_true(self):
+        test_list = [{'repository': repo, 'ros_distro': 'groovy'} for repo in self.axes['repository']]
+        result = matrix_filter.compile_filter(test_list, {'repository': self.axes['repository'], 'ros_distro': ['groovy']})
+        self.assertEqual(result, 'true')
+
+    def test__compile_filter__input_empty_list__return_empty_string(self):
+        self.assertEqual(matrix_filter.compile_filter([]), '')
+
+    def test__compile_filter__input_negation__return_negated_filter_string(self):
+        result = matrix_filter.compile_filter([{'repository': 'repo_1'}], negation=True)
+        self.assertEqual(result, '!((repository=="repo_1"))')
+
+    def test__evaluate__input_filter_and_combination__return_bool(self):
+        filter_ = '(repository in ["repo_1", "repo_2"] &amp;&amp; ros_distro=="groovy") || (arch=="i386")'
+        self.assertTrue(matrix_filter.evaluate(filter_, {'repository': 'repo_2', 'ros_distro': 'groovy', 'arch': 'amd64'}))
+        self.assertTrue(matrix_filter.evaluate(filter_, {'repository': 'repo_3', 'ros_distro': 'fuerte', 'arch': 'i386'}))
+        self.assertFalse(matrix_filter.evaluate(filter_, {'repository': 'repo_3', 'ros_distro': 'groovy', 'arch': 'amd64'}))
+
+    def test__verify_filter__input_wrong_filter__return_false(self):
+        test_list = [{'repository': 'repo_1', 'ros_distro': 'groovy'}]
+        self.assertFalse(matrix_filter.verify_filter('(repository=="repo_1")', test_list,
+                                                     {'repository': self.axes['repository'], 'ros_distro': self.axes['ros_distro']}))
+
+    def test__compile_filter__input_random_entries__check_equivalent(self):
+        random.seed(0)
+        axis_names = sorted(self.axes.keys())
+        combinations = [dict(zip(axis_names, values)) for values in itertools.product(*[self.axes[name] for name in axis_names])]
+        for _ in range(50):
+            test_list = random.sample(combinations, random.randint(1, len(combinations)))
+            self.assertTrue(matrix_filter.verify_filter(matrix_filter.compile_filter(test_list), test_list, self.axes))
+            self.assertTrue(matrix_filter.verify_filter(matrix_filter.compile_filter(test_list, self.axes), test_list, self.axes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+import hashlib
+import cPickle
+import tempfile
+import yaml
+from jenkins_setup import rosdep_index
+
+
+class RosDepIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.MaxDiff = None
+        self.cache_dir = tempfile.mkdtemp()
+        base = {'boost': {'ubuntu': {'lucid': ['libboost1.40-all-dev'],
+                                     'precise': {'apt': {'packages': ['libboost-all-dev']}}}},
+                'python-yaml': {'ubuntu': ['python-yaml'], 'fedora': ['PyYAML']},
+                'eigen': {'ubuntu': {'apt': {'packages': ['libeigen3-dev']}}},
+                'opencv': {'ubuntu': {'lucid': ['libcv-dev'], '*': {'apt': {'packages': ['libopencv-dev']}}}},
+                'pip-only': {'ubuntu': {'pip': {'packages': ['foo']}}},
+                'fedora-only': {'fedora': ['bar']}}
+        override = {'python-yaml': {'ubuntu': 'python-yaml-override'}}
+        distro = {'roscpp': {'_is_ros': True, 'ubuntu': {'precise': {'apt': {'packages': ['ros-groovy-roscpp']}}}}}
+        self._write_source('http://override.yaml', override, pickled=True)
+        self._write_source('http://base.yaml', base)
+        self._write_source('http://groovy.yaml', distro)
+        self._write_source('http://fuerte.yaml', {'fuerte-only': {'ubuntu': ['fuerte-pkg']}})
+        with open(os.path.join(self.cache_dir, 'index'), 'w') as f:
+            f.write('#autogenerated by rosdep, do not edit. use \'rosdep update\' instead\n'
+                    'yaml http://override.yaml\n'
+                    'yaml http://base.yaml\n'
+                    'gbpdistro http://groovy.yaml groovy\n'
+                    'yaml http://fuerte.yaml fuerte\n')
+        self.index = rosdep_index.RosDepIndex(['lucid', 'precise'], 'groovy', self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _write_source(self, url, data, pickled=False):
+        path = os.path.join(self.cache_dir, hashlib.sha1(url).hexdigest())
+        if pickled:
+            with open(path + '.pickle', 'wb') as f:
+                cPickle.dump(data, f)
+        else:
+            with open(path, 'w') as f:
+                yaml.dump(data, f)
+
+    def test__load__input_cache_dir__return_true(self):
+        self.assertTrue(self.index.load())
+
+    def test__load__input_missing_cache_dir__return_false(self):
+        self.assertFalse(rosdep_index.RosDepIndex(['precise'], cache_dir=os.path.join(self.cache_dir, 'missing')).load())
+
+    def test__to_apt__input_several_ubuntu_distros__return_distro_specific_packages(self):
+        self.index.load()
+        self.assertEqual(self.index.to_apt('boost', 'lucid'), ['libboost1.40-all-dev'])
+        self.assertEqual(self.index.to_apt('boost', 'precise'), ['libboost-all-dev'])
+        self.assertEqual(self.index.to_apt('eigen', 'lucid'), ['libeigen3-dev'])
+
+    def test__to_apt__input_wildcard_ubuntu_distro__return_wildcard_packages_for_other_distros(self):
+        self.index.load()
+        self.assertEqual(self.index.to_apt('opencv', 'lucid'), ['libcv-dev'])
+        self.assertEqual(self.index.to_apt('opencv', 'precise'), ['libopencv-dev'])
+        self.assertEqual(self.index.to_ros('libopencv-dev', 'precise'), 'opencv')
+
+    def test__to_apt__input_key_of_several_sources__return_packages_of_first_source(self):
+        self.index.load()
+        self.assertEqual(self.index.to_apt('python-yaml', 'precise'), ['python-yaml-override'])
+        self.assertEqual(self.index.to_ros('python-yaml-override', 'lucid'), 'python-yaml')
+
+    def test__has_ros__input_keys_without_apt_packages__return_false(self):
+        self.index.load()
+        self.assertFalse(self.index.has_ros('pip-only', 'precise'))
+        self.assertFalse(self.index.has_ros('fedora-only', 'precise'))
+
+    def test__has_ros__input_tagged_sources__check_ros_distro_and_ubuntu_distro(self):
+        self.index.load()
+        self.assertTrue(self.index.has_ros('roscpp', 'precise'))
+        self.assertFalse(self.index.has_ros('roscpp', 'lucid'))
+        self.assertFalse(self.index.has_ros('fuerte-only', 'precise'))
+
+    def test__load__input_equal_package_lists__check_shared(self):
+        self.index.load()
+        self.assertTrue(self.index.get_r2a('lucid')['eigen'] is self.index.get_r2a('precise')['eigen'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,143 @@
 #!/usr/bin/env python
 
 import unittest
+import os
+import json
+import shutil
+import tempfile
+from mock import patch
 import jenkins_setup.rosdep
+from jenkins_setup import common
 
 
 class Rosdep_Test(unittest.TestCase):
 
     def setUp(self):
         self.MaxDiff = None
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.key = {'ros_distro': 'groovy', 'ubuntu_distro': 'precise', 'sources_hash': 'abc'}
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir)
+
+    def _write_snapshot(self, key):
+        with open(jenkins_setup.rosdep.get_snapshot_path('groovy', self.snapshot_dir), 'w') as f:
+            json.dump({'key': key, 'r2a': {'boost': ['libboost-dev', 'libboost-python-dev']}}, f)
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.get_ubuntu_distro', return_value=None)
+    @patch('jenkins_setup.rosdep.apt_get_install')
+    @patch('jenkins_setup.rosdep.call')
+    @patch('jenkins_setup.rosdep.get_snapshot_key')
+    def test__init__input_matching_snapshot__check_no_rosdep_call(self, mock_key, mock_call, mock_install, mock_ubuntu_distro):
+        mock_key.return_value = self.key
+        self._write_snapshot(self.key)
+        resolver = jenkins_setup.rosdep.RosDepResolver('groovy', snapshot_dir=self.snapshot_dir)
+        self.assertEqual(mock_call.call_count, 0)
+        self.assertEqual(mock_install.call_count, 0)
+        self.assertEqual(resolver.to_apt('boost'), ['libboost-dev', 'libboost-python-dev'])
+        self.assertEqual(resolver.to_ros('libboost-python-dev'), 'boost')
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.get_ubuntu_distro', return_value=None)
+    @patch('jenkins_setup.rosdep.apt_get_install')
+    @patch('jenkins_setup.rosdep.call')
+    @patch('jenkins_setup.rosdep.get_snapshot_key')
+    def test__init__input_outdated_snapshot__check_rosdep_db_parsed(self, mock_key, mock_call, mock_install, mock_ubuntu_distro):
+        mock_key.return_value = self.key
+        self._write_snapshot(dict(self.key, sources_hash='outdated'))
+        mock_call.return_value = 'python-yaml -> python-yaml\n'
+        resolver = jenkins_setup.rosdep.RosDepResolver('groovy', snapshot_dir=self.snapshot_dir)
+        self.assertFalse(resolver.has_ros('boost'))
+        self.assertEqual(resolver.to_apt('python-yaml'), ['python-yaml'])
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.get_ubuntu_distro', return_value=None)
+    @patch('jenkins_setup.rosdep.apt_get_install')
+    @patch('jenkins_setup.rosdep.call')
+    @patch('jenkins_setup.rosdep.get_snapshot_key')
+    def test__save_snapshot__input_path__check_loadable(self, mock_key, mock_call, mock_install, mock_ubuntu_distro):
+        mock_key.return_value = self.key
+        mock_call.return_value = 'boost -> libboost-dev\n'
+        resolver = jenkins_setup.rosdep.RosDepResolver('groovy', snapshot_dir=None)
+        path = resolver.save_snapshot(jenkins_setup.rosdep.get_snapshot_path('groovy', self.snapshot_dir))
+        mock_call.reset_mock()
+        resolver = jenkins_setup.rosdep.RosDepResolver('groovy', snapshot_dir=os.path.dirname(path))
+        self.assertEqual(mock_call.call_count, 0)
+        self.assertEqual(resolver.to_apt('boost'), ['libboost-dev'])
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.get_snapshot_key')
+    def test__resolve_many__input_known_unknown_and_duplicate_keys__return_resolution(self, mock_key):
+        mock_key.return_value = self.key
+        with open(jenkins_setup.rosdep.get_snapshot_path('groovy', self.snapshot_dir), 'w') as f:
+            json.dump({'key': self.key, 'r2a': {'boost': ['libboost-dev', 'libboost-python-dev'],
+                                                'boost-python': ['libboost-python-dev']}}, f)
+        resolver = jenkins_setup.rosdep.RosDepResolver('groovy', snapshot_dir=self.snapshot_dir)
+        resolution = resolver.resolve_many(['boost-python', 'missing', 'boost', 'missing', 'boost'])
+        self.assertEqual(resolution.apt_entries, ['libboost-python-dev', 'libboost-dev'])
+        self.assertEqual(resolution.resolved, {'boost': ['libboost-dev', 'libboost-python-dev'],
+                                               'boost-python': ['libboost-python-dev']})
+        self.assertEqual(resolution.missing, ['missing'])
+        self.assertRaises(KeyError, resolver.to_aptlist, ['boost', 'missing'])
+
+    def test__get_sources_hash__input_changed_file__return_other_hash(self):
+        path = os.path.join(self.snapshot_dir, 'test.list')
+        with open(path, 'w') as f:
+            f.write('deb http://packages.ros.org/ros/ubuntu precise main\n')
+        old_hash = jenkins_setup.rosdep.get_sources_hash([path])
+        with open(path, 'a') as f:
+            f.write('deb http://archive.ubuntu.com/ubuntu precise main\n')
+        self.assertNotEqual(jenkins_setup.rosdep.get_sources_hash([path]), old_hash)
+
+
+class RosDep_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.MaxDiff = None
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'rosdep_resolve_groovy.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _get_rosdep(self, ttl=jenkins_setup.rosdep.RESOLVE_CACHE_TTL):
+        with patch('jenkins_setup.rosdep.call'):
+            return jenkins_setup.rosdep.RosDep('groovy', self.cache_path, ttl)
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.run_command')
+    def test__resolve_many__input_uncached_stacks__check_single_rosdep_call(self, mock_run):
+        mock_run.return_value = common.CommandResult([], [('stdout', '#ROSDEP[boost]\n'), ('stdout', '#apt\n'),
+                                                          ('stdout', 'libboost-all-dev\n'), ('stdout', '#ROSDEP[yaml]\n'),
+                                                          ('stdout', '#apt\n'), ('stdout', 'python-yaml\n')], 0, 0.0)
+        rosdep = self._get_rosdep()
+        resolution = rosdep.resolve_many(['boost', 'yaml', 'boost'])
+        self.assertEqual(resolution.apt_entries, ['libboost-all-dev', 'python-yaml'])
+        self.assertEqual(rosdep.to_apt('yaml'), 'python-yaml')
+        mock_run.assert_called_once_with(['rosdep', 'resolve', 'boost', 'yaml'], rosdep.env, verbose=False)
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.run_command')
+    def test__to_apt__input_stack_cached_by_other_job__check_no_rosdep_call(self, mock_run):
+        mock_run.return_value = common.CommandResult([], [('stdout', '#apt\n'), ('stdout', 'libboost-all-dev\n')], 0, 0.0)
+        self.assertEqual(self._get_rosdep().to_apt('boost'), 'libboost-all-dev')
+        self.assertEqual(self._get_rosdep().to_apt('boost'), 'libboost-all-dev')
+        self.assertEqual(mock_run.call_count, 1)
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.run_command')
+    def test__to_apt__input_expired_cache__check_rosdep_call(self, mock_run):
+        mock_run.return_value = common.CommandResult([], [('stdout', '#apt\n'), ('stdout', 'libboost-all-dev\n')], 0, 0.0)
+        self._get_rosdep(ttl=-1).to_apt('boost')
+        self._get_rosdep(ttl=-1).to_apt('boost')
+        self.assertEqual(mock_run.call_count, 2)
+
+    @patch.dict(os.environ, {})
+    @patch('jenkins_setup.rosdep.run_command')
+    def test__to_apt__input_unknown_stack__raise_exception(self, mock_run):
+        mock_run.return_value = common.CommandResult([], [('stderr', "ERROR: no rosdep rule for 'unknown'\n")], 1, 0.0)
+        self.assertRaises(Exception, self._get_rosdep().to_apt, 'unknown')
 
 
 if __name__ == "__main__":